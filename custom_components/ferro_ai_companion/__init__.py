@@ -4,8 +4,8 @@ import asyncio
 import logging
 
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
-from homeassistant.exceptions import ConfigEntryNotReady
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import storage
 from homeassistant.helpers.device_registry import async_get as async_device_registry_get
 from homeassistant.helpers.device_registry import DeviceRegistry, DeviceEntry
 from homeassistant.helpers.entity_registry import async_get as async_entity_registry_get
@@ -13,16 +13,20 @@ from homeassistant.helpers.entity_registry import (
     EntityRegistry,
     async_entries_for_config_entry,
 )
-from homeassistant.util import dt
 
-from .coordinator import FerroAICompanionCoordinator
+from .coordinator import STORAGE_KEY, STORAGE_VERSION, FerroAICompanionCoordinator
 from .const import (
     CAPACITY_TARIFF_DIFFERENT_DAY_NIGHT,
     CONF_CAPACITY_TARIFF,
     DOMAIN,
+    DOMAIN_DATA,
     STARTUP_MESSAGE,
     PLATFORMS,
 )
+from .helpers.command_worker import async_unload_command_workers
+from .helpers.entity_resolver import async_unload_entity_resolver
+from .helpers.locks import async_get_lock, async_unload_locks
+from .helpers.rate_limiter import async_unload_rate_limiters
 
 _LOGGER: logging.Logger = logging.getLogger(__package__)
 
@@ -36,24 +40,30 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
         _LOGGER.debug(STARTUP_MESSAGE)
 
     coordinator = FerroAICompanionCoordinator(hass, entry)
-    validation_error = coordinator.validate_input_sensors()
-    if validation_error is not None:
-        _LOGGER.debug("%s", validation_error)
-        for unsub in coordinator.listeners:
-            unsub()
-        raise ConfigEntryNotReady(validation_error)
-
     hass.data[DOMAIN][entry.entry_id] = coordinator
-    coordinator.setup_timestamp = dt.now().timestamp()
+
+    # Restore the targets before the entities are set up.
+    await coordinator.async_restore_state()
 
     for platform in PLATFORMS:
         coordinator.platforms.append(platform)
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
-    entry.async_on_unload(entry.add_update_listener(async_reload_entry))
+    # The select and switch states are restored, restore the override below them.
+    coordinator.async_restore_override()
+    # Start when the rest is ready, including the input sensors.
+    coordinator.async_start()
+
+    entry.async_on_unload(entry.add_update_listener(async_entry_updated))
+
+    async_update_device_name(hass, entry)
+
+    return True
 
-    # If the name of the integration (config_entry.title) has changed,
-    # update the device name.
+
+@callback
+def async_update_device_name(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Update the device name if the name of the integration has changed."""
     entity_registry: EntityRegistry = async_entity_registry_get(hass)
     all_entities = async_entries_for_config_entry(entity_registry, entry.entry_id)
     if all_entities:
@@ -72,8 +82,6 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
                         device.id, name_by_user=entry.title
                     )
 
-    return True
-
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Handle removal of an entry."""
@@ -91,24 +99,55 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     if unloaded:
         for unsub in coordinator.listeners:
             unsub()
+        # Pending saves are written at shutdown by the Store, but not on unload.
+        await coordinator.async_flush()
         hass.data[DOMAIN].pop(entry.entry_id)
+        if not hass.data[DOMAIN]:
+            async_unload_domain_data(hass)
 
     return unloaded
 
 
-# Global lock
-ferro_ai_companion_lock = asyncio.Lock()
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the stored data of a removed entry."""
+    _LOGGER.debug("async_remove_entry")
+    await storage.Store(
+        hass, STORAGE_VERSION, f"{STORAGE_KEY}.{entry.entry_id}"
+    ).async_remove()
+
+
+@callback
+def async_unload_domain_data(hass: HomeAssistant) -> None:
+    """Remove the objects shared by the config entries, when none is loaded."""
+    _LOGGER.debug("async_unload_domain_data")
+    async_unload_entity_resolver(hass)
+    async_unload_rate_limiters(hass)
+    async_unload_command_workers(hass)
+    async_unload_locks(hass)
+    if not hass.data.get(DOMAIN_DATA, True):
+        hass.data.pop(DOMAIN_DATA)
 
 
 async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
     """Reload config entry."""
     _LOGGER.debug("async_reload_entry")
     # Make sure setup is completed before next unload is started.
-    async with ferro_ai_companion_lock:
+    # The lock is per config entry, other entries are reloaded in parallel.
+    async with async_get_lock(hass, entry.entry_id):
         await async_unload_entry(hass, entry)
         await async_setup_entry(hass, entry)
 
 
+async def async_entry_updated(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Apply updated options, reload only if they cannot be applied in place."""
+    _LOGGER.debug("async_entry_updated")
+    coordinator: FerroAICompanionCoordinator = hass.data[DOMAIN][entry.entry_id]
+    if await coordinator.async_apply_options():
+        async_update_device_name(hass, entry)
+    else:
+        await async_reload_entry(hass, entry)
+
+
 async def async_migrate_entry(hass, config_entry: ConfigEntry):
     """Migrate old entry."""
     _LOGGER.debug("Migrating from version %s", config_entry.version)
@@ -14,6 +14,7 @@ from homeassistant.helpers.selector import (
     SelectSelector,
     SelectSelectorConfig,
     SelectSelectorMode,
+    TimeSelector,
 )
 
 from .const import (
@@ -24,18 +25,41 @@ from .const import (
     CONF_EV_SOC_SENSOR,
     CONF_EV_TARGET_SOC_SENSOR,
     CONF_MQTT_ENTITY,
+    CONF_NIGHT_END,
+    CONF_NIGHT_START,
+    CONF_NIGHT_WEEKDAYS,
     CONF_NUMBER_OF_PHASES,
     CONF_SETTINGS_ENTITY,
     CONF_SOLAR_EV_CHARGING_ENABLED,
     CONF_SOLAR_FORECAST_TODAY_REMAINING,
+    DEFAULT_NIGHT_END,
+    DEFAULT_NIGHT_START,
     DOMAIN,
+    WEEKDAYS,
 )
-from .helpers.config_flow import DeviceNameCreator, FindEntity, FlowValidator
+from .helpers.config_flow import DeviceNameCreator, EntityDiscovery, FlowValidator
 from .helpers.general import get_parameter
 
 _LOGGER = logging.getLogger(__name__)
 
 
+def entity_selector(
+    candidates: list[str], current: str | None = None
+) -> SelectSelector:
+    """Dropdown with the candidate entities, that also accepts other entities."""
+    options = list(candidates)
+    if current and current not in options:
+        options.insert(0, current)
+    return SelectSelector(
+        SelectSelectorConfig(
+            options=options,
+            multiple=False,
+            custom_value=True,
+            mode=SelectSelectorMode.DROPDOWN,
+        )
+    )
+
+
 class FerroAICompanionConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     """Config flow."""
 
@@ -47,6 +71,13 @@ class FerroAICompanionConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         _LOGGER.debug("FerroAICompanionConfigFlow.__init__")
         self._errors = {}
         self.user_input = {}
+        self._candidates: dict[str, list[str]] | None = None
+
+    def candidates(self) -> dict[str, list[str]]:
+        """Candidate entities, discovered once per flow."""
+        if self._candidates is None:
+            self._candidates = EntityDiscovery.discover(self.hass)
+        return self._candidates
 
     @staticmethod
     @callback
@@ -68,8 +99,12 @@ class FerroAICompanionConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             user_input = {}
             # Provide defaults for form
             user_input[CONF_DEVICE_NAME] = DeviceNameCreator.create(self.hass)
-            user_input[CONF_SETTINGS_ENTITY] = FindEntity.find_setting_entity(self.hass)
-            user_input[CONF_MQTT_ENTITY] = FindEntity.find_mqtt_entity(self.hass)
+            user_input[CONF_SETTINGS_ENTITY] = EntityDiscovery.first(
+                self.candidates(), CONF_SETTINGS_ENTITY
+            )
+            user_input[CONF_MQTT_ENTITY] = EntityDiscovery.first(
+                self.candidates(), CONF_MQTT_ENTITY
+            )
             user_input[CONF_CAPACITY_TARIFF] = CAPACITY_TARIFF_DIFFERENT_DAY_NIGHT
             user_input[CONF_SOLAR_EV_CHARGING_ENABLED] = False
 
@@ -100,10 +135,15 @@ class FerroAICompanionConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             ): cv.string,
             vol.Required(
                 CONF_SETTINGS_ENTITY, default=user_input[CONF_SETTINGS_ENTITY]
-            ): cv.string,
+            ): entity_selector(
+                self.candidates()[CONF_SETTINGS_ENTITY],
+                user_input[CONF_SETTINGS_ENTITY],
+            ),
             vol.Required(
                 CONF_MQTT_ENTITY, default=user_input[CONF_MQTT_ENTITY]
-            ): cv.string,
+            ): entity_selector(
+                self.candidates()[CONF_MQTT_ENTITY], user_input[CONF_MQTT_ENTITY]
+            ),
             vol.Required(
                 CONF_CAPACITY_TARIFF, default=user_input[CONF_CAPACITY_TARIFF]
             ): SelectSelector(
@@ -135,12 +175,14 @@ class FerroAICompanionConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         if user_input is None:
             user_input = {}
             # Provide defaults for form
-            user_input[CONF_SOLAR_FORECAST_TODAY_REMAINING] = (
-                FindEntity.find_forecast_entity(self.hass)
+            user_input[CONF_SOLAR_FORECAST_TODAY_REMAINING] = EntityDiscovery.first(
+                self.candidates(), CONF_SOLAR_FORECAST_TODAY_REMAINING
+            )
+            user_input[CONF_EV_SOC_SENSOR] = EntityDiscovery.first(
+                self.candidates(), CONF_EV_SOC_SENSOR
             )
-            user_input[CONF_EV_SOC_SENSOR] = FindEntity.find_vw_soc_sensor(self.hass)
-            user_input[CONF_EV_TARGET_SOC_SENSOR] = (
-                FindEntity.find_vw_target_soc_sensor(self.hass)
+            user_input[CONF_EV_TARGET_SOC_SENSOR] = EntityDiscovery.first(
+                self.candidates(), CONF_EV_TARGET_SOC_SENSOR
             )
             user_input[CONF_NUMBER_OF_PHASES] = 3  # [1, 3]
 
@@ -165,13 +207,23 @@ class FerroAICompanionConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             vol.Required(
                 CONF_SOLAR_FORECAST_TODAY_REMAINING,
                 default=user_input[CONF_SOLAR_FORECAST_TODAY_REMAINING],
-            ): cv.string,
+            ): entity_selector(
+                self.candidates()[CONF_SOLAR_FORECAST_TODAY_REMAINING],
+                user_input[CONF_SOLAR_FORECAST_TODAY_REMAINING],
+            ),
             vol.Required(
                 CONF_EV_SOC_SENSOR, default=user_input[CONF_EV_SOC_SENSOR]
-            ): cv.string,
-            vol.Required(
-                CONF_EV_TARGET_SOC_SENSOR, default=user_input[CONF_EV_TARGET_SOC_SENSOR]
-            ): cv.string,
+            ): entity_selector(
+                self.candidates()[CONF_EV_SOC_SENSOR], user_input[CONF_EV_SOC_SENSOR]
+            ),
+            # Optional without default, so that it can be cleared
+            vol.Optional(
+                CONF_EV_TARGET_SOC_SENSOR,
+                description={"suggested_value": user_input[CONF_EV_TARGET_SOC_SENSOR]},
+            ): entity_selector(
+                self.candidates()[CONF_EV_TARGET_SOC_SENSOR],
+                user_input[CONF_EV_TARGET_SOC_SENSOR],
+            ),
             vol.Required(
                 CONF_NUMBER_OF_PHASES, default=user_input[CONF_NUMBER_OF_PHASES]
             ): vol.In([1, 3]),
@@ -194,6 +246,13 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
             self.config_entry = config_entry
         self._errors = {}
         self.user_input = {}
+        self._candidates: dict[str, list[str]] | None = None
+
+    def candidates(self) -> dict[str, list[str]]:
+        """Candidate entities, discovered once per flow."""
+        if self._candidates is None:
+            self._candidates = EntityDiscovery.discover(self.hass)
+        return self._candidates
 
     async def async_step_init(self, user_input) -> FlowResult:
         """Manage the options."""
@@ -203,6 +262,8 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
         if user_input is not None:
             # process user_input
             error = FlowValidator.validate_step_user(self.hass, user_input)
+            if error is None:
+                error = FlowValidator.validate_tariff_calendar(user_input)
 
             if error is not None:
                 self._errors[error[0]] = error[1]
@@ -221,11 +282,17 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
             vol.Required(
                 CONF_SETTINGS_ENTITY,
                 default=get_parameter(self.config_entry, CONF_SETTINGS_ENTITY),
-            ): cv.string,
+            ): entity_selector(
+                self.candidates()[CONF_SETTINGS_ENTITY],
+                get_parameter(self.config_entry, CONF_SETTINGS_ENTITY),
+            ),
             vol.Required(
                 CONF_MQTT_ENTITY,
                 default=get_parameter(self.config_entry, CONF_MQTT_ENTITY),
-            ): cv.string,
+            ): entity_selector(
+                self.candidates()[CONF_MQTT_ENTITY],
+                get_parameter(self.config_entry, CONF_MQTT_ENTITY),
+            ),
             vol.Required(
                 CONF_CAPACITY_TARIFF,
                 default=get_parameter(self.config_entry, CONF_CAPACITY_TARIFF),
@@ -237,6 +304,29 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
                     mode=SelectSelectorMode.LIST,
                 )
             ),
+            vol.Required(
+                CONF_NIGHT_START,
+                default=get_parameter(
+                    self.config_entry, CONF_NIGHT_START, DEFAULT_NIGHT_START
+                ),
+            ): TimeSelector(),
+            vol.Required(
+                CONF_NIGHT_END,
+                default=get_parameter(
+                    self.config_entry, CONF_NIGHT_END, DEFAULT_NIGHT_END
+                ),
+            ): TimeSelector(),
+            vol.Required(
+                CONF_NIGHT_WEEKDAYS,
+                default=get_parameter(self.config_entry, CONF_NIGHT_WEEKDAYS, []),
+            ): SelectSelector(
+                SelectSelectorConfig(
+                    options=WEEKDAYS,
+                    multiple=True,
+                    translation_key="weekday_options",
+                    mode=SelectSelectorMode.LIST,
+                )
+            ),
             # vol.Required(
             #     CONF_SOLAR_EV_CHARGING_ENABLED,
             #     default=get_parameter(
@@ -276,15 +366,29 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
                 default=get_parameter(
                     self.config_entry, CONF_SOLAR_FORECAST_TODAY_REMAINING
                 ),
-            ): cv.string,
+            ): entity_selector(
+                self.candidates()[CONF_SOLAR_FORECAST_TODAY_REMAINING],
+                get_parameter(self.config_entry, CONF_SOLAR_FORECAST_TODAY_REMAINING),
+            ),
             vol.Required(
                 CONF_EV_SOC_SENSOR,
                 default=get_parameter(self.config_entry, CONF_EV_SOC_SENSOR),
-            ): cv.string,
-            vol.Required(
+            ): entity_selector(
+                self.candidates()[CONF_EV_SOC_SENSOR],
+                get_parameter(self.config_entry, CONF_EV_SOC_SENSOR),
+            ),
+            # Optional without default, so that it can be cleared
+            vol.Optional(
                 CONF_EV_TARGET_SOC_SENSOR,
-                default=get_parameter(self.config_entry, CONF_EV_TARGET_SOC_SENSOR),
-            ): cv.string,
+                description={
+                    "suggested_value": get_parameter(
+                        self.config_entry, CONF_EV_TARGET_SOC_SENSOR
+                    )
+                },
+            ): entity_selector(
+                self.candidates()[CONF_EV_TARGET_SOC_SENSOR],
+                get_parameter(self.config_entry, CONF_EV_TARGET_SOC_SENSOR),
+            ),
             vol.Required(
                 CONF_NUMBER_OF_PHASES,
                 default=get_parameter(self.config_entry, CONF_NUMBER_OF_PHASES),
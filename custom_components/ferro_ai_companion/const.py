@@ -62,6 +62,9 @@ CONF_SOLAR_FORECAST_TODAY_REMAINING = "solar_forecast_today_remaining"
 CONF_EV_SOC_SENSOR = "ev_soc_sensor"
 CONF_EV_TARGET_SOC_SENSOR = "ev_target_soc_sensor"
 CONF_NUMBER_OF_PHASES = "number_of_phases"
+CONF_NIGHT_START = "night_start"
+CONF_NIGHT_END = "night_end"
+CONF_NIGHT_WEEKDAYS = "night_weekdays"
 
 CAPACITY_TARIFF_NONE = "none"
 CAPACITY_TARIFF_SAME_DAY_NIGHT = "same_day_night"
@@ -73,6 +76,8 @@ CAPACITY_TARIFF_OPTIONS = [
     CAPACITY_TARIFF_DIFFERENT_DAY_NIGHT,
 ]
 
+WEEKDAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+
 MODE_AUTO = "auto"
 MODE_SELF = "self"
 MODE_PEAK_CHARGE = "peak_charge"
@@ -103,10 +108,35 @@ COMPANION_MODES = [
 # Constants
 OVERRIDE_OFFSET = 1.0
 BUY_POWER_OFFSET = -200
+FETCH_DATA_TIMEOUT = 4.0  # Max time [s] to wait for EnergyHub data
+SNAPSHOT_MAX_AGE = 30.0  # Max age [s] of fetched data reused by overrides
+HUB_COMMAND_BURST = 1  # Number of EnergyHub writes allowed back-to-back
+HUB_COMMAND_INTERVAL = 10.0  # Time [s] to earn one more EnergyHub write
+OVERRIDE_ENFORCE_DELAY = 2.0  # Time [s] to collect threshold changes before acting
+OVERRIDE_ENFORCE_MAX = 5  # Max number of re-asserted overrides per window
+OVERRIDE_ENFORCE_WINDOW = 3600.0  # Window [s] for OVERRIDE_ENFORCE_MAX
+STARTUP_MAX_WAIT = 30.0  # Max time [s] to wait for dependencies before first update
+STORAGE_SAVE_DELAY = 10.0  # Time [s] to collect changes before saving to storage
+OVERRIDE_STATE_VERSION = 1  # Version of the stored override state
+HISTORY_BOOTSTRAP_DAYS = 7  # Days of history used to learn targets on first setup
+TARGET_MIN_W = 4  # Discharge thresholds [W] at or below this mean no peak shaving
+TARGET_HALF_LIFE = 86400.0  # Half-life [s] of the weight of a learned target
+TARGET_MAX_WEIGHT = 8.0  # Max weight of a learned target, in samples
+TARIFF_PERIOD_DAY = 0  # Tariff period using the primary peak shaving target
+TARIFF_PERIOD_NIGHT = 1  # Tariff period using the secondary peak shaving target
+NIGHT_START_HOUR = 22  # Start [h] of the night tariff period
+NIGHT_END_HOUR = 6  # End [h] of the night tariff period
+TARIFF_CALENDAR_CACHED_DAYS = 8  # Number of compiled days kept by a tariff calendar
+SOC_MIN_INTERVAL = 30.0  # Min time [s] between reactions to the system SOC
+SOC_DEAD_BAND = 0.5  # Min change [%] of the system SOC to react to
+SOC_BAND_LOW = 0  # System SOC below the stop SOC
+SOC_BAND_HIGH = 1  # System SOC at or above the start SOC
 
 # Defaults
 DEFAULT_NAME = DOMAIN
 DEFAULT_TARGET_SOC = 100
+DEFAULT_NIGHT_START = f"{NIGHT_START_HOUR:02d}:00:00"
+DEFAULT_NIGHT_END = f"{NIGHT_END_HOUR:02d}:00:00"
 
 DEBUG = False
 
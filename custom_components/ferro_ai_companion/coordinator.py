@@ -1,15 +1,20 @@
 """Coordinator for Ferro AI Companion"""
 
 import asyncio
-import math
+from collections.abc import Callable, Coroutine
+from dataclasses import dataclass
 from datetime import datetime
+from functools import partial
 import logging
 from random import randint
+from typing import Any
 from homeassistant.config_entries import (
     ConfigEntry,
 )
 
+from homeassistant.const import STATE_UNAVAILABLE
 from homeassistant.core import (
+    CALLBACK_TYPE,
     EventStateChangedData,
     HomeAssistant,
     callback,
@@ -22,16 +27,10 @@ from homeassistant.helpers.device_registry import async_get as async_device_regi
 from homeassistant.helpers.device_registry import DeviceRegistry
 from homeassistant.helpers.event import (
     async_call_later,
+    async_track_point_in_time,
     async_track_time_change,
     async_track_state_change_event,
 )
-from homeassistant.helpers.entity_registry import (
-    async_get as async_entity_registry_get,
-)
-from homeassistant.helpers.entity_registry import (
-    EntityRegistry,
-    async_entries_for_config_entry,
-)
 from homeassistant.util import dt
 
 from .const import (
@@ -42,21 +41,41 @@ from .const import (
     CONF_EV_SOC_SENSOR,
     CONF_EV_TARGET_SOC_SENSOR,
     CONF_MQTT_ENTITY,
+    CONF_NIGHT_END,
+    CONF_NIGHT_START,
+    CONF_NIGHT_WEEKDAYS,
     CONF_SETTINGS_ENTITY,
     CONF_SOLAR_EV_CHARGING_ENABLED,
     CONF_SOLAR_FORECAST_TODAY_REMAINING,
+    DEFAULT_NIGHT_END,
+    DEFAULT_NIGHT_START,
+    DOMAIN,
     ENTITY_KEY_AVOID_SELLING_SWITCH,
     ENTITY_KEY_EV_CONNECTED_SWITCH,
     ENTITY_KEY_COMPANION_MODE_SELECT,
+    HISTORY_BOOTSTRAP_DAYS,
     MODE_AUTO,
     MODE_PEAK_CHARGE,
     MODE_PEAK_SELL,
     MODE_SELL,
+    SOC_DEAD_BAND,
+    SOC_MIN_INTERVAL,
+    STARTUP_MAX_WAIT,
+    STORAGE_SAVE_DELAY,
+)
+from .helpers.general import (
+    Validator,
+    get_parameter,
+    get_tariff_calendar,
+    is_nighttime,
 )
-from .helpers.general import Validator, get_parameter, is_nighttime
+from .helpers.history import async_get_history_values
+from .helpers.locks import async_get_lock
 
 from .helpers.operation_settings import OperationSettings
+from .helpers.sensor_subscription import SensorSubscription
 from .helpers.solar_ev_charging import SolarEVCharging
+from .helpers.target_learner import TargetLearner
 from .sensor import (
     FerroAICompanionSensor,
     FerroAICompanionSensorCurrentPeakShavingTarget,
@@ -68,15 +87,22 @@ from .sensor import (
     FerroAICompanionSensorSolarEVCharging,
 )
 
-
 _LOGGER = logging.getLogger(__name__)
 
-STORAGE_KEY = "ferro_ai_companion.coordinator"
+STORAGE_KEY = "ferro_ai_companion.coordinator"  # Per entry: STORAGE_KEY.entry_id
 STORAGE_VERSION = 1
 
 
-# Global lock
-ferro_ai_companion_coordinator_lock = asyncio.Lock()
+@dataclass(frozen=True, slots=True)
+class StateChange:
+    """A state change of an entity, or of an entity of this integration."""
+
+    key: str  # Entity id or entity key
+    old_state: Any
+    new_state: Any
+
+
+StateChangeHandler = Callable[[StateChange], Coroutine[Any, Any, None]]
 
 
 class FerroAICompanionCoordinator:
@@ -88,7 +114,6 @@ class FerroAICompanionCoordinator:
         self.config_entry = config_entry
         self.platforms = []
         self.listeners = []
-        self.setup_timestamp = None
 
         self.sensor_mode = None
         self.sensor_original_mode = None
@@ -102,6 +127,7 @@ class FerroAICompanionCoordinator:
         self.switch_ev_connected = None
 
         self.select_companion_mode = None
+        self._restoring = True  # Until async_restore_override()
 
         self.solar_forecast_today_remaining_entity_id = None
         self.ev_soc_entity_id = None
@@ -112,17 +138,40 @@ class FerroAICompanionCoordinator:
         self.ev_soc_valid = False
         self.ev_target_soc_valid = False
 
-        self.primary_peak_shaving_target_w = 0.0
-        self.secondary_peak_shaving_target_w = 0.0
+        # The peak shaving targets, see primary_peak_shaving_target_w
+        self.target_learner = TargetLearner()
 
         self.min_charging_current = 6.0
         self.max_charging_current = 16.0
         self.assumed_house_consumption = 0.0
 
-        self.data_store = storage.Store(hass, STORAGE_VERSION, STORAGE_KEY)
+        self.data_store = storage.Store(
+            hass, STORAGE_VERSION, f"{STORAGE_KEY}.{config_entry.entry_id}"
+        )
+        self._save_requested = False
+        self._requested_data: dict | None = None  # Data of the last requested save
+        self._stored_data: dict | None = None  # Loaded by async_restore_state()
+
+        # Options in use, see async_apply_options()
+        self.options = self.current_options()
+
+        # The day and night tariff periods
+        self.tariff_calendar = get_tariff_calendar(self.config_entry)
 
         self.operation_settings = OperationSettings(
-            hass, config_entry, get_parameter(self.config_entry, CONF_SETTINGS_ENTITY)
+            hass,
+            config_entry,
+            get_parameter(self.config_entry, CONF_SETTINGS_ENTITY),
+            self.tariff_calendar,
+        )
+        self.listeners.append(self.operation_settings.async_setup_listeners())
+        self.listeners.append(
+            self.operation_settings.async_add_state_listener(self.async_request_save)
+        )
+        self.listeners.append(
+            self.operation_settings.async_add_sample_listener(
+                self._async_threshold_observed
+            )
         )
         self.capacity_tariff = get_parameter(self.config_entry, CONF_CAPACITY_TARIFF)
         self.solar_ev_charging = None
@@ -130,6 +179,12 @@ class FerroAICompanionCoordinator:
             self.solar_ev_charging = SolarEVCharging(
                 hass, config_entry, get_parameter(self.config_entry, CONF_MQTT_ENTITY)
             )
+            self.listeners.append(self.solar_ev_charging.async_setup_listeners())
+            self.listeners.append(
+                self.solar_ev_charging.async_add_soc_entity_listener(
+                    self._async_soc_entity_changed
+                )
+            )
             # self.listeners.append(
             #     async_track_state_change_event(
             #         self.hass,
@@ -151,21 +206,51 @@ class FerroAICompanionCoordinator:
                 second=randint(0, 59),
             )
         )
-        # Generate triggers every 5 minutes.
-        self.listeners.append(
-            async_track_time_change(
-                hass,
-                self.update_every_five_minutes,
-                minute=[0, 5, 10, 15, 20, 25, 30, 35, 40, 45, 50, 55],
-                second=0,
+        # Update the current peak shaving target at each tariff transition.
+        self._unsub_tariff_transition: CALLBACK_TYPE | None = None
+        self.listeners.append(self._async_cancel_tariff_transition)
+        self.async_schedule_tariff_transition()
+        # Check the solar EV charging conditions every 5 minutes.
+        if self.solar_ev_charging:
+            self.listeners.append(
+                async_track_time_change(
+                    hass,
+                    self.update_every_five_minutes,
+                    minute=[0, 5, 10, 15, 20, 25, 30, 35, 40, 45, 50, 55],
+                    second=0,
+                )
             )
-        )
         # Listen for changes to the device.
+        self._device_id = None  # Cached id of the own device
         self.listeners.append(
-            hass.bus.async_listen(EVENT_DEVICE_REGISTRY_UPDATED, self.device_updated)
+            hass.bus.async_listen(
+                EVENT_DEVICE_REGISTRY_UPDATED,
+                self.device_updated,
+                event_filter=self.device_event_filter,
+            )
         )
-        # Update state once after intitialization
-        self.listeners.append(async_call_later(hass, 10.0, self.update_initial))
+        # Update state once after intitialization, see async_start()
+        self.initialized = False
+        self._unsub_startup: list[CALLBACK_TYPE] = []
+        self.listeners.append(self._async_stop_waiting)
+        self._unsub_input_sensors: CALLBACK_TYPE | None = None
+        self.listeners.append(self._async_untrack_input_sensors)
+        self.listeners.append(self._async_cancel_commands)
+
+        # Handlers of state changes, see dispatch()
+        self._handlers: dict[str, list[StateChangeHandler]] = {}
+        self._unsub_input_handlers: list[CALLBACK_TYPE] = []
+        self.soc_subscription: SensorSubscription | None = None
+        self.register_handler(
+            ENTITY_KEY_COMPANION_MODE_SELECT, self._handle_companion_mode
+        )
+        self.register_handler(
+            ENTITY_KEY_AVOID_SELLING_SWITCH, self._handle_avoid_selling
+        )
+        if self.solar_ev_charging:
+            self.register_handler(
+                ENTITY_KEY_EV_CONNECTED_SWITCH, self._handle_ev_connected
+            )
 
     def unsubscribe_listeners(self):
         """Unsubscribed to listeners"""
@@ -173,36 +258,223 @@ class FerroAICompanionCoordinator:
             unsub()
 
     @callback
-    async def device_updated(self, event: Event):  # pylint: disable=unused-argument
+    def get_device_id(self) -> str | None:
+        """Get the id of the device of this integration instance."""
+        if self._device_id is None:
+            device_registry: DeviceRegistry = async_device_registry_get(self.hass)
+            device = device_registry.async_get_device(
+                identifiers={(DOMAIN, self.config_entry.entry_id)}
+            )
+            if device:
+                self._device_id = device.id
+        return self._device_id
+
+    @callback
+    def device_event_filter(self, event_data) -> bool:
+        """Only let through changes of interest to the own device."""
+        if event_data["action"] == "remove":
+            return event_data["device_id"] == self._device_id
+        if event_data["action"] == "update":
+            if "name_by_user" in event_data.get("changes", {}):
+                return event_data["device_id"] == self.get_device_id()
+        return False
+
+    @callback
+    async def device_updated(self, event: Event):
         """Called when device is updated"""
         _LOGGER.debug("FerroAICompanionCoordinator.device_updated()")
-        if "device_id" in event.data:
-            entity_registry: EntityRegistry = async_entity_registry_get(self.hass)
-            all_entities = async_entries_for_config_entry(
-                entity_registry, self.config_entry.entry_id
+        if event.data["action"] == "remove":
+            # The device will be re-created, look it up again when needed.
+            self._device_id = None
+            return
+
+        # If the device name is changed, update the integration name
+        device_registry: DeviceRegistry = async_device_registry_get(self.hass)
+        device = device_registry.async_get(event.data["device_id"])
+        if device and device.name_by_user != self.config_entry.title:
+            self.hass.config_entries.async_update_entry(
+                self.config_entry, title=device.name_by_user
+            )
+
+    def current_options(self) -> dict:
+        """Get the options of the config entry"""
+        return {
+            CONF_SETTINGS_ENTITY: get_parameter(
+                self.config_entry, CONF_SETTINGS_ENTITY
+            ),
+            CONF_MQTT_ENTITY: get_parameter(self.config_entry, CONF_MQTT_ENTITY),
+            CONF_CAPACITY_TARIFF: get_parameter(
+                self.config_entry, CONF_CAPACITY_TARIFF
+            ),
+            CONF_SOLAR_EV_CHARGING_ENABLED: get_parameter(
+                self.config_entry, CONF_SOLAR_EV_CHARGING_ENABLED, False
+            ),
+            CONF_SOLAR_FORECAST_TODAY_REMAINING: get_parameter(
+                self.config_entry, CONF_SOLAR_FORECAST_TODAY_REMAINING
+            ),
+            CONF_EV_SOC_SENSOR: get_parameter(self.config_entry, CONF_EV_SOC_SENSOR),
+            CONF_EV_TARGET_SOC_SENSOR: get_parameter(
+                self.config_entry, CONF_EV_TARGET_SOC_SENSOR
+            ),
+            CONF_NIGHT_START: get_parameter(
+                self.config_entry, CONF_NIGHT_START, DEFAULT_NIGHT_START
+            ),
+            CONF_NIGHT_END: get_parameter(
+                self.config_entry, CONF_NIGHT_END, DEFAULT_NIGHT_END
+            ),
+            CONF_NIGHT_WEEKDAYS: get_parameter(
+                self.config_entry, CONF_NIGHT_WEEKDAYS, []
+            ),
+        }
+
+    async def async_apply_options(self) -> bool:
+        """Apply changed options without a reload.
+
+        Returns False if the options change the set of entities,
+        then the config entry has to be reloaded.
+        """
+        options = self.current_options()
+        changed = {key for key in options if options[key] != self.options[key]}
+        if not changed:
+            return True
+        _LOGGER.debug("Options changed: %s", changed)
+        if CONF_SOLAR_EV_CHARGING_ENABLED in changed:
+            return False
+        self.options = options
+
+        if CONF_SETTINGS_ENTITY in changed:
+            # The queued commands are for the old EnergyHub.
+            self._async_cancel_commands()
+            await self.operation_settings.async_set_entity_id(
+                options[CONF_SETTINGS_ENTITY]
             )
-            if all_entities:
-                device_id = all_entities[0].device_id
-                if event.data["device_id"] == device_id:
-                    if "changes" in event.data:
-                        if "name_by_user" in event.data["changes"]:
-                            # If the device name is changed, update the integration name
-                            device_registry: DeviceRegistry = async_device_registry_get(
-                                self.hass
-                            )
-                            device = device_registry.async_get(device_id)
-                            if device.name_by_user != self.config_entry.title:
-                                self.hass.config_entries.async_update_entry(
-                                    self.config_entry, title=device.name_by_user
-                                )
+            if self.select_companion_mode is not None:
+                self.submit_command(
+                    ENTITY_KEY_COMPANION_MODE_SELECT,
+                    partial(self.apply_companion_mode, self.select_companion_mode),
+                )
+
+        if CONF_MQTT_ENTITY in changed and self.solar_ev_charging:
+            # The input sensors are set up again below, for the new SOC entity.
+            self.solar_ev_charging.async_set_entity_id(options[CONF_MQTT_ENTITY])
+
+        if changed & {CONF_NIGHT_START, CONF_NIGHT_END, CONF_NIGHT_WEEKDAYS}:
+            self.tariff_calendar = get_tariff_calendar(self.config_entry)
+            self.operation_settings.tariff_calendar = self.tariff_calendar
+            self.async_schedule_tariff_transition()
+
+        if changed & {
+            CONF_CAPACITY_TARIFF,
+            CONF_NIGHT_START,
+            CONF_NIGHT_END,
+            CONF_NIGHT_WEEKDAYS,
+        }:
+            self.capacity_tariff = options[CONF_CAPACITY_TARIFF]
+            self.apply_capacity_tariff()
+            self.async_request_save()
+            self.sensor_peak_shaving_target.set(self.primary_peak_shaving_target_w)
+            self.sensor_secondary_peak_shaving_target.set(
+                self.secondary_peak_shaving_target_w
+            )
+            self.update_current_peak_shaving_target()
+            mode = await self.operation_settings.get_mode()
+            await self.operation_settings.update_override(
+                mode,
+                self.primary_peak_shaving_target_w,
+                self.secondary_peak_shaving_target_w,
+                self.capacity_tariff,
+            )
+
+        if self.solar_ev_charging and changed & {
+            CONF_MQTT_ENTITY,
+            CONF_SOLAR_FORECAST_TODAY_REMAINING,
+            CONF_EV_SOC_SENSOR,
+            CONF_EV_TARGET_SOC_SENSOR,
+        }:
+            await self.async_setup_input_sensors()
+
+        return True
 
     def is_during_intialization(self) -> bool:
         """Checks if the integration is being intialized"""
-        # First update is done after 10 seconds, wait another 5 seconds
-        # before any EV charging is started.
-        now_timestamp = dt.now().timestamp()
-        time_since_start = now_timestamp - self.setup_timestamp
-        return time_since_start < 15
+        # No EV charging is started before the first update is done.
+        return not self.initialized
+
+    def is_ready(self) -> bool:
+        """Checks if the entities needed by the first update have states"""
+        required_entities = self.operation_settings.required_entities()
+        if self.solar_ev_charging:
+            required_entities += self.solar_ev_charging.required_entities()
+        for entity_id in required_entities:
+            state = self.hass.states.get(entity_id)
+            if state is None or state.state == STATE_UNAVAILABLE:
+                _LOGGER.debug("Waiting for %s", entity_id)
+                return False
+        if (validation_error := self.validate_input_sensors()) is not None:
+            _LOGGER.debug("Waiting for input sensors: %s", validation_error)
+            return False
+        return True
+
+    @callback
+    def async_start(self) -> None:
+        """Start the first update when the dependencies are ready.
+
+        Called when the platforms are set up, i.e. when the select and
+        switch states have been restored. Waits at most STARTUP_MAX_WAIT.
+        """
+        if self.is_ready():
+            self._async_start_initial_update()
+            return
+
+        required_entities = self.operation_settings.required_entities()
+        if self.solar_ev_charging:
+            required_entities += self.solar_ev_charging.required_entities()
+        required_entities += self.input_sensors()
+        self._unsub_startup = [
+            async_track_state_change_event(
+                self.hass, required_entities, self._async_dependency_changed
+            ),
+            async_call_later(self.hass, STARTUP_MAX_WAIT, self._async_startup_timeout),
+        ]
+
+    @callback
+    def _async_dependency_changed(self, event: Event[EventStateChangedData]) -> None:
+        """Called when a dependency changes state during startup"""
+        if self.is_ready():
+            self._async_start_initial_update()
+
+    @callback
+    def _async_startup_timeout(
+        self, date_time: datetime = None
+    ) -> None:  # pylint: disable=unused-argument
+        """Called if the dependencies were not ready in time"""
+        _LOGGER.warning(
+            "Dependencies not ready after %s s, starting anyway", STARTUP_MAX_WAIT
+        )
+        self._async_start_initial_update()
+
+    @callback
+    def _async_stop_waiting(self) -> None:
+        """Stop waiting for the dependencies"""
+        for unsub in self._unsub_startup:
+            unsub()
+        self._unsub_startup = []
+
+    @callback
+    def _async_start_initial_update(self) -> None:
+        """Stop waiting and run the first update"""
+        self._async_stop_waiting()
+        self.config_entry.async_create_task(
+            self.hass, self._async_initial_update(), "ferro_ai_companion initial update"
+        )
+
+    async def _async_initial_update(self) -> None:
+        """Run the first update"""
+        try:
+            await self.update_initial()
+        finally:
+            # Also if it failed, the next updates should not wait for it.
+            self.initialized = True
 
     @callback
     async def update_initial(
@@ -210,27 +482,14 @@ class FerroAICompanionCoordinator:
     ):  # pylint: disable=unused-argument
         """Called once"""
         _LOGGER.debug("FerroAICompanionCoordinator.update_initial()")
-        data = await self.data_store.async_load()
-        if data:
-            data = data.get(self.config_entry.entry_id)
-            if data:
-                self.primary_peak_shaving_target_w = data.get(
-                    "primary_peak_shaving_target_w", 0.0
-                )  # Default to 0 if not set
-                self.secondary_peak_shaving_target_w = data.get(
-                    "secondary_peak_shaving_target_w", 0.0
-                )  # Default to 0 if not set
-                if self.capacity_tariff == CAPACITY_TARIFF_NONE:
-                    # If no capacity tariff, set the targets to 0
-                    self.primary_peak_shaving_target_w = 0.0
-                    self.secondary_peak_shaving_target_w = 0.0
-                if self.capacity_tariff == CAPACITY_TARIFF_SAME_DAY_NIGHT:
-                    # If same day/night tariff, set the night targets to 0
-                    self.secondary_peak_shaving_target_w = 0.0
-                self.sensor_peak_shaving_target.set(self.primary_peak_shaving_target_w)
-                self.sensor_secondary_peak_shaving_target.set(
-                    self.secondary_peak_shaving_target_w
-                )
+        if self._stored_data:
+            self.sensor_peak_shaving_target.set(self.primary_peak_shaving_target_w)
+            self.sensor_secondary_peak_shaving_target.set(
+                self.secondary_peak_shaving_target_w
+            )
+        if self.target_learner.timestamp is None:
+            # Nothing learned yet, learn from history instead of waiting for samples.
+            await self.async_bootstrap_targets()
 
         await self.update_quarterly()
 
@@ -253,6 +512,172 @@ class FerroAICompanionCoordinator:
             except (ValueError, TypeError) as e:
                 _LOGGER.error("Failed to fetch remaining solar energy: %s", e)
 
+    async def async_load_data(self) -> dict | None:
+        """Load the stored data of this config entry"""
+        data = await self.data_store.async_load()
+        if data is None:
+            data = await self._async_migrate_legacy_data()
+        return data
+
+    async def _async_migrate_legacy_data(self) -> dict | None:
+        """Move the data of this config entry out of the shared file"""
+        # Earlier versions used one file shared by all config entries.
+        # Config entries are set up in parallel, one at a time edits the file.
+        async with async_get_lock(self.hass, STORAGE_KEY):
+            legacy_store = storage.Store(self.hass, STORAGE_VERSION, STORAGE_KEY)
+            legacy_data = await legacy_store.async_load()
+            if legacy_data is None:
+                return None
+            data = legacy_data.get(self.config_entry.entry_id)
+            if data is not None:
+                await self.data_store.async_save(data)
+
+            # Keep the data of the config entries that have not migrated yet
+            entry_ids = {
+                entry.entry_id
+                for entry in self.hass.config_entries.async_entries(DOMAIN)
+                if entry.entry_id != self.config_entry.entry_id
+            }
+            remaining = {
+                entry_id: entry_data
+                for entry_id, entry_data in legacy_data.items()
+                if entry_id in entry_ids
+            }
+            if not remaining:
+                _LOGGER.debug("Removing the shared storage file")
+                await legacy_store.async_remove()
+            elif remaining != legacy_data:
+                await legacy_store.async_save(remaining)
+        return data
+
+    async def async_restore_state(self):
+        """Restore the stored targets, before the entities are set up"""
+        data = await self.async_load_data()
+        if data:
+            if "target_learner" in data:
+                self.target_learner = TargetLearner.from_dict(data["target_learner"])
+            # Targets that differ from the learned ones are learned from scratch
+            self.primary_peak_shaving_target_w = data.get(
+                "primary_peak_shaving_target_w", 0.0
+            )  # Default to 0 if not set
+            self.secondary_peak_shaving_target_w = data.get(
+                "secondary_peak_shaving_target_w", 0.0
+            )  # Default to 0 if not set
+            self.apply_capacity_tariff()
+        self._stored_data = data
+
+    @callback
+    def async_restore_override(self) -> None:
+        """Restore the override, after the select and switch states.
+
+        The restored companion mode is then applied once, on top of the restored
+        override. The first fetch reconciles it with EnergyHub, so nothing is
+        written if EnergyHub still has the overridden thresholds.
+        """
+        if self._stored_data and "override" in self._stored_data:
+            self.operation_settings.restore_override_state(
+                self._stored_data["override"]
+            )
+        self._restoring = False
+        if self.select_companion_mode is None:
+            return
+        if (
+            self.select_companion_mode == MODE_AUTO
+            and self.switch_avoid_selling
+            and self.operation_settings.override_active
+        ):
+            # The Avoid Selling override, kept up to date by update_quarterly()
+            return
+        self.submit_command(
+            ENTITY_KEY_COMPANION_MODE_SELECT,
+            partial(self.apply_companion_mode, self.select_companion_mode),
+        )
+
+    @property
+    def primary_peak_shaving_target_w(self) -> float:
+        """The primary (day) peak shaving target"""
+        return self.target_learner.primary.mean
+
+    @primary_peak_shaving_target_w.setter
+    def primary_peak_shaving_target_w(self, value: float) -> None:
+        self.target_learner.seed(0, value)
+
+    @property
+    def secondary_peak_shaving_target_w(self) -> float:
+        """The secondary (night) peak shaving target"""
+        return self.target_learner.secondary.mean
+
+    @secondary_peak_shaving_target_w.setter
+    def secondary_peak_shaving_target_w(self, value: float) -> None:
+        self.target_learner.seed(1, value)
+
+    @callback
+    def _data_to_save(self) -> dict:
+        """Data of this config entry to store"""
+        return {
+            "primary_peak_shaving_target_w": self.primary_peak_shaving_target_w,
+            "secondary_peak_shaving_target_w": self.secondary_peak_shaving_target_w,
+            "override": self.operation_settings.override_state(),
+            "target_learner": self.target_learner.as_dict(),
+        }
+
+    @callback
+    def async_request_save(self) -> None:
+        """Save the data after STORAGE_SAVE_DELAY, collecting further changes"""
+        data = self._data_to_save()
+        if data == self._requested_data:
+            # Nothing changed since the last request
+            return
+        self._requested_data = data
+        self._save_requested = True
+        self.data_store.async_delay_save(self._data_to_save_delayed, STORAGE_SAVE_DELAY)
+
+    @callback
+    def _data_to_save_delayed(self) -> dict:
+        """Data for the delayed save, which completes the requested save"""
+        self._save_requested = False
+        return self._data_to_save()
+
+    async def async_flush(self) -> None:
+        """Save requested data now, e.g. when the config entry is unloaded"""
+        if self._save_requested:
+            self._save_requested = False
+            await self.data_store.async_save(self._data_to_save())
+
+    async def async_bootstrap_targets(self):
+        """Learn the peak shaving targets from the recorder history"""
+        samples = await async_get_history_values(
+            self.hass,
+            self.operation_settings.discharge_threshold_entity_id,
+            HISTORY_BOOTSTRAP_DAYS,
+        )
+        # Skip the thresholds written by our own overrides, like the live samples
+        samples = [
+            (timestamp, discharge_threshold_w)
+            for timestamp, discharge_threshold_w in samples
+            if not self.operation_settings.override_active_at(timestamp)
+        ]
+        for timestamp, discharge_threshold_w in samples:
+            self.update_peak_shaving_targets(discharge_threshold_w, timestamp)
+        if samples:
+            _LOGGER.debug(
+                "Learned targets %s and %s from %s samples",
+                self.primary_peak_shaving_target_w,
+                self.secondary_peak_shaving_target_w,
+                len(samples),
+            )
+            self.async_request_save()
+
+    def apply_capacity_tariff(self):
+        """Clear the peak shaving targets not used by the capacity tariff"""
+        if self.capacity_tariff == CAPACITY_TARIFF_NONE:
+            # If no capacity tariff, set the targets to 0
+            self.primary_peak_shaving_target_w = 0.0
+            self.secondary_peak_shaving_target_w = 0.0
+        if self.capacity_tariff == CAPACITY_TARIFF_SAME_DAY_NIGHT:
+            # If same day/night tariff, set the night targets to 0
+            self.secondary_peak_shaving_target_w = 0.0
+
     @callback
     async def update_every_five_minutes(
         self, date_time: datetime = None
@@ -260,7 +685,51 @@ class FerroAICompanionCoordinator:
         """Called every five minutes"""
         _LOGGER.debug("FerroAICompanionCoordinator.update_every_five_minutes()")
 
-        # Update the current peak shaving target sensor
+        # Handle solar EV charging conditions
+        if self.solar_ev_charging:
+            await self.solar_ev_charging.solar_start_conditions()
+
+    @callback
+    def async_schedule_tariff_transition(self) -> None:
+        """Schedule an update at the next tariff transition"""
+        self._async_cancel_tariff_transition()
+        next_transition = self.tariff_calendar.next_transition()
+        if next_transition is not None:
+            self._unsub_tariff_transition = async_track_point_in_time(
+                self.hass, self.update_tariff_transition, next_transition
+            )
+
+    @callback
+    def _async_cancel_tariff_transition(self) -> None:
+        """Cancel the scheduled tariff transition update"""
+        if self._unsub_tariff_transition is not None:
+            self._unsub_tariff_transition()
+            self._unsub_tariff_transition = None
+
+    async def update_tariff_transition(
+        self, date_time: datetime = None
+    ):  # pylint: disable=unused-argument
+        """Called at each tariff transition"""
+        _LOGGER.debug("FerroAICompanionCoordinator.update_tariff_transition()")
+        self._unsub_tariff_transition = None
+        self.async_schedule_tariff_transition()
+
+        self.update_current_peak_shaving_target()
+
+        # Switch the Buy power between the day and night targets
+        mode = await self.operation_settings.get_mode()
+        await self.operation_settings.update_override(
+            mode,
+            self.primary_peak_shaving_target_w,
+            self.secondary_peak_shaving_target_w,
+            self.capacity_tariff,
+        )
+
+    def update_current_peak_shaving_target(self):
+        """Update the current peak shaving target sensor"""
+        if self.sensor_current_peak_shaving_target is None:
+            return
+
         try:
             current_target = float(self.sensor_current_peak_shaving_target.state)
         except (TypeError, ValueError):
@@ -272,7 +741,7 @@ class FerroAICompanionCoordinator:
             new_target = float(self.primary_peak_shaving_target_w)
 
         elif self.capacity_tariff == CAPACITY_TARIFF_DIFFERENT_DAY_NIGHT:
-            if is_nighttime():
+            if is_nighttime(calendar=self.tariff_calendar):
                 new_target = float(self.secondary_peak_shaving_target_w)
             else:
                 new_target = float(self.primary_peak_shaving_target_w)
@@ -282,10 +751,6 @@ class FerroAICompanionCoordinator:
             self.sensor_current_peak_shaving_target.set(new_target)
             _LOGGER.debug("Set current_peak_shaving_target to %.0f", new_target)
 
-        # Handle solar EV charging conditions
-        if self.solar_ev_charging:
-            await self.solar_ev_charging.solar_start_conditions()
-
     @callback
     async def update_quarterly(
         self, date_time: datetime = None
@@ -297,48 +762,8 @@ class FerroAICompanionCoordinator:
         await self.operation_settings.fetch_all_data()
 
         # Update the peak shaving targets
-        self.update_peak_shaving_targets()
-
-        # Update the peak shaving target sensors if they are not equal to the current values.
-        if (
-            self.sensor_peak_shaving_target.state != self.primary_peak_shaving_target_w
-            or self.sensor_secondary_peak_shaving_target.state
-            != self.secondary_peak_shaving_target_w
-        ):
-            if (
-                self.sensor_peak_shaving_target.state
-                != self.primary_peak_shaving_target_w
-            ):
-                _LOGGER.debug(
-                    "Updating primary peak shaving target sensor from %s to %s",
-                    self.sensor_peak_shaving_target.state,
-                    self.primary_peak_shaving_target_w,
-                )
-            if (
-                self.sensor_secondary_peak_shaving_target.state
-                != self.secondary_peak_shaving_target_w
-            ):
-                _LOGGER.debug(
-                    "Updating secondary peak shaving target sensor from %s to %s",
-                    self.sensor_secondary_peak_shaving_target.state,
-                    self.secondary_peak_shaving_target_w,
-                )
-
-            async with ferro_ai_companion_coordinator_lock:
-                # Save the updated values to the data store
-                data = await self.data_store.async_load()
-                if data is None:
-                    data = {}
-                data[self.config_entry.entry_id] = {
-                    "primary_peak_shaving_target_w": self.primary_peak_shaving_target_w,
-                    "secondary_peak_shaving_target_w": self.secondary_peak_shaving_target_w,
-                }
-                await self.data_store.async_save(data)
-
-            self.sensor_peak_shaving_target.set(self.primary_peak_shaving_target_w)
-            self.sensor_secondary_peak_shaving_target.set(
-                self.secondary_peak_shaving_target_w
-            )
+        self.update_changed_peak_shaving_targets()
+        self.update_target_sensors()
 
         # Handle avoid selling
         if self.select_companion_mode == MODE_AUTO and self.switch_avoid_selling:
@@ -384,8 +809,25 @@ class FerroAICompanionCoordinator:
         self.sensor_original_mode.set(mode)
         _LOGGER.debug("Original mode = %s", mode)
 
-    def update_peak_shaving_targets(self):
-        """Update the peak shaving targets based on the current operation settings."""
+    def update_peak_shaving_targets(
+        self, discharge_threshold_w: float = None, timestamp: float = None
+    ):
+        """Learn the peak shaving targets from a sample of the discharge threshold.
+
+        discharge_threshold_w defaults to the original discharge threshold. The
+        sample is learned under the tariff period at timestamp, which defaults to
+        when EnergyHub changed the original discharge threshold.
+        """
+
+        if discharge_threshold_w is None:
+            discharge_threshold_w = (
+                self.operation_settings.original_discharge_threshold_w
+            )
+        if timestamp is None:
+            timestamp = (
+                self.operation_settings.original_threshold_timestamp
+                or dt.now().timestamp()
+            )
 
         _LOGGER.debug(
             "self.primary_peak_shaving_target = %s", self.primary_peak_shaving_target_w
@@ -395,65 +837,20 @@ class FerroAICompanionCoordinator:
             self.secondary_peak_shaving_target_w,
         )
 
-        if self.capacity_tariff == CAPACITY_TARIFF_SAME_DAY_NIGHT:
-            if self.operation_settings.original_discharge_threshold_w > 4:
-                self.primary_peak_shaving_target_w = (
-                    self.operation_settings.original_discharge_threshold_w
-                )
-        elif self.capacity_tariff == CAPACITY_TARIFF_DIFFERENT_DAY_NIGHT:
+        if self.capacity_tariff not in [
+            CAPACITY_TARIFF_SAME_DAY_NIGHT,
+            CAPACITY_TARIFF_DIFFERENT_DAY_NIGHT,
+        ]:
+            return
 
-            upper_limit = 1.4
-            if (
-                self.secondary_peak_shaving_target_w
-                > self.primary_peak_shaving_target_w
-            ):
-                upper_limit = (
-                    math.sqrt(
-                        self.secondary_peak_shaving_target_w
-                        * self.primary_peak_shaving_target_w
-                    )
-                    / self.primary_peak_shaving_target_w
-                )
-            if self.primary_peak_shaving_target_w <= 4:
-                if self.operation_settings.original_discharge_threshold_w > 4:
-                    self.primary_peak_shaving_target_w = (
-                        self.operation_settings.original_discharge_threshold_w
-                    )
-            elif self.operation_settings.original_discharge_threshold_w > 4:
-                if (
-                    0.6
-                    < (
-                        self.operation_settings.original_discharge_threshold_w
-                        / self.primary_peak_shaving_target_w
-                    )
-                    < upper_limit
-                ):
-                    # If the new value is within 40% of the previous value,
-                    # update the previous value.
-                    self.primary_peak_shaving_target_w = (
-                        self.operation_settings.original_discharge_threshold_w
-                    )
-                elif (
-                    self.operation_settings.original_discharge_threshold_w
-                    / self.primary_peak_shaving_target_w
-                ) >= upper_limit:
-                    # If the new value is more than 40% higher than the previous primary value,
-                    # update the secondary value.
-                    self.secondary_peak_shaving_target_w = (
-                        self.operation_settings.original_discharge_threshold_w
-                    )
-                elif (
-                    self.operation_settings.original_discharge_threshold_w
-                    / self.primary_peak_shaving_target_w
-                ) <= 0.6:
-                    # If the new value is more than 40% lower than the previous primaryvalue,
-                    # update both primary and secondary value.
-                    self.secondary_peak_shaving_target_w = (
-                        self.primary_peak_shaving_target_w
-                    )
-                    self.primary_peak_shaving_target_w = (
-                        self.operation_settings.original_discharge_threshold_w
-                    )
+        if self.capacity_tariff == CAPACITY_TARIFF_SAME_DAY_NIGHT:
+            # Only one target
+            self.target_learner.add(discharge_threshold_w, timestamp, cluster=0)
+        else:
+            # Day samples learn the primary target, night samples the secondary
+            self.target_learner.add(
+                discharge_threshold_w, timestamp, cluster=self.target_period(timestamp)
+            )
 
         _LOGGER.debug(
             "self.primary_peak_shaving_target = %s", self.primary_peak_shaving_target_w
@@ -463,6 +860,88 @@ class FerroAICompanionCoordinator:
             self.secondary_peak_shaving_target_w,
         )
 
+    def update_changed_peak_shaving_targets(self):
+        """Learn from the original discharge threshold, if not learned yet.
+
+        Changes during an override are only seen by reading EnergyHub. The sample
+        is taken at the time EnergyHub changed the threshold, to not learn it again
+        on every read or under the tariff period of the read.
+        """
+        timestamp = self.operation_settings.original_threshold_timestamp
+        last_timestamp = self.target_learner.timestamp
+        if timestamp is None or (
+            last_timestamp is not None and timestamp <= last_timestamp
+        ):
+            return
+        self.update_peak_shaving_targets(
+            self.operation_settings.original_discharge_threshold_w, timestamp
+        )
+
+    def target_period(self, timestamp: float) -> int:
+        """The tariff period of a sample, 0 for day and 1 for night"""
+        return self.tariff_calendar.period(dt.utc_from_timestamp(timestamp))
+
+    def update_target_sensors(self):
+        """Update the peak shaving target sensors and save the learned targets"""
+
+        # Save the learned values to the data store, if they changed
+        self.async_request_save()
+
+        if self.sensor_peak_shaving_target is None:
+            return
+
+        timestamp = dt.now().timestamp()
+        self.sensor_peak_shaving_target.set_attributes(
+            {
+                "confidence": self.target_learner.primary.confidence(timestamp),
+                "samples": self.target_learner.primary.count,
+            }
+        )
+        self.sensor_secondary_peak_shaving_target.set_attributes(
+            {
+                "confidence": self.target_learner.secondary.confidence(timestamp),
+                "samples": self.target_learner.secondary.count,
+            }
+        )
+
+        # Update the peak shaving target sensors if they are not equal to the current values.
+        if (
+            self.sensor_peak_shaving_target.state != self.primary_peak_shaving_target_w
+            or self.sensor_secondary_peak_shaving_target.state
+            != self.secondary_peak_shaving_target_w
+        ):
+            if (
+                self.sensor_peak_shaving_target.state
+                != self.primary_peak_shaving_target_w
+            ):
+                _LOGGER.debug(
+                    "Updating primary peak shaving target sensor from %s to %s",
+                    self.sensor_peak_shaving_target.state,
+                    self.primary_peak_shaving_target_w,
+                )
+            if (
+                self.sensor_secondary_peak_shaving_target.state
+                != self.secondary_peak_shaving_target_w
+            ):
+                _LOGGER.debug(
+                    "Updating secondary peak shaving target sensor from %s to %s",
+                    self.sensor_secondary_peak_shaving_target.state,
+                    self.secondary_peak_shaving_target_w,
+                )
+
+            self.sensor_peak_shaving_target.set(self.primary_peak_shaving_target_w)
+            self.sensor_secondary_peak_shaving_target.set(
+                self.secondary_peak_shaving_target_w
+            )
+
+        self.update_current_peak_shaving_target()
+
+    @callback
+    def _async_threshold_observed(self, timestamp: float, discharge_threshold_w: float):
+        """Learn from a changed original discharge threshold"""
+        self.update_peak_shaving_targets(discharge_threshold_w, timestamp)
+        self.update_target_sensors()
+
     async def switch_avoid_selling_update(self, state: bool):
         """Handle the Avoid Selling switch"""
         self.switch_avoid_selling = state
@@ -475,153 +954,190 @@ class FerroAICompanionCoordinator:
         _LOGGER.debug("switch_ev_connected_update = %s", state)
         await self.generate_event(ENTITY_KEY_EV_CONNECTED_SWITCH, not state, state)
 
-    async def generate_event(
-        self,
-        entity_id: str = None,
-        old_state=None,
-        new_state=None,
-    ):
-        """Handle entity state changes."""
-
-        state_changed_data: EventStateChangedData = {
-            "entity_id": entity_id,
-            "old_state": old_state,
-            "new_state": new_state,
-        }
-        event = Event[EventStateChangedData](event_type=None, data=state_changed_data)
-        await self.handle_events(event)
-
     @callback
-    async def handle_events(self, event: Event[EventStateChangedData]):
-        """Handle state change events.
-        EventStateChangedData is supported from Home Assistant 2024.5.5"""
-
-        _LOGGER.debug("FerroAICompanionCoordinator.handle_state_change()")
-
-        # Allowed from HA 2024.4
-        entity_id = event.data["entity_id"]
-        old_state = event.data["old_state"]
-        new_state = event.data["new_state"]
+    def submit_command(
+        self, kind: str, command: Callable[[], Coroutine[Any, Any, None]]
+    ) -> None:
+        """Queue a command to the EnergyHub, superseding earlier ones of the same kind"""
+        self.operation_settings.command_worker.async_submit(
+            (self.config_entry.entry_id, kind), command
+        )
 
-        _LOGGER.debug("entity_id = %s", entity_id)
-        _LOGGER.debug("old_state = %s", old_state)
-        _LOGGER.debug("new_state = %s", new_state)
+    @callback
+    def _async_cancel_commands(self) -> None:
+        """Cancel the queued commands of this instance"""
+        self.operation_settings.command_worker.async_cancel(self.config_entry.entry_id)
+
+    async def apply_companion_mode(self, new_state: str):
+        """Apply the selected companion mode to the EnergyHub"""
+        if new_state == MODE_AUTO:
+            await self.operation_settings.stop_override()
+            if self.switch_avoid_selling:
+                mode = await self.operation_settings.get_mode()
+                if mode == MODE_SELL or mode == MODE_PEAK_SELL:
+                    new_mode = MODE_PEAK_CHARGE
+                    await self.operation_settings.override(
+                        new_mode,
+                        self.primary_peak_shaving_target_w,
+                        self.secondary_peak_shaving_target_w,
+                        self.capacity_tariff,
+                    )
 
-        if get_parameter(self.config_entry, CONF_SOLAR_EV_CHARGING_ENABLED, False):
+        else:
+            await self.operation_settings.override(
+                new_state,
+                self.primary_peak_shaving_target_w,
+                self.secondary_peak_shaving_target_w,
+                self.capacity_tariff,
+            )
 
-            if self.ev_soc_entity_id and (entity_id == self.ev_soc_entity_id):
-                ev_soc_state = self.hass.states.get(self.ev_soc_entity_id)
-                if Validator.is_soc_state(ev_soc_state):
-                    self.ev_soc_valid = True
-                    self.ev_soc = float(ev_soc_state.state)
-                else:
-                    if self.ev_soc_valid:
-                        # Make only one error message per outage.
-                        _LOGGER.error("SOC sensor not valid: %s", ev_soc_state)
-                    self.ev_soc_valid = False
-
-            if self.ev_target_soc_entity_id and (
-                entity_id == self.ev_target_soc_entity_id
-            ):
-                ev_target_soc_state = self.hass.states.get(self.ev_target_soc_entity_id)
-                if Validator.is_soc_state(ev_target_soc_state):
-                    self.ev_target_soc_valid = True
-                    self.ev_target_soc = float(ev_target_soc_state.state)
-                else:
-                    if self.ev_target_soc_valid:
-                        # Make only one error message per outage.
-                        _LOGGER.error(
-                            "Target SOC sensor not valid: %s", ev_target_soc_state
-                        )
-                    self.ev_target_soc_valid = False
-
-            if self.solar_forecast_today_remaining_entity_id and (
-                entity_id == self.solar_forecast_today_remaining_entity_id
-            ):
-                try:
-                    remaining_solar_energy_wh = (
-                        float(
-                            self.hass.states.get(
-                                self.solar_forecast_today_remaining_entity_id
-                            ).state
-                        )
-                        * 1000
-                    )  # Convert kWh to Wh
-                    self.solar_ev_charging.set_start_stop_soc(
-                        remaining_solar_energy_wh,
-                        self.assumed_house_consumption,
-                        self.operation_settings.max_soc,
-                    )
-                    await self.solar_ev_charging.solar_start_trigger()
+        # Update the modes
+        mode = await self.operation_settings.get_mode()
+        self.sensor_mode.set(mode)
+        _LOGGER.debug("Mode = %s", mode)
 
-                except (ValueError, TypeError) as e:
-                    _LOGGER.error("Failed to fetch remaining solar energy: %s", e)
+        mode = await self.operation_settings.get_original_mode()
+        self.sensor_original_mode.set(mode)
+        _LOGGER.debug("Original mode = %s", mode)
 
-        # Handle companion mode select
-        if entity_id == ENTITY_KEY_COMPANION_MODE_SELECT:
-            self.select_companion_mode = new_state
-            if new_state == MODE_AUTO:
+    async def apply_avoid_selling(self, new_state: bool):
+        """Apply the Avoid Selling switch to the EnergyHub"""
+        if self.select_companion_mode and self.select_companion_mode == MODE_AUTO:
+            if new_state is False:
                 await self.operation_settings.stop_override()
-                if self.switch_avoid_selling:
-                    mode = await self.operation_settings.get_mode()
-                    if mode == MODE_SELL or mode == MODE_PEAK_SELL:
-                        new_mode = MODE_PEAK_CHARGE
-                        await self.operation_settings.override(
-                            new_mode,
-                            self.primary_peak_shaving_target_w,
-                            self.secondary_peak_shaving_target_w,
-                            self.capacity_tariff,
-                        )
-
             else:
-                await self.operation_settings.override(
-                    new_state,
-                    self.primary_peak_shaving_target_w,
-                    self.secondary_peak_shaving_target_w,
-                    self.capacity_tariff,
-                )
-
+                mode = await self.operation_settings.get_mode()
+                if mode == MODE_SELL or mode == MODE_PEAK_SELL:
+                    new_mode = MODE_PEAK_CHARGE
+                    await self.operation_settings.override(
+                        new_mode,
+                        self.primary_peak_shaving_target_w,
+                        self.secondary_peak_shaving_target_w,
+                        self.capacity_tariff,
+                    )
             # Update the modes
             mode = await self.operation_settings.get_mode()
             self.sensor_mode.set(mode)
             _LOGGER.debug("Mode = %s", mode)
 
-            mode = await self.operation_settings.get_original_mode()
-            self.sensor_original_mode.set(mode)
-            _LOGGER.debug("Original mode = %s", mode)
+    @callback
+    def register_handler(self, key: str, handler: StateChangeHandler) -> CALLBACK_TYPE:
+        """Register a handler of state changes of key, an entity id or an entity key.
 
-        # Handle Avoid Selling switch
-        if entity_id == ENTITY_KEY_AVOID_SELLING_SWITCH:
-            if self.select_companion_mode and self.select_companion_mode == MODE_AUTO:
-                if new_state is False:
-                    await self.operation_settings.stop_override()
-                else:
-                    mode = await self.operation_settings.get_mode()
-                    if mode == MODE_SELL or mode == MODE_PEAK_SELL:
-                        new_mode = MODE_PEAK_CHARGE
-                        await self.operation_settings.override(
-                            new_mode,
-                            self.primary_peak_shaving_target_w,
-                            self.secondary_peak_shaving_target_w,
-                            self.capacity_tariff,
-                        )
-                # Update the modes
-                mode = await self.operation_settings.get_mode()
-                self.sensor_mode.set(mode)
-                _LOGGER.debug("Mode = %s", mode)
+        Returns a function that removes the handler.
+        """
+        handlers = self._handlers.setdefault(key, [])
+        handlers.append(handler)
 
-        # Handle triggers
-        # TODO: Add TRIGGERS
+        @callback
+        def _async_remove() -> None:
+            handlers.remove(handler)
+            if not handlers:
+                self._handlers.pop(key, None)
 
-        if self.solar_ev_charging:
-            if (
-                entity_id
-                == self.solar_ev_charging.sensor_ferroamp_system_state_of_charge
-            ):
-                await self.solar_ev_charging.solar_start_trigger()
-        if entity_id == ENTITY_KEY_EV_CONNECTED_SWITCH and new_state is True:
-            if self.solar_ev_charging:
-                await self.solar_ev_charging.solar_start_conditions()
+        return _async_remove
+
+    async def generate_event(
+        self,
+        entity_id: str = None,
+        old_state=None,
+        new_state=None,
+    ):
+        """Handle state changes of the entities of this integration."""
+        await self.dispatch(StateChange(entity_id, old_state, new_state))
+
+    @callback
+    async def handle_events(self, event: Event[EventStateChangedData]):
+        """Handle state change events of tracked entities."""
+        data = event.data
+        await self.dispatch(
+            StateChange(data["entity_id"], data["old_state"], data["new_state"])
+        )
+
+    async def dispatch(self, change: StateChange):
+        """Call the handlers registered for the key of change."""
+        _LOGGER.debug("FerroAICompanionCoordinator.dispatch(%s)", change)
+        for handler in list(self._handlers.get(change.key, ())):
+            await handler(change)
+
+    async def _async_sensor_changed(
+        self, entity_id: str, old_value: float | None, new_value: float
+    ):
+        """Dispatch a significant change of a subscribed sensor"""
+        await self.dispatch(StateChange(entity_id, old_value, new_value))
+
+    async def _handle_ev_soc(self, change: StateChange):
+        """Handle a changed EV SOC"""
+        ev_soc_state = self.hass.states.get(self.ev_soc_entity_id)
+        if Validator.is_soc_state(ev_soc_state):
+            self.ev_soc_valid = True
+            self.ev_soc = float(ev_soc_state.state)
+        else:
+            if self.ev_soc_valid:
+                # Make only one error message per outage.
+                _LOGGER.error("SOC sensor not valid: %s", ev_soc_state)
+            self.ev_soc_valid = False
+
+    async def _handle_ev_target_soc(self, change: StateChange):
+        """Handle a changed EV target SOC"""
+        ev_target_soc_state = self.hass.states.get(self.ev_target_soc_entity_id)
+        if Validator.is_soc_state(ev_target_soc_state):
+            self.ev_target_soc_valid = True
+            self.ev_target_soc = float(ev_target_soc_state.state)
+        else:
+            if self.ev_target_soc_valid:
+                # Make only one error message per outage.
+                _LOGGER.error("Target SOC sensor not valid: %s", ev_target_soc_state)
+            self.ev_target_soc_valid = False
+
+    async def _handle_solar_forecast(self, change: StateChange):
+        """Handle a changed remaining solar forecast"""
+        try:
+            remaining_solar_energy_wh = (
+                float(
+                    self.hass.states.get(
+                        self.solar_forecast_today_remaining_entity_id
+                    ).state
+                )
+                * 1000
+            )  # Convert kWh to Wh
+            self.solar_ev_charging.set_start_stop_soc(
+                remaining_solar_energy_wh,
+                self.assumed_house_consumption,
+                self.operation_settings.max_soc,
+            )
+            await self.solar_ev_charging.solar_start_trigger()
+
+        except (ValueError, TypeError) as e:
+            _LOGGER.error("Failed to fetch remaining solar energy: %s", e)
+
+    async def _handle_system_soc(self, change: StateChange):
+        """Handle a changed Ferroamp system SOC"""
+        await self.solar_ev_charging.solar_start_trigger(change.new_state)
+
+    async def _handle_companion_mode(self, change: StateChange):
+        """Handle the companion mode select"""
+        self.select_companion_mode = change.new_state
+        if self._restoring:
+            # Applied by async_restore_override()
+            return
+        self.submit_command(
+            change.key, partial(self.apply_companion_mode, change.new_state)
+        )
+
+    async def _handle_avoid_selling(self, change: StateChange):
+        """Handle the Avoid Selling switch"""
+        if self._restoring:
+            # Applied with the companion mode by async_restore_override()
+            return
+        self.submit_command(
+            change.key, partial(self.apply_avoid_selling, change.new_state)
+        )
+
+    async def _handle_ev_connected(self, change: StateChange):
+        """Handle the EV Connected switch"""
+        if change.new_state is True:
+            await self.solar_ev_charging.solar_start_conditions()
 
     async def add_sensor(self, sensors: list[FerroAICompanionSensor]):
         """Set up sensor"""
@@ -642,51 +1158,118 @@ class FerroAICompanionCoordinator:
                 self.sensor_solar_ev_charging = sensor
 
         if get_parameter(self.config_entry, CONF_SOLAR_EV_CHARGING_ENABLED, False):
+            await self.async_setup_input_sensors()
 
-            # Initialize EV SOC sensor
-            self.ev_soc_entity_id = get_parameter(self.config_entry, CONF_EV_SOC_SENSOR)
-            ev_soc_state = self.hass.states.get(self.ev_soc_entity_id)
-            if Validator.is_soc_state(ev_soc_state):
-                await self.generate_event(
-                    self.ev_soc_entity_id, None, ev_soc_state.state
-                )
+    async def async_setup_input_sensors(self):
+        """Set up, or set up again, the tracking of the input sensors."""
+        self._async_untrack_input_sensors()
 
-            # Initialize EV Target SOC sensor
-            self.ev_target_soc_entity_id = get_parameter(
-                self.config_entry, CONF_EV_TARGET_SOC_SENSOR
+        self.ev_soc_entity_id = get_parameter(self.config_entry, CONF_EV_SOC_SENSOR)
+        self.ev_target_soc_entity_id = get_parameter(
+            self.config_entry, CONF_EV_TARGET_SOC_SENSOR
+        )
+        self.solar_forecast_today_remaining_entity_id = get_parameter(
+            self.config_entry, CONF_SOLAR_FORECAST_TODAY_REMAINING
+        )
+        for key, handler in [
+            (self.ev_soc_entity_id, self._handle_ev_soc),
+            (self.ev_target_soc_entity_id, self._handle_ev_target_soc),
+            (
+                self.solar_forecast_today_remaining_entity_id,
+                self._handle_solar_forecast,
+            ),
+            (
+                self.solar_ev_charging.sensor_ferroamp_system_state_of_charge,
+                self._handle_system_soc,
+            ),
+        ]:
+            if key:
+                self._unsub_input_handlers.append(self.register_handler(key, handler))
+
+        # The system SOC updates every few seconds, only react to significant changes.
+        self.soc_subscription = None
+        soc_entity_id = self.solar_ev_charging.sensor_ferroamp_system_state_of_charge
+        if soc_entity_id:
+            self.soc_subscription = SensorSubscription(
+                self.hass,
+                soc_entity_id,
+                partial(self._async_sensor_changed, soc_entity_id),
+                SOC_MIN_INTERVAL,
+                SOC_DEAD_BAND,
+                levels=lambda: (
+                    self.solar_ev_charging.stop_soc,
+                    self.solar_ev_charging.start_soc,
+                ),
             )
-            ev_target_soc_state = self.hass.states.get(self.ev_target_soc_entity_id)
-            if Validator.is_soc_state(ev_target_soc_state):
-                await self.generate_event(
-                    self.ev_target_soc_entity_id, None, ev_target_soc_state.state
-                )
-
-            # Initialize Solar Forecast Today Remaining sensor
-            self.solar_forecast_today_remaining_entity_id = get_parameter(
-                self.config_entry, CONF_SOLAR_FORECAST_TODAY_REMAINING
+            self._unsub_input_handlers.append(self.soc_subscription.async_start())
+
+        # Initialize EV SOC sensor
+        ev_soc_state = self.hass.states.get(self.ev_soc_entity_id)
+        if Validator.is_soc_state(ev_soc_state):
+            await self.generate_event(self.ev_soc_entity_id, None, ev_soc_state.state)
+
+        # Initialize EV Target SOC sensor
+        ev_target_soc_state = self.hass.states.get(self.ev_target_soc_entity_id)
+        if Validator.is_soc_state(ev_target_soc_state):
+            await self.generate_event(
+                self.ev_target_soc_entity_id, None, ev_target_soc_state.state
             )
-            solar_forecast_today_remaining_state = self.hass.states.get(
-                self.solar_forecast_today_remaining_entity_id
+
+        # Initialize Solar Forecast Today Remaining sensor
+        solar_forecast_today_remaining_state = self.hass.states.get(
+            self.solar_forecast_today_remaining_entity_id
+        )
+        if Validator.is_float(solar_forecast_today_remaining_state):
+            await self.generate_event(
+                self.solar_forecast_today_remaining_entity_id,
+                None,
+                solar_forecast_today_remaining_state.state,
             )
-            if Validator.is_float(solar_forecast_today_remaining_state):
-                await self.generate_event(
-                    self.solar_forecast_today_remaining_entity_id,
-                    None,
-                    solar_forecast_today_remaining_state.state,
-                )
 
-            # Assume Home Assistant 2024.6 or newer
-            self.listeners.append(
-                async_track_state_change_event(
-                    self.hass,
-                    [
-                        self.solar_forecast_today_remaining_entity_id,
-                        self.ev_target_soc_entity_id,
-                        self.ev_soc_entity_id,
-                    ],
-                    self.handle_events,
-                )
+        # Assume Home Assistant 2024.6 or newer
+        self._unsub_input_sensors = async_track_state_change_event(
+            self.hass,
+            [
+                self.solar_forecast_today_remaining_entity_id,
+                self.ev_target_soc_entity_id,
+                self.ev_soc_entity_id,
+            ],
+            self.handle_events,
+        )
+
+    @callback
+    def _async_soc_entity_changed(self) -> None:
+        """Set up the input sensors again, for the new system SOC entity"""
+        if self._unsub_input_sensors is None:
+            # Not set up yet, add_sensor() will do it
+            return
+        self.config_entry.async_create_task(
+            self.hass,
+            self.async_setup_input_sensors(),
+            "ferro_ai_companion setup input sensors",
+        )
+
+    @callback
+    def _async_untrack_input_sensors(self) -> None:
+        """Stop tracking the input sensors"""
+        if self._unsub_input_sensors is not None:
+            self._unsub_input_sensors()
+            self._unsub_input_sensors = None
+        while self._unsub_input_handlers:
+            self._unsub_input_handlers.pop()()
+
+    def input_sensors(self) -> list[str]:
+        """Input sensors that need to have a state before the first update."""
+        input_sensors = []
+        if get_parameter(self.config_entry, CONF_SOLAR_EV_CHARGING_ENABLED, False):
+            input_sensors.append(get_parameter(self.config_entry, CONF_EV_SOC_SENSOR))
+            ev_target_soc = get_parameter(self.config_entry, CONF_EV_TARGET_SOC_SENSOR)
+            if len(ev_target_soc) > 0:  # Check if the sensor exists
+                input_sensors.append(ev_target_soc)
+            input_sensors.append(
+                get_parameter(self.config_entry, CONF_SOLAR_FORECAST_TODAY_REMAINING)
             )
+        return input_sensors
 
     def validate_input_sensors(self) -> str:
         """Check that all input sensors returns values."""
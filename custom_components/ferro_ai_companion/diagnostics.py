@@ -0,0 +1,24 @@
+"""Diagnostics support for Ferro AI Companion."""
+
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+from .coordinator import FerroAICompanionCoordinator
+from .helpers.locks import async_get_lock
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    coordinator: FerroAICompanionCoordinator = hass.data[DOMAIN][entry.entry_id]
+    soc_subscription = coordinator.soc_subscription
+    return {
+        "rate_limiter": coordinator.operation_settings.rate_limiter.as_dict(),
+        "command_worker": coordinator.operation_settings.command_worker.as_dict(),
+        "reload_lock": async_get_lock(hass, entry.entry_id).as_dict(),
+        "soc_subscription": soc_subscription.as_dict() if soc_subscription else None,
+    }
@@ -0,0 +1,153 @@
+"""Serialized commands sent to EnergyHub."""
+
+import asyncio
+from collections.abc import Awaitable, Callable
+import logging
+from typing import Any
+
+from homeassistant.core import HomeAssistant, callback
+
+from ..const import DOMAIN_DATA
+
+_LOGGER = logging.getLogger(__name__)
+
+CommandKey = tuple[str, str]  # (owner, kind), e.g. (entry_id, entity key)
+
+
+class CommandWorker:
+    """Run commands one at a time, in the order they were submitted.
+
+    A command supersedes the command with the same key: a queued one is dropped,
+    a running one is cancelled. Only the latest intent of each kind reaches the hub.
+    """
+
+    def __init__(self, hass: HomeAssistant, name: str) -> None:
+        """Initialize."""
+        self._hass = hass
+        self._name = name
+        self._queue: dict[CommandKey, Callable[[], Awaitable[None]]] = {}
+        self._running_key: CommandKey | None = None
+        self._command_task: asyncio.Task | None = None
+        self._worker_task: asyncio.Task | None = None
+
+        # Diagnostics
+        self.submitted = 0
+        self.superseded = 0
+
+    @callback
+    def async_submit(
+        self, key: CommandKey, command: Callable[[], Awaitable[None]]
+    ) -> None:
+        """Queue a command and return immediately."""
+        self.submitted += 1
+        if self._queue.pop(key, None) is not None:
+            _LOGGER.debug("Dropping superseded command %s", key)
+            self.superseded += 1
+        self._queue[key] = command
+
+        if (
+            key == self._running_key
+            and not self._command_task.done()
+            and not self._command_task.cancelling()
+        ):
+            _LOGGER.debug("Cancelling superseded command %s", key)
+            self.superseded += 1
+            self._command_task.cancel()
+
+        if self._worker_task is None or self._worker_task.done():
+            self._worker_task = self._hass.async_create_task(
+                self._async_run(), self._name
+            )
+
+    async def _async_run(self) -> None:
+        """Run the queued commands until the queue is empty."""
+        while self._queue:
+            key = next(iter(self._queue))
+            command = self._queue.pop(key)
+            self._running_key = key
+            self._command_task = self._hass.async_create_task(
+                command(), f"{self._name} {key[1]}"
+            )
+            try:
+                # Returns when the command is done, also if it was cancelled.
+                await asyncio.wait([self._command_task])
+            finally:
+                self._running_key = None
+            if not self._command_task.cancelled() and (
+                e := self._command_task.exception()
+            ):
+                _LOGGER.error("Command %s failed: %s", key, e)
+
+    @callback
+    def async_cancel(self, owner: str) -> None:
+        """Drop and cancel the commands of owner."""
+        for key in [key for key in self._queue if key[0] == owner]:
+            del self._queue[key]
+        if self._running_key is not None and self._running_key[0] == owner:
+            self._command_task.cancel()
+
+    @callback
+    def async_shutdown(self) -> None:
+        """Drop the queued commands and cancel the running command."""
+        self._queue.clear()
+        if self._worker_task is not None:
+            self._worker_task.cancel()
+        if self._command_task is not None:
+            self._command_task.cancel()
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return diagnostics."""
+        return {
+            "queue_depth": len(self._queue),
+            "running": self._running_key is not None,
+            "submitted": self.submitted,
+            "superseded": self.superseded,
+        }
+
+
+def async_get_command_worker(
+    hass: HomeAssistant, hub_id: str, user: str
+) -> CommandWorker:
+    """Get the command worker shared by all users of the same EnergyHub."""
+    domain_data = hass.data.setdefault(DOMAIN_DATA, {})
+    command_workers: dict[str, CommandWorker] = domain_data.setdefault(
+        "command_workers", {}
+    )
+    if hub_id not in command_workers:
+        _LOGGER.debug("Creating command worker for %s", hub_id)
+        command_workers[hub_id] = CommandWorker(
+            hass, f"ferro_ai_companion command {hub_id}"
+        )
+    users: dict[str, set[str]] = domain_data.setdefault("command_worker_users", {})
+    users.setdefault(hub_id, set()).add(user)
+    return command_workers[hub_id]
+
+
+@callback
+def async_release_command_worker(hass: HomeAssistant, hub_id: str, user: str) -> None:
+    """Cancel the commands of user and stop using the command worker.
+
+    The command worker is shut down and removed when the last user is gone.
+    """
+    domain_data = hass.data.get(DOMAIN_DATA, {})
+    command_workers: dict[str, CommandWorker] = domain_data.get("command_workers", {})
+    if (command_worker := command_workers.get(hub_id)) is None:
+        return
+    command_worker.async_cancel(user)
+    users: dict[str, set[str]] = domain_data.get("command_worker_users", {})
+    users.get(hub_id, set()).discard(user)
+    if not users.get(hub_id):
+        _LOGGER.debug("Removing command worker for %s", hub_id)
+        users.pop(hub_id, None)
+        command_workers.pop(hub_id).async_shutdown()
+
+
+@callback
+def async_unload_command_workers(hass: HomeAssistant) -> None:
+    """Shut down and remove the command workers."""
+    command_workers: dict[str, CommandWorker] = hass.data.get(DOMAIN_DATA, {}).pop(
+        "command_workers", {}
+    )
+    hass.data.get(DOMAIN_DATA, {}).pop("command_worker_users", None)
+    for command_worker in command_workers.values():
+        command_worker.async_shutdown()
@@ -1,17 +1,17 @@
 """Helpers for config_flow"""
 
-from collections import UserDict
 import logging
 from typing import Any
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.device_registry import async_get as async_device_registry_get
 from homeassistant.helpers.device_registry import DeviceRegistry
 from homeassistant.helpers.entity_registry import async_get as async_entity_registry_get
-from homeassistant.helpers.entity_registry import (
-    EntityRegistry,
-    RegistryEntry,
-)
+from homeassistant.helpers.entity_registry import EntityRegistry, RegistryEntry
+from homeassistant.util import dt as dt_util
 
+from custom_components.ferro_ai_companion.helpers.entity_resolver import (
+    async_get_entity_resolver,
+)
 from custom_components.ferro_ai_companion.helpers.general import Validator
 
 # from custom_components.ferro_ai_companion.helpers.price_adaptor import PriceAdaptor
@@ -20,7 +20,11 @@ from custom_components.ferro_ai_companion.helpers.general import Validator
 from ..const import (
     CONF_EV_SOC_SENSOR,
     CONF_EV_TARGET_SOC_SENSOR,
+    CONF_MQTT_ENTITY,
+    CONF_NIGHT_END,
+    CONF_NIGHT_START,
     CONF_SETTINGS_ENTITY,
+    CONF_SOLAR_FORECAST_TODAY_REMAINING,
     DOMAIN,
     NAME,
     PLATFORM_FERROAMP,
@@ -51,20 +55,27 @@ class FlowValidator:
                 return ("base", "setting_entity_not_found")
 
             entity_registry: EntityRegistry = async_entity_registry_get(hass)
-            registry_entries: UserDict[str, RegistryEntry] = (
-                entity_registry.entities.items()
-            )
             platform = None
-            for entry in registry_entries:
-                if entry[1].entity_id == entity.entity_id:
-                    platform = entry[1].platform
-                    break
+            if entry := entity_registry.async_get(entity.entity_id):
+                platform = entry.platform
 
             if platform != PLATFORM_FERROAMP_OPERATION_SETTINGS:
                 return ("base", "setting_entity_not_found")
 
         return None
 
+    @staticmethod
+    def validate_tariff_calendar(user_input: dict[str, Any]) -> list[str]:
+        """Validate the night period of the tariff calendar"""
+        night_start = dt_util.parse_time(user_input[CONF_NIGHT_START])
+        night_end = dt_util.parse_time(user_input[CONF_NIGHT_END])
+        if night_start is None or night_end is None:
+            return ("base", "night_time_invalid")
+        if night_start == night_end:
+            return ("base", "night_period_empty")
+
+        return None
+
     @staticmethod
     def validate_step_solar(
         hass: HomeAssistant, user_input: dict[str, Any]
@@ -84,10 +95,10 @@ class FlowValidator:
             _LOGGER.debug("EV SOC state is between 0 and 100")
             return ("base", "ev_soc_invalid_data")
 
-        # Validate EV Target SOC entity
-        user_input[CONF_EV_TARGET_SOC_SENSOR] = user_input[
-            CONF_EV_TARGET_SOC_SENSOR
-        ].strip()
+        # Validate EV Target SOC entity, an empty or cleared field means none
+        user_input[CONF_EV_TARGET_SOC_SENSOR] = (
+            user_input.get(CONF_EV_TARGET_SOC_SENSOR) or ""
+        ).strip()
         if len(user_input[CONF_EV_TARGET_SOC_SENSOR]) > 0:
             entity = hass.states.get(user_input[CONF_EV_TARGET_SOC_SENSOR])
             if entity is None:
@@ -102,82 +113,71 @@ class FlowValidator:
         return None
 
 
-class FindEntity:
-    """Find entities"""
-
-    @staticmethod
-    def find_vw_soc_sensor(hass: HomeAssistant) -> str:
-        """Search for Volkswagen SOC sensor"""
-        entity_registry: EntityRegistry = async_entity_registry_get(hass)
-        registry_entries: UserDict[str, RegistryEntry] = (
-            entity_registry.entities.items()
-        )
-        for entry in registry_entries:
-            if entry[1].platform == PLATFORM_VW:
-                entity_id = entry[1].entity_id
-                if "state_of_charge" in entity_id:
-                    if not "target_state_of_charge" in entity_id:
-                        return entity_id
-        return ""
-
-    @staticmethod
-    def find_vw_target_soc_sensor(hass: HomeAssistant) -> str:
-        """Search for Volkswagen Target SOC sensor"""
-        entity_registry: EntityRegistry = async_entity_registry_get(hass)
-        registry_entries: UserDict[str, RegistryEntry] = (
-            entity_registry.entities.items()
-        )
-        for entry in registry_entries:
-            if entry[1].platform == PLATFORM_VW:
-                entity_id = entry[1].entity_id
-                if "target_state_of_charge" in entity_id:
-                    return entity_id
-        return ""
-
-    @staticmethod
-    def find_setting_entity(hass: HomeAssistant) -> str:
-        """Find Ferroamp Operation Settings entity"""
-        entity_registry: EntityRegistry = async_entity_registry_get(hass)
-        registry_entries: UserDict[str, RegistryEntry] = (
-            entity_registry.entities.items()
-        )
-        for entry in registry_entries:
-            if entry[1].platform == PLATFORM_FERROAMP_OPERATION_SETTINGS:
-                entity_id = entry[1].entity_id
-                if entity_id.startswith("number"):  # Get the first number entity
-                    return entity_id
-        return ""
+class EntityDiscovery:
+    """Discover candidate entities for the flows"""
 
     @staticmethod
-    def find_mqtt_entity(hass: HomeAssistant) -> str:
-        """Find Ferroamp MQTT Sensor entity"""
-        entity_registry: EntityRegistry = async_entity_registry_get(hass)
-        registry_entries: UserDict[str, RegistryEntry] = (
-            entity_registry.entities.items()
-        )
-        for entry in registry_entries:
-            if entry[1].platform == PLATFORM_FERROAMP:
-                entity_id = entry[1].entity_id
-                if entity_id.startswith("sensor"):  # Get the first sensor entity
-                    return entity_id
-        return ""
+    def discover(hass: HomeAssistant) -> dict[str, list[str]]:
+        """Classify the candidates for all entity fields in one pass.
+
+        Each list is ranked with enabled entities first, otherwise in registry order.
+        The Ferroamp entities are given as one candidate per device (EnergyHub).
+        """
+        resolver = async_get_entity_resolver(hass)
+        candidates: dict[str, list[RegistryEntry]] = {
+            CONF_SETTINGS_ENTITY: [],
+            CONF_MQTT_ENTITY: [],
+            CONF_SOLAR_FORECAST_TODAY_REMAINING: [],
+            CONF_EV_SOC_SENSOR: [],
+            CONF_EV_TARGET_SOC_SENSOR: [],
+        }
+        devices: dict[str, set[str]] = {
+            CONF_SETTINGS_ENTITY: set(),
+            CONF_MQTT_ENTITY: set(),
+        }
+
+        def _add_per_device(key: str, entry: RegistryEntry) -> None:
+            if entry.device_id is None or entry.device_id not in devices[key]:
+                devices[key].add(entry.device_id)
+                candidates[key].append(entry)
+
+        for platform in [
+            PLATFORM_FERROAMP_OPERATION_SETTINGS,
+            PLATFORM_FERROAMP,
+            PLATFORM_FORECAST_SOLAR,
+            PLATFORM_VW,
+        ]:
+            for entry in resolver.async_get_platform_entries(platform):
+                entity_id = entry.entity_id
+                if platform == PLATFORM_FERROAMP_OPERATION_SETTINGS:
+                    if entity_id.startswith("number"):
+                        _add_per_device(CONF_SETTINGS_ENTITY, entry)
+                elif platform == PLATFORM_FERROAMP:
+                    if entity_id.startswith("sensor"):
+                        _add_per_device(CONF_MQTT_ENTITY, entry)
+                elif platform == PLATFORM_FORECAST_SOLAR:
+                    if (
+                        entry.original_name
+                        == "Estimated energy production - remaining today"
+                    ):
+                        candidates[CONF_SOLAR_FORECAST_TODAY_REMAINING].append(entry)
+                elif "target_state_of_charge" in entity_id:
+                    candidates[CONF_EV_TARGET_SOC_SENSOR].append(entry)
+                elif "state_of_charge" in entity_id:
+                    candidates[CONF_EV_SOC_SENSOR].append(entry)
+
+        return {
+            key: [
+                entry.entity_id
+                for entry in sorted(entries, key=lambda e: e.disabled_by is not None)
+            ]
+            for key, entries in candidates.items()
+        }
 
     @staticmethod
-    def find_forecast_entity(hass: HomeAssistant) -> str:
-        """Find Forecast.Solar entity"""
-        entity_registry: EntityRegistry = async_entity_registry_get(hass)
-        registry_entries: UserDict[str, RegistryEntry] = (
-            entity_registry.entities.items()
-        )
-        for entry in registry_entries:
-            if entry[1].platform == PLATFORM_FORECAST_SOLAR:
-                entity_id = entry[1].entity_id
-                if (
-                    entry[1].original_name
-                    == "Estimated energy production - remaining today"
-                ):
-                    return entity_id
-        return ""
+    def first(candidates: dict[str, list[str]], key: str) -> str:
+        """Get the best candidate for a field, or an empty string if none found."""
+        return candidates[key][0] if candidates.get(key) else ""
 
 
 class DeviceNameCreator:
@@ -0,0 +1,157 @@
+"""Indexed lookups in the entity registry."""
+
+from collections.abc import Callable
+import logging
+
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, callback
+from homeassistant.helpers.entity_registry import (
+    EVENT_ENTITY_REGISTRY_UPDATED,
+    EntityRegistry,
+    RegistryEntry,
+    async_get as async_entity_registry_get,
+)
+
+from ..const import DOMAIN_DATA
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class EntityResolver:
+    """Index of the entity registry, shared by all users in the integration.
+
+    The index is built in one pass over the registry the first time it is used.
+    After that, only the entries affected by entity registry updates are patched.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize."""
+        self._hass = hass
+        self._entity_registry: EntityRegistry = async_entity_registry_get(hass)
+        # entity_id -> indexed registry entry
+        self._entries: dict[str, RegistryEntry] | None = None
+        # device_id -> {original_name: entity_id}
+        self._devices: dict[str, dict[str, str]] = {}
+        # platform -> {entity_id: registry entry}
+        self._platforms: dict[str, dict[str, RegistryEntry]] = {}
+        self._listeners: list[Callable[[set[str | None], set[str]], None]] = []
+        self.builds = 0
+
+        self._unsub = hass.bus.async_listen(
+            EVENT_ENTITY_REGISTRY_UPDATED, self._async_registry_updated
+        )
+
+    @callback
+    def async_shutdown(self) -> None:
+        """Stop tracking the entity registry, and drop the index and listeners."""
+        self._unsub()
+        self._listeners.clear()
+        self._entries = None
+        self._devices = {}
+        self._platforms = {}
+
+    @callback
+    def _async_index(self, entry: RegistryEntry) -> None:
+        """Add an entry to the index."""
+        self._entries[entry.entity_id] = entry
+        if entry.device_id is not None and entry.original_name is not None:
+            self._devices.setdefault(entry.device_id, {})[
+                entry.original_name
+            ] = entry.entity_id
+        self._platforms.setdefault(entry.platform, {})[entry.entity_id] = entry
+
+    @callback
+    def _async_unindex(self, entry: RegistryEntry) -> None:
+        """Remove an entry from the index."""
+        self._entries.pop(entry.entity_id, None)
+        if (device_entities := self._devices.get(entry.device_id)) is not None:
+            if device_entities.get(entry.original_name) == entry.entity_id:
+                device_entities.pop(entry.original_name)
+        if (platform_entries := self._platforms.get(entry.platform)) is not None:
+            platform_entries.pop(entry.entity_id, None)
+
+    @callback
+    def _async_registry_updated(self, event: Event) -> None:
+        """Patch the index with the entities affected by a registry update."""
+        entity_id = event.data["entity_id"]
+        affected_entities = {entity_id}
+        affected_devices: set[str | None] = set()
+
+        if self._entries is not None:
+            for old_entity_id in [event.data.get("old_entity_id"), entity_id]:
+                if old_entity_id and (old := self._entries.get(old_entity_id)):
+                    self._async_unindex(old)
+                    affected_devices.add(old.device_id)
+                    affected_entities.add(old_entity_id)
+
+        if event.data["action"] != "remove":
+            if entry := self._entity_registry.async_get(entity_id):
+                if self._entries is not None:
+                    self._async_index(entry)
+                affected_devices.add(entry.device_id)
+
+        for listener in list(self._listeners):
+            listener(affected_devices, affected_entities)
+
+    @callback
+    def _async_build(self) -> None:
+        """Build the index."""
+        self._entries = {}
+        self._devices = {}
+        self._platforms = {}
+        for entry in self._entity_registry.entities.values():
+            self._async_index(entry)
+        self.builds += 1
+        _LOGGER.debug("Entity index built for %s entities", len(self._entries))
+
+    @callback
+    def async_add_listener(
+        self, action: Callable[[set[str | None], set[str]], None]
+    ) -> CALLBACK_TYPE:
+        """Call action(device_ids, entity_ids) when registry entries are updated."""
+        self._listeners.append(action)
+
+        @callback
+        def _async_remove() -> None:
+            self._listeners.remove(action)
+
+        return _async_remove
+
+    @callback
+    def async_get_device_id(self, entity_id: str) -> str | None:
+        """Get the device id of an entity."""
+        if entry := self._entity_registry.async_get(entity_id):
+            return entry.device_id
+        return None
+
+    @callback
+    def async_get_device_entities(self, device_id: str | None) -> dict[str, str]:
+        """Get the entities of a device, as {original_name: entity_id}."""
+        if device_id is None:
+            return {}
+        if self._entries is None:
+            self._async_build()
+        return self._devices.get(device_id, {})
+
+    @callback
+    def async_get_platform_entries(self, platform: str) -> list[RegistryEntry]:
+        """Get the registry entries of a platform."""
+        if self._entries is None:
+            self._async_build()
+        return list(self._platforms.get(platform, {}).values())
+
+
+@callback
+def async_get_entity_resolver(hass: HomeAssistant) -> EntityResolver:
+    """Get the entity resolver."""
+    domain_data = hass.data.setdefault(DOMAIN_DATA, {})
+    if "entity_resolver" not in domain_data:
+        domain_data["entity_resolver"] = EntityResolver(hass)
+    return domain_data["entity_resolver"]
+
+
+@callback
+def async_unload_entity_resolver(hass: HomeAssistant) -> None:
+    """Remove the entity resolver."""
+    domain_data = hass.data.get(DOMAIN_DATA, {})
+    if (resolver := domain_data.pop("entity_resolver", None)) is not None:
+        resolver.async_shutdown()
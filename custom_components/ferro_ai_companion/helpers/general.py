@@ -3,11 +3,26 @@
 # pylint: disable=relative-beyond-top-level
 import logging
 from typing import Any
-from datetime import time
+from datetime import datetime
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import State
 from homeassistant.util import dt as dt_util
 
+from ..const import (
+    CONF_NIGHT_END,
+    CONF_NIGHT_START,
+    CONF_NIGHT_WEEKDAYS,
+    DEFAULT_NIGHT_END,
+    DEFAULT_NIGHT_START,
+    TARIFF_PERIOD_NIGHT,
+    WEEKDAYS,
+)
+from .tariff_calendar import (
+    DEFAULT_TARIFF_CALENDAR,
+    TariffCalendar,
+    night_tariff_calendar,
+)
+
 _LOGGER = logging.getLogger(__name__)
 
 
@@ -47,19 +62,27 @@ def get_parameter(config_entry: ConfigEntry, parameter: str, default_val: Any =
     return default_val
 
 
-def is_nighttime():
-    """Check if it's night"""
-    # Get the current local time (timezone-aware)
-    now = dt_util.now()
+def get_tariff_calendar(config_entry: ConfigEntry) -> TariffCalendar:
+    """Get the tariff calendar of the options, or the default one"""
+    night_start = dt_util.parse_time(
+        get_parameter(config_entry, CONF_NIGHT_START, DEFAULT_NIGHT_START)
+    )
+    night_end = dt_util.parse_time(
+        get_parameter(config_entry, CONF_NIGHT_END, DEFAULT_NIGHT_END)
+    )
+    if night_start is None or night_end is None:
+        _LOGGER.error("Invalid night period, using the default tariff calendar")
+        return DEFAULT_TARIFF_CALENDAR
+    night_weekdays = [
+        WEEKDAYS.index(weekday)
+        for weekday in get_parameter(config_entry, CONF_NIGHT_WEEKDAYS, [])
+        if weekday in WEEKDAYS
+    ]
+    return night_tariff_calendar(night_start, night_end, night_weekdays)
 
-    # Define the start and end times
-    start_time = time(22, 0)  # 22:00
-    end_time = time(6, 0)     # 06:00
 
-    # Check if current time is between start_time and end_time
-    if start_time <= end_time:
-        # Case: tart_time and end_time are same day
-        return start_time <= now.time() <= end_time
-    else:
-        # Case: tart_time and end_time are different days
-        return now.time() >= start_time or now.time() <= end_time
+def is_nighttime(
+    now: datetime | None = None, calendar: TariffCalendar = DEFAULT_TARIFF_CALENDAR
+):
+    """Check if it's night, now or at the given time"""
+    return calendar.period(now) == TARIFF_PERIOD_NIGHT
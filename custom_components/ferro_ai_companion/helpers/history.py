@@ -0,0 +1,44 @@
+"""Recorder history helpers"""
+
+from datetime import timedelta
+import logging
+
+from homeassistant.components.recorder import get_instance, history
+from homeassistant.const import STATE_UNAVAILABLE, STATE_UNKNOWN
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt
+
+_LOGGER = logging.getLogger(__name__)
+
+
+async def async_get_history_values(
+    hass: HomeAssistant, entity_id: str, days: float
+) -> list[tuple[float, float]]:
+    """Get the numeric states of an entity during the last days.
+
+    Returns (timestamp, value) pairs, oldest first. The recorder is queried once,
+    in its executor. Returns an empty list if the recorder is not loaded.
+    """
+    if not entity_id or "recorder" not in hass.config.components:
+        return []
+
+    end_time = dt.utcnow()
+    start_time = end_time - timedelta(days=days)
+    states = await get_instance(hass).async_add_executor_job(
+        history.state_changes_during_period,
+        hass,
+        start_time,
+        end_time,
+        entity_id,
+    )
+
+    values = []
+    for state in states.get(entity_id, []):
+        if state.state in [STATE_UNAVAILABLE, STATE_UNKNOWN]:
+            continue
+        try:
+            values.append((state.last_changed.timestamp(), float(state.state)))
+        except ValueError:
+            continue
+    _LOGGER.debug("Got %s values of %s from history", len(values), entity_id)
+    return values
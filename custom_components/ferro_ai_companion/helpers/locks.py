@@ -0,0 +1,93 @@
+"""Scoped locks with contention statistics."""
+
+import asyncio
+import logging
+import time
+from typing import Any
+
+from homeassistant.core import HomeAssistant, callback
+
+from ..const import DOMAIN_DATA
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class ScopedLock:
+    """asyncio.Lock that records how often and how long callers had to wait."""
+
+    def __init__(self, name: str) -> None:
+        """Initialize."""
+        self.name = name
+        self._lock = asyncio.Lock()
+        self._users = 0  # Holder and waiting callers
+
+        # Diagnostics
+        self.acquired = 0
+        self.contended = 0  # Number of acquisitions that had to wait
+        self.last_wait_s = 0.0
+        self.max_wait_s = 0.0
+        self.total_wait_s = 0.0
+
+    def locked(self) -> bool:
+        """Check if the lock is held."""
+        return self._lock.locked()
+
+    def in_use(self) -> bool:
+        """Check if the lock is held or waited for."""
+        return self._users > 0
+
+    async def __aenter__(self) -> None:
+        """Acquire the lock."""
+        start = time.monotonic()
+        if self._lock.locked():
+            self.contended += 1
+            _LOGGER.debug("Waiting for lock %s", self.name)
+        self._users += 1
+        try:
+            await self._lock.acquire()
+        except BaseException:
+            self._users -= 1
+            raise
+
+        waited = time.monotonic() - start
+        self.last_wait_s = waited
+        self.max_wait_s = max(self.max_wait_s, waited)
+        self.total_wait_s += waited
+        self.acquired += 1
+
+    async def __aexit__(self, *args: Any) -> None:
+        """Release the lock."""
+        self._users -= 1
+        self._lock.release()
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return diagnostics."""
+        return {
+            "locked": self._lock.locked(),
+            "acquired": self.acquired,
+            "contended": self.contended,
+            "last_wait_s": self.last_wait_s,
+            "max_wait_s": self.max_wait_s,
+            "total_wait_s": self.total_wait_s,
+        }
+
+
+def async_get_lock(hass: HomeAssistant, key: str) -> ScopedLock:
+    """Get the lock of key, e.g. a config entry id or an EnergyHub id."""
+    locks: dict[str, ScopedLock] = hass.data.setdefault(DOMAIN_DATA, {}).setdefault(
+        "locks", {}
+    )
+    if key not in locks:
+        locks[key] = ScopedLock(key)
+    return locks[key]
+
+
+@callback
+def async_unload_locks(hass: HomeAssistant) -> None:
+    """Remove the locks that are not held or waited for."""
+    domain_data = hass.data.get(DOMAIN_DATA, {})
+    locks: dict[str, ScopedLock] = domain_data.get("locks", {})
+    for key in [key for key, lock in locks.items() if not lock.in_use()]:
+        del locks[key]
+    if not locks:
+        domain_data.pop("locks", None)
@@ -2,51 +2,99 @@
 This module provides functionality to manage and fetch operation settings"""
 
 import asyncio
-from collections import UserDict
+from dataclasses import dataclass
+from datetime import timedelta
 import logging
+from typing import Any, Callable
 from homeassistant.config_entries import (
     ConfigEntry,
 )
+from homeassistant.const import (
+    EVENT_STATE_CHANGED,
+    EVENT_STATE_REPORTED,
+    STATE_UNAVAILABLE,
+    STATE_UNKNOWN,
+)
 from homeassistant.core import (
+    CALLBACK_TYPE,
+    Event,
+    EventStateChangedData,
     HomeAssistant,
+    callback,
 )
-from homeassistant.exceptions import ServiceNotFound
-from homeassistant.helpers.entity_registry import (
-    RegistryEntry,
-    async_get as async_entity_registry_get,
-)
-from homeassistant.helpers.entity_registry import (
-    EntityRegistry,
-)
+from homeassistant.exceptions import HomeAssistantError, ServiceNotFound
+from homeassistant.helpers.debounce import Debouncer
+from homeassistant.helpers.event import async_track_state_change_event
 from homeassistant.util import dt
 
+from custom_components.ferro_ai_companion.helpers.entity_resolver import (
+    async_get_entity_resolver,
+)
+from custom_components.ferro_ai_companion.helpers.command_worker import (
+    async_get_command_worker,
+    async_release_command_worker,
+)
 from custom_components.ferro_ai_companion.helpers.general import is_nighttime
+from custom_components.ferro_ai_companion.helpers.tariff_calendar import (
+    DEFAULT_TARIFF_CALENDAR,
+    TariffCalendar,
+)
+from custom_components.ferro_ai_companion.helpers.rate_limiter import (
+    async_get_rate_limiter,
+    async_release_rate_limiter,
+)
 
 
 from ..const import (
     BUY_POWER_OFFSET,
     CAPACITY_TARIFF_DIFFERENT_DAY_NIGHT,
     CAPACITY_TARIFF_NONE,
+    FETCH_DATA_TIMEOUT,
+    HISTORY_BOOTSTRAP_DAYS,
     MODE_BUY,
     MODE_PEAK_CHARGE,
     MODE_PEAK_SELL,
     MODE_SELF,
     MODE_SELL,
+    OVERRIDE_ENFORCE_DELAY,
+    OVERRIDE_ENFORCE_MAX,
+    OVERRIDE_ENFORCE_WINDOW,
     OVERRIDE_OFFSET,
+    OVERRIDE_STATE_VERSION,
+    SNAPSHOT_MAX_AGE,
 )
 
 _LOGGER = logging.getLogger(__name__)
 
 
+@dataclass(frozen=True)
+class OperationSettingsSnapshot:
+    """Operation settings as read from EnergyHub at a point in time."""
+
+    discharge_threshold_w: float
+    charge_threshold_w: float
+    max_soc: float
+    timestamp: float  # When the values were read
+
+    def age(self) -> float:
+        """Age of the snapshot in seconds."""
+        return dt.now().timestamp() - self.timestamp
+
+
 class OperationSettings:
     """Class to handle operation settings for Ferro AI Companion."""
 
     def __init__(
-        self, hass: HomeAssistant, config_entry: ConfigEntry, entity_id: str
+        self,
+        hass: HomeAssistant,
+        config_entry: ConfigEntry,
+        entity_id: str,
+        tariff_calendar: TariffCalendar = DEFAULT_TARIFF_CALENDAR,
     ) -> None:
         """Initialize."""
         self._hass = hass
         self._config_entry = config_entry
+        self.tariff_calendar = tariff_calendar  # Day and night of the Buy power
         self._button_get_data = None
         self._button_update = None
         self._number_discharge_threshold = None
@@ -61,35 +109,397 @@ class OperationSettings:
         self.override_active = False
         self.original_discharge_threshold_w = 0
         self.original_charge_threshold_w = 0
+        self._override_timestamp: float | None = None  # Last change of the above
+        self._override_start: float | None = None  # Start of the active override
+        # (start, end) of the recent overrides, for the history bootstrap
+        self._override_periods: list[tuple[float, float]] = []
+        # When EnergyHub last changed the original discharge threshold
+        self.original_threshold_timestamp: float | None = None
+        self._state_listeners: list[Callable[[], None]] = []
+        self._sample_listeners: list[Callable[[float, float], None]] = []
+
+        self._fetch_task: asyncio.Task | None = None  # Fetch in flight
+        self.snapshot: OperationSettingsSnapshot | None = None  # Last fetched data
+
+        # Write-behind queue for the thresholds
+        self._pending_thresholds: tuple[float, float] | None = None
+        self._confirmed_thresholds: tuple[float, float] | None = None
+        self._write_waiters: list[asyncio.Future] = []
+        self._write_task: asyncio.Task | None = None
+
+        # Enforcement of an active override
+        self._enforce_timestamps: list[float] = []
+        self._enforce_debouncer = Debouncer(
+            hass,
+            _LOGGER,
+            cooldown=OVERRIDE_ENFORCE_DELAY,
+            immediate=False,
+            function=self._async_enforce_override,
+        )
+
+        # Ferroamp Operation Settings device
+        self._entity_id = entity_id
+        self._device_id = None
+        self._hub_id: str | None = None  # Key of the rate limiter and command worker
+        self._unsub_thresholds: CALLBACK_TYPE | None = None
+        self._async_resolve_entities()
+
+    @callback
+    def _async_resolve_entities(self) -> None:
+        """Resolve the entities of the Ferroamp Operation Settings device."""
+        if self._entity_id:
+            resolver = async_get_entity_resolver(self._hass)
+            self._device_id = (
+                resolver.async_get_device_id(self._entity_id) or self._device_id
+            )
+            device_entities = resolver.async_get_device_entities(self._device_id)
+            self._button_get_data = device_entities.get("Get data")
+            self._button_update = device_entities.get("Update")
+            self._number_discharge_threshold = device_entities.get(
+                "Discharge threshold"
+            )
+            self._number_charge_threshold = device_entities.get("Charge threshold")
+            self._number_max_soc = device_entities.get("Upper reference")
+
+        hub_id = self._device_id or self._config_entry.entry_id
+        if hub_id != self._hub_id:
+            self._async_release_hub()
+            self._hub_id = hub_id
+            entry_id = self._config_entry.entry_id
+            # Writes are rate limited per EnergyHub, shared by all config entries.
+            self.rate_limiter = async_get_rate_limiter(self._hass, hub_id, entry_id)
+            # Commands are serialized per EnergyHub, shared by all config entries.
+            self.command_worker = async_get_command_worker(self._hass, hub_id, entry_id)
+
+    @callback
+    def _async_release_hub(self) -> None:
+        """Release the rate limiter and command worker of the EnergyHub."""
+        if self._hub_id is not None:
+            entry_id = self._config_entry.entry_id
+            async_release_command_worker(self._hass, self._hub_id, entry_id)
+            async_release_rate_limiter(self._hass, self._hub_id, entry_id)
+            self._hub_id = None
+
+    @callback
+    def _async_registry_updated(
+        self, device_ids: set[str | None], entity_ids: set[str]
+    ) -> None:
+        """Resolve the entities again if the device has been changed."""
+        if self._device_id in device_ids or self._entity_id in entity_ids:
+            _LOGGER.debug("Ferroamp Operation Settings entities changed.")
+            self._async_resolve_entities()
+            if self._unsub_thresholds is not None:
+                self._async_track_thresholds()
+
+    async def async_set_entity_id(self, entity_id: str) -> None:
+        """Use another Ferroamp Operation Settings device.
+
+        An active override is stopped on the old device, and the settings of the
+        new device are fetched without override.
+        """
+        _LOGGER.debug("Ferroamp Operation Settings entity changed to %s", entity_id)
+        if self.override_active:
+            await self.stop_override()
+        if self.write_pending():
+            # Queued writes are for the old device.
+            await self._write_task
+        self._enforce_debouncer.async_cancel()
+        self._enforce_timestamps = []
+        self._confirmed_thresholds = None
+        self.snapshot = None
+
+        self._entity_id = entity_id
+        self._device_id = None
+        self._async_resolve_entities()
+        if self._unsub_thresholds is not None:
+            self._async_track_thresholds()
+        await self.fetch_all_data()
+
+    @callback
+    def async_add_state_listener(self, action: Callable[[], None]) -> CALLBACK_TYPE:
+        """Call action() when the override state has changed."""
+        self._state_listeners.append(action)
+
+        @callback
+        def _async_remove() -> None:
+            self._state_listeners.remove(action)
+
+        return _async_remove
+
+    @callback
+    def async_add_sample_listener(
+        self, action: Callable[[float, float], None]
+    ) -> CALLBACK_TYPE:
+        """Call action(timestamp, discharge_threshold_w) when Ferro AI has changed
+        the discharge threshold."""
+        self._sample_listeners.append(action)
+
+        @callback
+        def _async_remove() -> None:
+            self._sample_listeners.remove(action)
+
+        return _async_remove
+
+    def override_state(self) -> dict[str, Any]:
+        """The override state, to be stored."""
+        return {
+            "version": OVERRIDE_STATE_VERSION,
+            "timestamp": self._override_timestamp,
+            "override_active": self.override_active,
+            "start": self._override_start,
+            "periods": [list(period) for period in self._override_periods],
+            "discharge_threshold_w": self.discharge_threshold_w,
+            "charge_threshold_w": self.charge_threshold_w,
+            "original_discharge_threshold_w": self.original_discharge_threshold_w,
+            "original_charge_threshold_w": self.original_charge_threshold_w,
+        }
+
+    def restore_override_state(self, state: dict[str, Any]) -> None:
+        """Restore a stored override state.
+
+        The next fetch reconciles it with EnergyHub: if the thresholds are
+        still the written ones nothing is written, otherwise the values read
+        become the original ones and the override is written again.
+        """
+        if state.get("version") != OVERRIDE_STATE_VERSION:
+            _LOGGER.debug("Ignoring override state of version %s", state.get("version"))
+            return
+        try:
+            self._override_periods = [
+                (float(start), float(end)) for start, end in state.get("periods", [])
+            ]
+        except (ValueError, TypeError) as e:
+            _LOGGER.error("Failed to restore override periods: %s", e)
+        if not state.get("override_active"):
+            return
+
+        try:
+            self.discharge_threshold_w = float(state["discharge_threshold_w"])
+            self.charge_threshold_w = float(state["charge_threshold_w"])
+            self.original_discharge_threshold_w = float(
+                state["original_discharge_threshold_w"]
+            )
+            self.original_charge_threshold_w = float(
+                state["original_charge_threshold_w"]
+            )
+        except (KeyError, ValueError, TypeError) as e:
+            _LOGGER.error("Failed to restore override state: %s", e)
+            return
+        self.override_active = True
+        self._override_timestamp = state.get("timestamp")
+        self._override_start = state.get("start", self._override_timestamp)
+        _LOGGER.debug("Restored override state from %s", self._override_timestamp)
+
+    @property
+    def discharge_threshold_entity_id(self) -> str | None:
+        """Entity id of the Ferroamp Operation Settings discharge threshold."""
+        return self._number_discharge_threshold
+
+    def override_active_at(self, timestamp: float) -> bool:
+        """Check if an override was active at timestamp.
+
+        Only the overrides of the last HISTORY_BOOTSTRAP_DAYS are known.
+        """
+        periods = list(self._override_periods)
+        if self.override_active and self._override_start is not None:
+            periods.append((self._override_start, dt.now().timestamp()))
+        return any(start <= timestamp <= end for start, end in periods)
+
+    def required_entities(self) -> list[str]:
+        """Entities needed before the first update."""
+        return [
+            entity_id
+            for entity_id in [
+                self._button_get_data,
+                self._button_update,
+                self._number_discharge_threshold,
+                self._number_charge_threshold,
+                self._number_max_soc,
+            ]
+            if entity_id
+        ]
+
+    @callback
+    def async_setup_listeners(self) -> CALLBACK_TYPE:
+        """Start tracking registry and threshold changes.
+
+        Returns a function that stops the tracking.
+        """
+
+        unsub_registry = async_get_entity_resolver(self._hass).async_add_listener(
+            self._async_registry_updated
+        )
+        self._async_track_thresholds()
+
+        @callback
+        def _async_remove_listeners() -> None:
+            unsub_registry()
+            if self._unsub_thresholds is not None:
+                self._unsub_thresholds()
+                self._unsub_thresholds = None
+            self._enforce_debouncer.async_cancel()
+            self._async_release_hub()
+
+        return _async_remove_listeners
+
+    @callback
+    def _async_track_thresholds(self) -> None:
+        """Re-assert an active override as soon as EnergyHub thresholds change."""
+
+        if self._unsub_thresholds is not None:
+            self._unsub_thresholds()
+
+        entity_ids = [
+            entity_id
+            for entity_id in [
+                self._number_discharge_threshold,
+                self._number_charge_threshold,
+            ]
+            if entity_id
+        ]
+
+        @callback
+        def _async_threshold_changed(event: Event[EventStateChangedData]) -> None:
+            new_state = event.data["new_state"]
+            if new_state is None or new_state.state in [
+                STATE_UNAVAILABLE,
+                STATE_UNKNOWN,
+            ]:
+                return
+            # Our own writes are not a reason to re-assert the override.
+            if self.write_pending():
+                return
+            if self.override_active:
+                self._enforce_debouncer.async_schedule_call()
+            elif event.data["entity_id"] == self._number_discharge_threshold:
+                try:
+                    discharge_threshold_w = float(new_state.state)
+                except ValueError:
+                    return
+                for action in self._sample_listeners:
+                    action(new_state.last_changed.timestamp(), discharge_threshold_w)
+
+        self._unsub_thresholds = async_track_state_change_event(
+            self._hass, entity_ids, _async_threshold_changed
+        )
+
+    async def _async_enforce_override(self) -> None:
+        """Re-assert the override if the thresholds have been changed."""
 
-        self._last_update_thresholds = None  # Track last update time
+        if not self.override_active or self.write_pending():
+            return
 
-        if entity_id:
-            entity_registry: EntityRegistry = async_entity_registry_get(hass)
-            registry_entries: UserDict[str, RegistryEntry] = (
-                entity_registry.entities.items()
+        # Loop protection, in case something else keeps fighting the override.
+        now = dt.now().timestamp()
+        self._enforce_timestamps = [
+            timestamp
+            for timestamp in self._enforce_timestamps
+            if now - timestamp < OVERRIDE_ENFORCE_WINDOW
+        ]
+        if len(self._enforce_timestamps) >= OVERRIDE_ENFORCE_MAX:
+            _LOGGER.warning(
+                "Override re-asserted %s times within %s s; waiting for next update.",
+                len(self._enforce_timestamps),
+                OVERRIDE_ENFORCE_WINDOW,
+            )
+            return
+
+        # Restores the overridden thresholds if they have been changed.
+        if self._read_all_data():
+            _LOGGER.debug("Thresholds changed during override; re-asserting.")
+            self._enforce_timestamps.append(now)
+
+    async def get_snapshot(
+        self, max_age: float = SNAPSHOT_MAX_AGE
+    ) -> OperationSettingsSnapshot | None:
+        """Get the operation settings.
+
+        Data is only fetched from EnergyHub if the cached snapshot is missing
+        or older than max_age seconds.
+        """
+
+        if self.snapshot is not None and self.snapshot.age() < max_age:
+            _LOGGER.debug("Using snapshot from %.1f s ago.", self.snapshot.age())
+            return self.snapshot
+        return await self.fetch_all_data()
+
+    async def fetch_all_data(
+        self, timeout: float = FETCH_DATA_TIMEOUT
+    ) -> OperationSettingsSnapshot | None:
+        """Fetch all operation settings data.
+
+        Callers that overlap with a fetch already in flight join that fetch,
+        instead of pressing the "Get data" button again.
+        """
+
+        if self._fetch_task is None or self._fetch_task.done():
+            self._fetch_task = self._hass.async_create_task(
+                self._async_fetch_all_data(timeout),
+                "ferro_ai_companion fetch_all_data",
+            )
+        else:
+            _LOGGER.debug("Joining fetch of operation settings already in flight.")
+        # Shielded, so that a cancelled caller does not cancel the fetch of others.
+        return await asyncio.shield(self._fetch_task)
+
+    async def _async_fetch_all_data(
+        self, timeout: float
+    ) -> OperationSettingsSnapshot | None:
+        """Fetch all operation settings data from EnergyHub.
+
+        The "Get data" button is pressed, and the number entities are read as soon as
+        all of them have been written by the Ferroamp Operation Settings integration.
+        If that does not happen within timeout seconds, the current states are used.
+        """
+
+        # Start listening before the button is pressed, to not miss a quick answer.
+        pending = {
+            entity_id
+            for entity_id in [
+                self._number_discharge_threshold,
+                self._number_charge_threshold,
+                self._number_max_soc,
+            ]
+            if entity_id
+        }
+        received = asyncio.Event()
+        if not pending:
+            received.set()
+
+        @callback
+        def _async_filter(event_data) -> bool:
+            return event_data["entity_id"] in pending
+
+        @callback
+        def _async_number_written(event: Event) -> None:
+            pending.discard(event.data["entity_id"])
+            if not pending:
+                received.set()
+
+        # State changed is fired for new values, state reported for unchanged values.
+        unsubs = [
+            self._hass.bus.async_listen(
+                event_type, _async_number_written, event_filter=_async_filter
             )
-            device_id = None
-            for entry in registry_entries:
-                if entry[1].entity_id == entity_id:
-                    device_id = entry[1].device_id
-                    break
-            if device_id is not None:
-                for entry in registry_entries:
-                    if entry[1].device_id == device_id:
-                        if entry[1].original_name == "Get data":
-                            self._button_get_data = entry[1].entity_id
-                        elif entry[1].original_name == "Update":
-                            self._button_update = entry[1].entity_id
-                        elif entry[1].original_name == "Discharge threshold":
-                            self._number_discharge_threshold = entry[1].entity_id
-                        elif entry[1].original_name == "Charge threshold":
-                            self._number_charge_threshold = entry[1].entity_id
-                        elif entry[1].original_name == "Upper reference":
-                            self._number_max_soc = entry[1].entity_id
-
-    async def fetch_all_data(self) -> None:
-        """Fetch all operation settings data."""
+            for event_type in [EVENT_STATE_CHANGED, EVENT_STATE_REPORTED]
+        ]
+        try:
+            await self.press_get_data()
+            try:
+                async with asyncio.timeout(timeout):
+                    await received.wait()
+            except TimeoutError:
+                _LOGGER.debug(
+                    "No answer from EnergyHub within %s s for %s.", timeout, pending
+                )
+        finally:
+            for unsub in unsubs:
+                unsub()
+
+        return await self.read_all_data()
+
+    async def press_get_data(self) -> None:
+        """Press the "Get data" button."""
 
         try:
             await self._hass.services.async_call(
@@ -107,12 +517,21 @@ class OperationSettings:
                 target={"entity_id": self._button_get_data},
             )
 
-        await asyncio.sleep(4)  # Wait for the data to be fetched
+    async def read_all_data(self) -> OperationSettingsSnapshot | None:
+        """Read the operation settings from the number entities."""
+        self._read_all_data()
+        return self.snapshot
+
+    def _read_all_data(self) -> bool:
+        """Read the operation settings from the number entities.
 
+        Returns True if a write was queued to restore the overridden thresholds.
+        """
+
+        restored = False
         try:
-            discharge_threshold_w = float(
-                self._hass.states.get(self._number_discharge_threshold).state
-            )
+            discharge_state = self._hass.states.get(self._number_discharge_threshold)
+            discharge_threshold_w = float(discharge_state.state)
             charge_threshold_w = float(
                 self._hass.states.get(self._number_charge_threshold).state
             )
@@ -127,21 +546,42 @@ class OperationSettings:
             )
 
             max_soc = float(self._hass.states.get(self._number_max_soc).state)
+            self.snapshot = OperationSettingsSnapshot(
+                discharge_threshold_w,
+                charge_threshold_w,
+                max_soc,
+                dt.now().timestamp(),
+            )
             if max_soc > 0.0:
                 self.max_soc = max_soc
-            if self.override_active:
+            if self.write_pending():
+                # The thresholds on EnergyHub are about to be overwritten,
+                # so the values read now are not trusted.
+                _LOGGER.debug("Write of thresholds pending; ignoring read values.")
+            elif self.override_active:
+                self._confirmed_thresholds = (discharge_threshold_w, charge_threshold_w)
                 # If override is active and the threshold values have been changed,
                 # update the original values and restore the overridden thresholds.
                 if (
                     discharge_threshold_w != self.discharge_threshold_w
                     or charge_threshold_w != self.charge_threshold_w
                 ):
+                    if discharge_threshold_w != self.original_discharge_threshold_w:
+                        self.original_threshold_timestamp = (
+                            discharge_state.last_changed.timestamp()
+                        )
                     self.original_discharge_threshold_w = discharge_threshold_w
                     self.original_charge_threshold_w = charge_threshold_w
                     # Restore the overridden thresholds
-                    await self.update_thresholds()
+                    self.update_thresholds()
+                    restored = True
             else:
                 # If override is not active, update both sets of values
+                self._confirmed_thresholds = (discharge_threshold_w, charge_threshold_w)
+                if discharge_threshold_w != self.original_discharge_threshold_w:
+                    self.original_threshold_timestamp = (
+                        discharge_state.last_changed.timestamp()
+                    )
                 self.discharge_threshold_w = discharge_threshold_w
                 self.charge_threshold_w = charge_threshold_w
                 self.original_discharge_threshold_w = discharge_threshold_w
@@ -150,6 +590,8 @@ class OperationSettings:
         except (ValueError, TypeError) as e:
             _LOGGER.error("Failed to fetch operation settings data: %s", e)
 
+        return restored
+
     async def override(
         self,
         mode: str,
@@ -159,9 +601,11 @@ class OperationSettings:
     ) -> None:
         """Override the operation settings."""
 
-        _LOGGER.debug("Fetching data.")
-        await self.fetch_all_data()
+        _LOGGER.debug("Getting data.")
+        await self.get_snapshot()
 
+        if not self.override_active:
+            self._override_start = dt.now().timestamp()
         self.override_active = True
 
         if mode == MODE_SELF:
@@ -190,7 +634,7 @@ class OperationSettings:
                     self.charge_threshold_w = peak_shaving_threshold + BUY_POWER_OFFSET
                     if (
                         capacity_tariff == CAPACITY_TARIFF_DIFFERENT_DAY_NIGHT
-                        and is_nighttime()
+                        and is_nighttime(calendar=self.tariff_calendar)
                     ):
                         self.discharge_threshold_w = (
                             peak_shaving_threshold_night + BUY_POWER_OFFSET
@@ -207,7 +651,7 @@ class OperationSettings:
         self.discharge_threshold_w += OVERRIDE_OFFSET
         self.charge_threshold_w += OVERRIDE_OFFSET
 
-        await self.update_thresholds()
+        self.update_thresholds()
 
     async def update_override(
         self,
@@ -220,7 +664,7 @@ class OperationSettings:
 
         if self.override_active and mode == MODE_BUY:
             if capacity_tariff == CAPACITY_TARIFF_DIFFERENT_DAY_NIGHT:
-                if is_nighttime():
+                if is_nighttime(calendar=self.tariff_calendar):
                     buy_power = (
                         peak_shaving_threshold_night
                         + BUY_POWER_OFFSET
@@ -234,48 +678,116 @@ class OperationSettings:
                 if self.discharge_threshold_w != buy_power:
                     self.discharge_threshold_w = buy_power
                     self.charge_threshold_w = buy_power
-                    await self.update_thresholds()
+                    self.update_thresholds()
 
     async def stop_override(self) -> None:
         """Stop the override of operation settings."""
 
-        _LOGGER.debug("Fetching data.")
-        await self.fetch_all_data()
-
+        _LOGGER.debug("Getting data.")
+        await self.get_snapshot()
+
+        if self.override_active and self._override_start is not None:
+            self._override_periods.append((self._override_start, dt.now().timestamp()))
+        self._override_start = None
+        self._override_periods = [
+            (start, end)
+            for start, end in self._override_periods
+            if dt.now() - dt.utc_from_timestamp(end)
+            < timedelta(days=HISTORY_BOOTSTRAP_DAYS)
+        ]
         self.override_active = False
         _LOGGER.debug("Stopping override.")
 
         # Restore the original thresholds
         self.discharge_threshold_w = self.original_discharge_threshold_w
         self.charge_threshold_w = self.original_charge_threshold_w
-        await self.update_thresholds()
+        self.update_thresholds()
 
     async def pace_update_thresholds(self) -> None:
-        """Pace the update of thresholds to not more often than once per 10 seconds."""
-        now = dt.now().timestamp()
-        if self._last_update_thresholds and (now - self._last_update_thresholds < 10):
-            _LOGGER.debug("pace_update_thresholds called too soon; waiting.")
-            await asyncio.sleep(10 - (now - self._last_update_thresholds))
-        self._last_update_thresholds = now
-
-    async def update_thresholds(self) -> None:
-        """Update the thresholds."""
-        _LOGGER.debug("Updating thresholds.")
+        """Pace the update of thresholds using the rate limiter of the EnergyHub."""
+        waited = await self.rate_limiter.async_acquire()
+        if waited > 0.1:
+            _LOGGER.debug("pace_update_thresholds waited %.1f s.", waited)
+
+    def write_pending(self) -> bool:
+        """Check if a write of the thresholds is queued or in progress."""
+        return self._write_task is not None and not self._write_task.done()
+
+    def update_thresholds(self) -> asyncio.Future:
+        """Queue an update of the thresholds.
+
+        Returns immediately. Writes queued within the pacing window are merged, the
+        last one wins. The returned future is set to True when the thresholds have
+        been written, or to False if the write was skipped or failed.
+        """
+        _LOGGER.debug("Queuing update of thresholds.")
         _LOGGER.debug("self.discharge_threshold_w = %s", self.discharge_threshold_w)
         _LOGGER.debug("self.charge_threshold_w = %s", self.charge_threshold_w)
 
-        await self.pace_update_thresholds()
+        self._pending_thresholds = (self.discharge_threshold_w, self.charge_threshold_w)
+        self._override_timestamp = dt.now().timestamp()
+        for action in self._state_listeners:
+            action()
+
+        waiter = self._hass.loop.create_future()
+        self._write_waiters.append(waiter)
+        if not self.write_pending():
+            self._write_task = self._hass.async_create_task(
+                self._async_write_thresholds(),
+                "ferro_ai_companion update_thresholds",
+            )
+        return waiter
+
+    async def _async_write_thresholds(self) -> None:
+        """Write queued thresholds until the queue is empty."""
+
+        while self._pending_thresholds is not None:
+            # Skipped writes do not use a token of the rate limiter.
+            if self._pending_thresholds != self._confirmed_thresholds:
+                await self.pace_update_thresholds()
+
+            thresholds = self._pending_thresholds
+            waiters = self._write_waiters
+            self._pending_thresholds = None
+            self._write_waiters = []
+
+            written = False
+            # Checked again, the thresholds may have been confirmed during the wait.
+            if thresholds == self._confirmed_thresholds:
+                _LOGGER.debug("Thresholds %s already set, skipping write.", thresholds)
+            else:
+                try:
+                    await self.write_thresholds(*thresholds)
+                    written = True
+                except HomeAssistantError as e:
+                    _LOGGER.error("Failed to update thresholds: %s", e)
+
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(written)
+
+    async def write_thresholds(
+        self, discharge_threshold_w: float, charge_threshold_w: float
+    ) -> None:
+        """Write the thresholds to EnergyHub."""
+        _LOGGER.debug(
+            "Writing thresholds %s and %s.", discharge_threshold_w, charge_threshold_w
+        )
+
+        # The hub values are about to change, so the snapshot is no longer valid.
+        self.snapshot = None
+        self._confirmed_thresholds = None
 
         await self._hass.services.async_call(
             domain="number",
             service="set_value",
-            service_data={"value": self.discharge_threshold_w},
+            service_data={"value": discharge_threshold_w},
             target={"entity_id": self._number_discharge_threshold},
         )
         await self._hass.services.async_call(
             domain="number",
             service="set_value",
-            service_data={"value": self.charge_threshold_w},
+            service_data={"value": charge_threshold_w},
             target={"entity_id": self._number_charge_threshold},
         )
         await self._hass.services.async_call(
@@ -283,6 +795,7 @@ class OperationSettings:
             service="press",
             target={"entity_id": self._button_update},
         )
+        self._confirmed_thresholds = (discharge_threshold_w, charge_threshold_w)
 
     async def get_mode(self) -> str:
         """Get the current mode."""
@@ -0,0 +1,111 @@
+"""Rate limiting of commands sent to EnergyHub."""
+
+import asyncio
+import logging
+import time
+from typing import Any
+
+from homeassistant.core import HomeAssistant, callback
+
+from ..const import DOMAIN_DATA, HUB_COMMAND_BURST, HUB_COMMAND_INTERVAL
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Token bucket rate limiter. Waiting callers are served in FIFO order."""
+
+    def __init__(self, burst: int, refill_rate: float) -> None:
+        """Initialize. refill_rate is given in tokens per second."""
+        self.burst = burst
+        self.refill_rate = refill_rate
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._lock = asyncio.Lock()
+
+        # Diagnostics
+        self.queue_depth = 0
+        self.last_wait_s = 0.0
+        self.max_wait_s = 0.0
+        self.total_wait_s = 0.0
+        self.acquired = 0
+
+    def _refill(self) -> None:
+        """Add the tokens earned since the last refill."""
+        now = time.monotonic()
+        self._tokens = min(
+            float(self.burst),
+            self._tokens + (now - self._last_refill) * self.refill_rate,
+        )
+        self._last_refill = now
+
+    async def async_acquire(self) -> float:
+        """Wait for a token. Returns the time waited in seconds."""
+        start = time.monotonic()
+        self.queue_depth += 1
+        try:
+            async with self._lock:
+                self._refill()
+                if self._tokens < 1.0:
+                    await asyncio.sleep((1.0 - self._tokens) / self.refill_rate)
+                    self._refill()
+                self._tokens = max(self._tokens - 1.0, 0.0)
+        finally:
+            self.queue_depth -= 1
+
+        waited = time.monotonic() - start
+        self.last_wait_s = waited
+        self.max_wait_s = max(self.max_wait_s, waited)
+        self.total_wait_s += waited
+        self.acquired += 1
+        return waited
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return diagnostics."""
+        return {
+            "burst": self.burst,
+            "refill_rate": self.refill_rate,
+            "tokens": self._tokens,
+            "queue_depth": self.queue_depth,
+            "last_wait_s": self.last_wait_s,
+            "max_wait_s": self.max_wait_s,
+            "total_wait_s": self.total_wait_s,
+            "acquired": self.acquired,
+        }
+
+
+def async_get_rate_limiter(hass: HomeAssistant, hub_id: str, user: str) -> TokenBucket:
+    """Get the rate limiter shared by all users of the same EnergyHub.
+
+    The burst and refill rate are fixed, HUB_COMMAND_BURST writes and then one
+    write per HUB_COMMAND_INTERVAL.
+    """
+    domain_data = hass.data.setdefault(DOMAIN_DATA, {})
+    rate_limiters: dict[str, TokenBucket] = domain_data.setdefault("rate_limiters", {})
+    if hub_id not in rate_limiters:
+        _LOGGER.debug("Creating rate limiter for %s", hub_id)
+        rate_limiters[hub_id] = TokenBucket(
+            HUB_COMMAND_BURST, 1.0 / HUB_COMMAND_INTERVAL
+        )
+    users: dict[str, set[str]] = domain_data.setdefault("rate_limiter_users", {})
+    users.setdefault(hub_id, set()).add(user)
+    return rate_limiters[hub_id]
+
+
+@callback
+def async_release_rate_limiter(hass: HomeAssistant, hub_id: str, user: str) -> None:
+    """Stop using the rate limiter, it is removed when the last user is gone."""
+    domain_data = hass.data.get(DOMAIN_DATA, {})
+    users: dict[str, set[str]] = domain_data.get("rate_limiter_users", {})
+    users.get(hub_id, set()).discard(user)
+    if not users.get(hub_id):
+        _LOGGER.debug("Removing rate limiter for %s", hub_id)
+        users.pop(hub_id, None)
+        domain_data.get("rate_limiters", {}).pop(hub_id, None)
+
+
+@callback
+def async_unload_rate_limiters(hass: HomeAssistant) -> None:
+    """Remove the rate limiters."""
+    hass.data.get(DOMAIN_DATA, {}).pop("rate_limiters", None)
+    hass.data.get(DOMAIN_DATA, {}).pop("rate_limiter_users", None)
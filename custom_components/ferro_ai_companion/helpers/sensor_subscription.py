@@ -0,0 +1,138 @@
+"""Rate limited subscriptions to numeric sensors."""
+
+from collections.abc import Callable, Coroutine, Iterable
+import logging
+import time
+from typing import Any
+
+from homeassistant.core import (
+    CALLBACK_TYPE,
+    Event,
+    EventStateChangedData,
+    HomeAssistant,
+    callback,
+)
+from homeassistant.helpers.event import async_call_later, async_track_state_change_event
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class SensorSubscription:
+    """Report significant changes of a numeric sensor, at most once per interval.
+
+    A value is significant if it differs from the last reported value by at least
+    dead_band, or if it is on the other side of one of the levels. Significant
+    values within min_interval of the last report are held back, and the latest
+    value is reported when the interval has passed.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entity_id: str,
+        action: Callable[[float | None, float], Coroutine[Any, Any, None]],
+        min_interval: float,
+        dead_band: float,
+        levels: Callable[[], Iterable[float]] | None = None,
+    ) -> None:
+        """Initialize. action is called with the last reported and the new value."""
+        self._hass = hass
+        self.entity_id = entity_id
+        self._action = action
+        self.min_interval = min_interval
+        self.dead_band = dead_band
+        self._levels = levels
+
+        self.value: float | None = None  # Latest value
+        self.reported: float | None = None  # Last reported value
+        self._reported_time: float | None = None
+        self._unsub_state: CALLBACK_TYPE | None = None
+        self._unsub_timer: CALLBACK_TYPE | None = None
+
+        # Diagnostics
+        self.received = 0
+        self.reported_count = 0
+
+    @callback
+    def async_start(self) -> CALLBACK_TYPE:
+        """Start tracking the sensor. Returns a function that stops it."""
+        self._unsub_state = async_track_state_change_event(
+            self._hass, [self.entity_id], self._async_state_changed
+        )
+        return self.async_stop
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop tracking the sensor."""
+        if self._unsub_state is not None:
+            self._unsub_state()
+            self._unsub_state = None
+        if self._unsub_timer is not None:
+            self._unsub_timer()
+            self._unsub_timer = None
+
+    def is_significant(self, value: float) -> bool:
+        """Check if value is significant compared to the last reported value."""
+        if self.reported is None:
+            return True
+        if abs(value - self.reported) >= self.dead_band:
+            return True
+        if self._levels is not None:
+            for level in self._levels():
+                if (value >= level) != (self.reported >= level):
+                    return True
+        return False
+
+    @callback
+    def _async_state_changed(self, event: Event[EventStateChangedData]) -> None:
+        """Filter the new state of the sensor."""
+        self.received += 1
+        try:
+            self.value = float(event.data["new_state"].state)
+        except (AttributeError, TypeError, ValueError):
+            return
+
+        if self._unsub_timer is not None or not self.is_significant(self.value):
+            return
+
+        now = time.monotonic()
+        if (
+            self._reported_time is None
+            or now - self._reported_time >= self.min_interval
+        ):
+            self._async_report()
+        else:
+            self._unsub_timer = async_call_later(
+                self._hass,
+                self._reported_time + self.min_interval - now,
+                self._async_interval_passed,
+            )
+
+    @callback
+    def _async_interval_passed(self, _now: Any) -> None:
+        """Report the latest value if it is still significant."""
+        self._unsub_timer = None
+        if self.value is not None and self.is_significant(self.value):
+            self._async_report()
+
+    @callback
+    def _async_report(self) -> None:
+        """Report the latest value."""
+        old_value = self.reported
+        self.reported = self.value
+        self._reported_time = time.monotonic()
+        self.reported_count += 1
+        self._hass.async_create_task(
+            self._action(old_value, self.value),
+            f"ferro_ai_companion {self.entity_id} changed",
+        )
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return diagnostics."""
+        return {
+            "entity_id": self.entity_id,
+            "value": self.value,
+            "reported": self.reported,
+            "received": self.received,
+            "reported_count": self.reported_count,
+        }
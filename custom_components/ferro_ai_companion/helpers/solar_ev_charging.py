@@ -1,35 +1,58 @@
 """Coordinator for Ferro AI Companion"""
 
-from collections import UserDict
 from datetime import datetime
 import logging
+from typing import Callable
 from homeassistant.config_entries import (
     ConfigEntry,
 )
 
 from homeassistant.core import (
+    CALLBACK_TYPE,
     HomeAssistant,
+    callback,
 )
 
 
-from homeassistant.helpers.entity_registry import (
-    RegistryEntry,
-    async_get as async_entity_registry_get,
-)
-from homeassistant.helpers.entity_registry import (
-    EntityRegistry,
-)
-
 # from custom_components.ferro_ai_companion.helpers.price_adaptor import PriceAdaptor
 
 from ..const import (
     CONF_SOLAR_FORECAST_TODAY_REMAINING,
+    SOC_BAND_HIGH,
+    SOC_BAND_LOW,
 )
+from .entity_resolver import async_get_entity_resolver
 from .general import get_parameter
 
 _LOGGER = logging.getLogger(__name__)
 
 
+class SocCrossingDetector:
+    """Detect crossings of the start and stop SOC, with hysteresis.
+
+    The band changes to SOC_BAND_HIGH at the start SOC and back to SOC_BAND_LOW
+    below the stop SOC. Between them the last band is kept.
+    """
+
+    def __init__(self) -> None:
+        """Initialize."""
+        self.band: int | None = None  # None until the SOC leaves the hysteresis
+
+    def update(self, soc: float, start_soc: float, stop_soc: float) -> int | None:
+        """Classify soc. Returns the new band if it changed, otherwise None."""
+        if soc >= start_soc:
+            band = SOC_BAND_HIGH
+        elif soc < stop_soc:
+            band = SOC_BAND_LOW
+        else:
+            return None
+
+        if band == self.band:
+            return None
+        self.band = band
+        return band
+
+
 class SolarEVCharging:
     """Class to handle solar EV charging for Ferro AI Companion."""
 
@@ -55,35 +78,91 @@ class SolarEVCharging:
 
         self.start_soc = 100.0
         self.stop_soc = 95.0
+        self.system_soc: float | None = None  # Last known system SOC
+        self.soc_crossing = SocCrossingDetector()
 
-        if entity_id:
-            entity_registry: EntityRegistry = async_entity_registry_get(hass)
-            registry_entries: UserDict[str, RegistryEntry] = (
-                entity_registry.entities.items()
+        # Ferroamp MQTT Sensors device
+        self._entity_id = entity_id
+        self._device_id = None
+        self._soc_entity_listeners: list[Callable[[], None]] = []
+        self._async_resolve_entities()
+
+    @callback
+    def _async_resolve_entities(self) -> None:
+        """Resolve the entities of the Ferroamp MQTT Sensors device."""
+        if self._entity_id:
+            resolver = async_get_entity_resolver(self._hass)
+            self._device_id = (
+                resolver.async_get_device_id(self._entity_id) or self._device_id
+            )
+            device_entities = resolver.async_get_device_entities(self._device_id)
+            self.sensor_ferroamp_system_state_of_charge = device_entities.get(
+                "System State of Charge"
+            )
+            self._sensor_ferroamp_total_rated_capacity_of_all_batteries = (
+                device_entities.get("Total Rated Capacity of All Batteries")
             )
-            device_id = None
-            for entry in registry_entries:
-                if entry[1].entity_id == entity_id:
-                    device_id = entry[1].device_id
-                    break
-            if device_id is not None:
-                for entry in registry_entries:
-                    if entry[1].device_id == device_id:
-                        if entry[1].original_name == "System State of Charge":
-                            self.sensor_ferroamp_system_state_of_charge = entry[
-                                1
-                            ].entity_id
-                        elif (
-                            entry[1].original_name
-                            == "Total Rated Capacity of All Batteries"
-                        ):
-                            self._sensor_ferroamp_total_rated_capacity_of_all_batteries = entry[
-                                1
-                            ].entity_id
-                        elif entry[1].original_name == "Solar Power":
-                            self._sensor_ferroamp_solar_power = entry[1].entity_id
-                        elif entry[1].original_name == "External Voltage":
-                            self._sensor_ferroamp_external_volatage = entry[1].entity_id
+            self._sensor_ferroamp_solar_power = device_entities.get("Solar Power")
+            self._sensor_ferroamp_external_volatage = device_entities.get(
+                "External Voltage"
+            )
+
+    @callback
+    def _async_registry_updated(
+        self, device_ids: set[str | None], entity_ids: set[str]
+    ) -> None:
+        """Resolve the entities again if the device has been changed."""
+        if self._device_id in device_ids or self._entity_id in entity_ids:
+            _LOGGER.debug("Ferroamp MQTT Sensors entities changed.")
+            soc_entity_id = self.sensor_ferroamp_system_state_of_charge
+            self._async_resolve_entities()
+            if self.sensor_ferroamp_system_state_of_charge != soc_entity_id:
+                self.system_soc = None
+                for action in self._soc_entity_listeners:
+                    action()
+
+    @callback
+    def async_add_soc_entity_listener(
+        self, action: Callable[[], None]
+    ) -> CALLBACK_TYPE:
+        """Call action() when the system SOC entity has been resolved to another
+        entity."""
+        self._soc_entity_listeners.append(action)
+
+        @callback
+        def _async_remove() -> None:
+            self._soc_entity_listeners.remove(action)
+
+        return _async_remove
+
+    @callback
+    def async_set_entity_id(self, entity_id: str) -> None:
+        """Use another Ferroamp MQTT Sensors device."""
+        _LOGGER.debug("Ferroamp MQTT Sensors entity changed to %s", entity_id)
+        self._entity_id = entity_id
+        self._device_id = None
+        self.system_soc = None
+        self._async_resolve_entities()
+
+    def required_entities(self) -> list[str]:
+        """Entities needed before the first update."""
+        return [
+            entity_id
+            for entity_id in [
+                self.sensor_ferroamp_system_state_of_charge,
+                self._sensor_ferroamp_total_rated_capacity_of_all_batteries,
+                self._sensor_ferroamp_solar_power,
+                self._sensor_ferroamp_external_volatage,
+            ]
+            if entity_id
+        ]
+
+    @callback
+    def async_setup_listeners(self) -> CALLBACK_TYPE:
+        """Start tracking registry changes. Returns a function that stops it."""
+        return async_get_entity_resolver(self._hass).async_add_listener(
+            self._async_registry_updated
+        )
 
     async def fetch_all_data(self) -> None:
         """Fetch all operation settings data."""
@@ -148,19 +227,33 @@ class SolarEVCharging:
         _LOGGER.debug("self.start_soc = %s", self.start_soc)
         _LOGGER.debug("self.stop_soc = %s", self.stop_soc)
 
-    async def solar_start_trigger(self) -> None:
-        """Stop solar EV charging."""
-        if self.sensor_ferroamp_system_state_of_charge:
+    async def solar_start_trigger(self, system_soc: float | None = None) -> None:
+        """Check the start conditions when the system SOC reaches the start SOC.
+
+        system_soc is the new system SOC, if None the last known SOC is used.
+        Called when the SOC or the start/stop SOC changes, but the start
+        conditions are only checked once per crossing of the start SOC.
+        """
+        if system_soc is not None:
+            self.system_soc = system_soc
+        elif self.system_soc is None and self.sensor_ferroamp_system_state_of_charge:
             try:
-                ferroamp_sysetem_soc = float(
+                self.system_soc = float(
                     self._hass.states.get(
                         self.sensor_ferroamp_system_state_of_charge
                     ).state
                 )
-                if ferroamp_sysetem_soc >= self.start_soc:
-                    await self.solar_start_conditions()
             except (ValueError, TypeError, AttributeError) as e:
                 _LOGGER.debug(e)
+        if self.system_soc is None:
+            return
+
+        band = self.soc_crossing.update(self.system_soc, self.start_soc, self.stop_soc)
+        if band == SOC_BAND_HIGH:
+            _LOGGER.debug("System SOC %s reached start SOC", self.system_soc)
+            await self.solar_start_conditions()
+        elif band == SOC_BAND_LOW:
+            _LOGGER.debug("System SOC %s fell below stop SOC", self.system_soc)
 
     async def solar_start_conditions(self) -> None:
         """Start solar EV charging."""
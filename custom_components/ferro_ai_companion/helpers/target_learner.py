@@ -0,0 +1,109 @@
+"""Online learner of the peak shaving targets used by Ferro AI"""
+
+from dataclasses import asdict, dataclass
+import logging
+from typing import Any
+
+from ..const import (
+    TARGET_HALF_LIFE,
+    TARGET_MAX_WEIGHT,
+    TARGET_MIN_W,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class TargetCluster:
+    """Decayed running mean of the discharge thresholds of one target."""
+
+    mean: float = 0.0
+    weight: float = 0.0  # Decayed number of samples, at most TARGET_MAX_WEIGHT
+    count: int = 0  # Number of samples
+    timestamp: float | None = None  # Time of the last sample
+
+    def decayed_weight(self, timestamp: float) -> float:
+        """The weight at timestamp."""
+        if self.timestamp is None:
+            return 0.0
+        age = max(0.0, timestamp - self.timestamp)
+        return self.weight * 0.5 ** (age / TARGET_HALF_LIFE)
+
+    def add(self, value: float, timestamp: float) -> None:
+        """Add a sample."""
+        weight = min(self.decayed_weight(timestamp) + 1.0, TARGET_MAX_WEIGHT)
+        self.mean += (value - self.mean) / weight
+        self.weight = weight
+        self.count += 1
+        self.timestamp = timestamp
+
+    def confidence(self, timestamp: float) -> float:
+        """Confidence in the target, from 0 to 1."""
+        return round(self.decayed_weight(timestamp) / TARGET_MAX_WEIGHT, 2)
+
+
+class TargetLearner:
+    """Online model of the discharge thresholds used by Ferro AI.
+
+    The first cluster is the primary (day) target, the second one the secondary
+    (night) target. Each sample updates one cluster in O(1). Clusters that have
+    not been seen for a while lose weight, and follow new values faster.
+    """
+
+    def __init__(self) -> None:
+        self.clusters = [TargetCluster(), TargetCluster()]
+
+    @property
+    def primary(self) -> TargetCluster:
+        """The primary (day) target."""
+        return self.clusters[0]
+
+    @property
+    def secondary(self) -> TargetCluster:
+        """The secondary (night) target."""
+        return self.clusters[1]
+
+    @property
+    def timestamp(self) -> float | None:
+        """Time of the last sample of any target."""
+        timestamps = [
+            cluster.timestamp
+            for cluster in self.clusters
+            if cluster.timestamp is not None
+        ]
+        return max(timestamps, default=None)
+
+    def seed(self, cluster: int, value: float) -> None:
+        """Start a target from a known value, without any weight.
+
+        Nothing changes if the value is the learned target.
+        """
+        if value != self.clusters[cluster].mean:
+            self.clusters[cluster] = TargetCluster(mean=value)
+
+    def add(self, value: float, timestamp: float, cluster: int) -> None:
+        """Add a sample of the discharge threshold to the target cluster.
+
+        Values below TARGET_MIN_W mean no peak shaving and are ignored.
+        """
+        if value <= TARGET_MIN_W:
+            return
+        self.clusters[cluster].add(value, timestamp)
+
+    def as_dict(self) -> dict[str, Any]:
+        """The learned state, to be stored."""
+        return {"clusters": [asdict(cluster) for cluster in self.clusters]}
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "TargetLearner":
+        """Restore a stored state."""
+        learner = cls()
+        try:
+            clusters = [TargetCluster(**cluster) for cluster in data["clusters"]]
+            if len(clusters) != 2:
+                raise ValueError(f"Expected 2 clusters, got {len(clusters)}")
+            learner.clusters = clusters
+        except (KeyError, TypeError, ValueError) as e:
+            _LOGGER.error("Failed to restore learned targets: %s", e)
+            learner.clusters = [TargetCluster(), TargetCluster()]
+        return learner
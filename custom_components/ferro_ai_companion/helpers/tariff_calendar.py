@@ -0,0 +1,142 @@
+"""Tariff calendar"""
+
+from bisect import bisect_right
+from collections.abc import Iterable
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, tzinfo
+
+from homeassistant.util import dt as dt_util
+
+from ..const import (
+    NIGHT_END_HOUR,
+    NIGHT_START_HOUR,
+    TARIFF_CALENDAR_CACHED_DAYS,
+    TARIFF_PERIOD_DAY,
+    TARIFF_PERIOD_NIGHT,
+)
+
+ALL_WEEKDAYS = frozenset(range(7))  # 0 is Monday
+ALL_MONTHS = frozenset(range(1, 13))
+MAX_SEARCH_DAYS = 366
+
+
+@dataclass(frozen=True)
+class TariffRule:
+    """The tariff periods of the days a rule applies to.
+
+    periods are (start, period) pairs sorted by start. Before the first start,
+    the default period of the calendar applies.
+    holidays is True for a rule that only applies on holidays, False for a rule
+    that never applies on holidays, and None for a rule that ignores holidays.
+    """
+
+    periods: tuple[tuple[time, int], ...]
+    weekdays: frozenset[int] = ALL_WEEKDAYS
+    months: frozenset[int] = ALL_MONTHS
+    holidays: bool | None = None
+
+    def applies(self, day: date, holiday: bool) -> bool:
+        """True if the rule applies to day."""
+        if self.holidays is not None and self.holidays != holiday:
+            return False
+        return day.weekday() in self.weekdays and day.month in self.months
+
+
+class TariffCalendar:
+    """The tariff period at any time.
+
+    The first rule that applies to a day gives its periods, days without any rule
+    use the default period. Each day is compiled once into sorted transition
+    timestamps, which are then searched with bisect.
+    """
+
+    def __init__(
+        self,
+        rules: Iterable[TariffRule],
+        default_period: int = TARIFF_PERIOD_DAY,
+        holidays: Iterable[date] = (),
+    ) -> None:
+        self.rules = tuple(rules)
+        self.default_period = default_period
+        self.holidays = frozenset(holidays)
+        self._days: dict[tuple[date, tzinfo], tuple[list[float], list[int]]] = {}
+
+    def _compile(self, day: date, tz: tzinfo) -> tuple[list[float], list[int]]:
+        """Transition timestamps of day and the period starting at each one."""
+        holiday = day in self.holidays
+        rule = next((rule for rule in self.rules if rule.applies(day, holiday)), None)
+
+        timestamps = [datetime.combine(day, time(), tz).timestamp()]
+        periods = [self.default_period]
+        for start, period in rule.periods if rule else ():
+            timestamp = datetime.combine(day, start, tz).timestamp()
+            if timestamp <= timestamps[-1]:
+                periods[-1] = period
+            elif period != periods[-1]:
+                timestamps.append(timestamp)
+                periods.append(period)
+        return timestamps, periods
+
+    def _get_day(self, day: date, tz: tzinfo) -> tuple[list[float], list[int]]:
+        """Compiled day, from the cache if possible."""
+        key = (day, tz)
+        if (compiled := self._days.get(key)) is None:
+            if len(self._days) >= TARIFF_CALENDAR_CACHED_DAYS:
+                self._days.clear()
+            compiled = self._days[key] = self._compile(day, tz)
+        return compiled
+
+    def period(self, when: datetime | None = None) -> int:
+        """The tariff period now or at the given time."""
+        when = dt_util.now() if when is None else dt_util.as_local(when)
+        timestamps, periods = self._get_day(when.date(), when.tzinfo)
+        return periods[bisect_right(timestamps, when.timestamp()) - 1]
+
+    def next_transition(self, when: datetime | None = None) -> datetime | None:
+        """The first time after now, or after the given time, the period changes.
+
+        Returns None if the period does not change within a year.
+        """
+        when = dt_util.now() if when is None else dt_util.as_local(when)
+        current = self.period(when)
+        timestamp = when.timestamp()
+        day = when.date()
+        for _ in range(MAX_SEARCH_DAYS):
+            timestamps, periods = self._get_day(day, when.tzinfo)
+            for index in range(bisect_right(timestamps, timestamp), len(timestamps)):
+                if periods[index] != current:
+                    return dt_util.utc_from_timestamp(timestamps[index])
+            day += timedelta(days=1)
+        return None
+
+
+def night_tariff_calendar(
+    night_start: time, night_end: time, night_weekdays: Iterable[int] = ()
+) -> TariffCalendar:
+    """Calendar with a night period every day, and weekdays that are night all day.
+
+    The night period passes midnight if night_start is after night_end.
+    """
+    if night_start > night_end:
+        periods = (
+            (time(0, 0), TARIFF_PERIOD_NIGHT),
+            (night_end, TARIFF_PERIOD_DAY),
+            (night_start, TARIFF_PERIOD_NIGHT),
+        )
+    else:
+        periods = ((night_start, TARIFF_PERIOD_NIGHT), (night_end, TARIFF_PERIOD_DAY))
+    rules = []
+    if night_weekdays:
+        rules.append(
+            TariffRule(
+                periods=((time(0, 0), TARIFF_PERIOD_NIGHT),),
+                weekdays=frozenset(night_weekdays),
+            )
+        )
+    rules.append(TariffRule(periods=periods))
+    return TariffCalendar(rules)
+
+
+DEFAULT_TARIFF_CALENDAR = night_tariff_calendar(
+    time(NIGHT_START_HOUR, 0), time(NIGHT_END_HOUR, 0)
+)
@@ -65,6 +65,11 @@ class FerroAICompanionSensor(FerroAICompanionEntity, SensorEntity):
         self._attr_native_value = new_value
         self.update_ha_state()
 
+    def set_attributes(self, attributes: dict):
+        """Set new attributes."""
+        self._attr_extra_state_attributes = attributes
+        self.update_ha_state()
+
 
 class FerroAICompanionSensorMode(FerroAICompanionSensor):
     """Ferro AI Companion sensor class."""
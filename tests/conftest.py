@@ -17,8 +17,16 @@
 # pytest includes fixtures OOB which you can use as defined on this page)
 from unittest.mock import patch
 import pytest
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import device_registry as dr, entity_registry as er
 from homeassistant.util import dt as dt_util
 
+from custom_components.ferro_ai_companion.const import (
+    DOMAIN,
+    PLATFORM_FERROAMP,
+    PLATFORM_FERROAMP_OPERATION_SETTINGS,
+)
 from custom_components.ferro_ai_companion.helpers.operation_settings import (
     OperationSettings,
 )
@@ -26,6 +34,7 @@ from custom_components.ferro_ai_companion.helpers.solar_ev_charging import (
     SolarEVCharging,
 )
 
+from tests.const import MOCK_CONFIG_USER_TEMP1
 
 # pylint: disable=invalid-name
 pytest_plugins = "pytest_homeassistant_custom_component"
@@ -90,12 +99,20 @@ def set_cet_timezone_fixture():
         yield
 
 
+# This fixture is used to prevent HomeAssistant from doing Service Calls. The mock is
+# returned, to check the calls or to set a side effect.
+@pytest.fixture(name="mock_service_calls")
+def mock_service_calls_fixture():
+    """Mock service calls."""
+    with patch("homeassistant.core.ServiceRegistry.async_call") as mock_call:
+        yield mock_call
+
+
 # This fixture is used to prevent HomeAssistant from doing Service Calls.
 @pytest.fixture(name="skip_service_calls")
-def skip_service_calls_fixture():
+def skip_service_calls_fixture(mock_service_calls):
     """Skip service calls."""
-    with patch("homeassistant.core.ServiceRegistry.async_call"):
-        yield
+    yield
 
 
 # This fixture is used to prevent calls to update_quarterly().
@@ -152,6 +169,8 @@ def mock_operation_settings_fetch_all_data_fixture():
             ...
     """
 
+    patchers = []
+
     def _mock(
         max_soc=100.0,
         discharge_threshold_w=1000,
@@ -168,10 +187,14 @@ def mock_operation_settings_fetch_all_data_fixture():
                     discharge_threshold_w != self.discharge_threshold_w
                     or charge_threshold_w != self.charge_threshold_w
                 ):
+                    if discharge_threshold_w != self.original_discharge_threshold_w:
+                        self.original_threshold_timestamp = dt_util.now().timestamp()
                     self.original_discharge_threshold_w = discharge_threshold_w
                     self.original_charge_threshold_w = charge_threshold_w
             else:
                 # If override is not active, update both sets of values
+                if discharge_threshold_w != self.original_discharge_threshold_w:
+                    self.original_threshold_timestamp = dt_util.now().timestamp()
                 self.discharge_threshold_w = discharge_threshold_w
                 self.charge_threshold_w = charge_threshold_w
                 self.original_discharge_threshold_w = discharge_threshold_w
@@ -182,9 +205,112 @@ def mock_operation_settings_fetch_all_data_fixture():
             new=_fetch_all_data,
         )
         patcher.start()
+        patchers.append(patcher)
 
     yield _mock
 
+    for patcher in reversed(patchers):
+        patcher.stop()
+
+
+# This fixture registers the entities of a Ferroamp Operation Settings device.
+@pytest.fixture(name="ferroamp_operation_settings_entities")
+async def ferroamp_operation_settings_entities_fixture(hass: HomeAssistant):
+    """Register Ferroamp Operation Settings entities and return their entity ids."""
+    config_entry = MockConfigEntry(
+        domain=PLATFORM_FERROAMP_OPERATION_SETTINGS, entry_id="operation_settings"
+    )
+    config_entry.add_to_hass(hass)
+    device_registry = dr.async_get(hass)
+    device = device_registry.async_get_or_create(
+        config_entry_id=config_entry.entry_id,
+        identifiers={(PLATFORM_FERROAMP_OPERATION_SETTINGS, "energyhub")},
+    )
+    entity_registry = er.async_get(hass)
+    entities = {}
+    for domain, key, original_name in [
+        ("button", "get_data", "Get data"),
+        ("button", "update", "Update"),
+        ("number", "discharge_threshold", "Discharge threshold"),
+        ("number", "charge_threshold", "Charge threshold"),
+        ("number", "upper_reference", "Upper reference"),
+    ]:
+        entry = entity_registry.async_get_or_create(
+            domain,
+            PLATFORM_FERROAMP_OPERATION_SETTINGS,
+            key,
+            config_entry=config_entry,
+            device_id=device.id,
+            original_name=original_name,
+        )
+        entities[key] = entry.entity_id
+    yield entities
+
+
+# This fixture registers the entities of Ferroamp MQTT Sensors devices.
+@pytest.fixture(name="create_ferroamp_sensors_entities")
+def create_ferroamp_sensors_entities_fixture(hass: HomeAssistant):
+    """
+    Factory fixture to register the entities of a Ferroamp MQTT Sensors device,
+    returns their entity ids.
+    Usage:
+        def test_something(create_ferroamp_sensors_entities):
+            entities = create_ferroamp_sensors_entities("energyhub")
+            ...
+    """
+    config_entry = MockConfigEntry(domain=PLATFORM_FERROAMP, entry_id="ferroamp")
+    config_entry.add_to_hass(hass)
+
+    def _create(identifier: str):
+        device = dr.async_get(hass).async_get_or_create(
+            config_entry_id=config_entry.entry_id,
+            identifiers={(PLATFORM_FERROAMP, identifier)},
+        )
+        entities = {}
+        for key, original_name in [
+            ("system_soc", "System State of Charge"),
+            ("total_capacity", "Total Rated Capacity of All Batteries"),
+            ("solar_power", "Solar Power"),
+            ("external_voltage", "External Voltage"),
+        ]:
+            entry = er.async_get(hass).async_get_or_create(
+                "sensor",
+                PLATFORM_FERROAMP,
+                f"{identifier}_{key}",
+                config_entry=config_entry,
+                device_id=device.id,
+                original_name=original_name,
+            )
+            entities[key] = entry.entity_id
+        return entities
+
+    yield _create
+
+
+@pytest.fixture(name="create_operation_settings")
+def create_operation_settings_fixture(
+    hass: HomeAssistant, ferroamp_operation_settings_entities
+):
+    """
+    Factory fixture to create OperationSettings for the Ferroamp Operation Settings
+    entities, with a config entry of its own.
+    Usage:
+        def test_something(create_operation_settings):
+            operation_settings = create_operation_settings(entry_id="test")
+            ...
+    """
+
+    def _create(entry_id="test", entity="discharge_threshold"):
+        config_entry = MockConfigEntry(
+            domain=DOMAIN, data=MOCK_CONFIG_USER_TEMP1, entry_id=entry_id
+        )
+        config_entry.add_to_hass(hass)
+        return OperationSettings(
+            hass, config_entry, ferroamp_operation_settings_entities[entity]
+        )
+
+    yield _create
+
 
 async def mock_solar_ev_charging_fetch_all_data(instance: SolarEVCharging):
     """Mock function for solar_ev_charging.fetch_all_data."""
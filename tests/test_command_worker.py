@@ -0,0 +1,119 @@
+"""Test ferro_ai_companion command worker."""
+
+import asyncio
+
+from homeassistant.core import HomeAssistant
+
+from custom_components.ferro_ai_companion.helpers.command_worker import (
+    CommandWorker,
+    async_get_command_worker,
+    async_release_command_worker,
+    async_unload_command_workers,
+)
+
+# pylint: disable=unused-argument
+
+
+async def test_command_worker_supersedes(hass: HomeAssistant):
+    """Test that only the latest command of each kind is applied, in order."""
+
+    worker = CommandWorker(hass, "test")
+    applied = []
+    release = asyncio.Event()
+
+    async def command(name: str, wait: bool = False):
+        if wait:
+            await release.wait()
+        applied.append(name)
+
+    # A running command is cancelled by a newer one of the same kind
+    worker.async_submit(("test", "mode"), lambda: command("mode 1", wait=True))
+    await asyncio.sleep(0)
+    worker.async_submit(("test", "switch"), lambda: command("switch 1"))
+    worker.async_submit(("test", "mode"), lambda: command("mode 2"))
+    await hass.async_block_till_done()
+    assert applied == ["switch 1", "mode 2"]
+
+    # A queued command is dropped if a newer one of the same kind is submitted
+    applied.clear()
+    worker.async_submit(("test", "mode"), lambda: command("mode 3", wait=True))
+    await asyncio.sleep(0)
+    worker.async_submit(("test", "switch"), lambda: command("switch 2"))
+    worker.async_submit(("test", "switch"), lambda: command("switch 3"))
+    release.set()
+    await hass.async_block_till_done()
+    assert applied == ["mode 3", "switch 3"]
+
+    assert worker.as_dict() == {
+        "queue_depth": 0,
+        "running": False,
+        "submitted": 6,
+        "superseded": 2,
+    }
+
+
+async def test_command_worker_cancel_and_errors(hass: HomeAssistant):
+    """Test cancelling the commands of one owner, and failing commands."""
+
+    worker = CommandWorker(hass, "test")
+    applied = []
+    release = asyncio.Event()
+
+    async def command(name: str, wait: bool = False):
+        if wait:
+            await release.wait()
+        applied.append(name)
+
+    async def failing_command():
+        raise ValueError("Failed")
+
+    worker.async_submit(("test1", "mode"), lambda: command("test1 mode", wait=True))
+    await asyncio.sleep(0)
+    worker.async_submit(("test2", "mode"), failing_command)
+    worker.async_submit(("test1", "switch"), lambda: command("test1 switch"))
+    worker.async_submit(("test2", "switch"), lambda: command("test2 switch"))
+    worker.async_cancel("test1")
+    await hass.async_block_till_done()
+    assert applied == ["test2 switch"]
+
+
+async def test_command_worker_shared_per_hub(
+    hass: HomeAssistant, create_operation_settings
+):
+    """Test that instances using the same EnergyHub share the command worker."""
+
+    operation_settings1 = create_operation_settings("test1")
+    operation_settings2 = create_operation_settings("test2", "charge_threshold")
+    assert operation_settings1.command_worker is operation_settings2.command_worker
+
+    assert (
+        async_get_command_worker(hass, "other", "test1")
+        is not operation_settings1.command_worker
+    )
+
+    # Released commands are cancelled, the last user shuts the worker down.
+    release = asyncio.Event()
+    command_worker = async_get_command_worker(hass, "other", "test2")
+    command_worker.async_submit(("test1", "mode"), release.wait)
+    command_worker.async_submit(("test2", "mode"), release.wait)
+    await asyncio.sleep(0)
+    async_release_command_worker(hass, "other", "test1")
+    assert command_worker.as_dict()["queue_depth"] == 1
+    assert async_get_command_worker(hass, "other", "test1") is command_worker
+    async_release_command_worker(hass, "other", "test1")
+    async_release_command_worker(hass, "other", "test2")
+    await hass.async_block_till_done()
+    assert command_worker.as_dict()["queue_depth"] == 0
+    assert async_get_command_worker(hass, "other", "test1") is not command_worker
+
+    # Unloaded workers are shut down and replaced.
+    release = asyncio.Event()
+    command_worker = operation_settings1.command_worker
+    command_worker.async_submit(("test1", "mode"), release.wait)
+    command_worker.async_submit(("test1", "switch"), release.wait)
+    await asyncio.sleep(0)
+    async_unload_command_workers(hass)
+    await hass.async_block_till_done()
+    assert command_worker.as_dict()["queue_depth"] == 0
+    assert not command_worker.as_dict()["running"]
+    assert create_operation_settings("test3").command_worker is not command_worker
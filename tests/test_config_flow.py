@@ -6,11 +6,28 @@ from unittest.mock import patch
 from homeassistant import config_entries
 from homeassistant.core import HomeAssistant
 from homeassistant.data_entry_flow import FlowResultType
+from homeassistant.helpers import device_registry as dr, entity_registry as er
 
 import pytest
 from pytest_homeassistant_custom_component.common import MockConfigEntry
 
-from custom_components.ferro_ai_companion.const import DOMAIN
+from custom_components.ferro_ai_companion.const import (
+    CONF_EV_SOC_SENSOR,
+    CONF_EV_TARGET_SOC_SENSOR,
+    CONF_MQTT_ENTITY,
+    CONF_NIGHT_END,
+    CONF_NIGHT_START,
+    CONF_NIGHT_WEEKDAYS,
+    CONF_SETTINGS_ENTITY,
+    DEFAULT_NIGHT_END,
+    DEFAULT_NIGHT_START,
+    DOMAIN,
+    PLATFORM_FERROAMP_OPERATION_SETTINGS,
+)
+from custom_components.ferro_ai_companion.helpers.config_flow import (
+    EntityDiscovery,
+    FlowValidator,
+)
 
 from .const import (
     MOCK_CONFIG_ALL,
@@ -120,11 +137,60 @@ async def test_successful_config_flow_option(
     # Check that the option flow is complete and a new entry is created with
     # the input data
     assert result["type"] == FlowResultType.CREATE_ENTRY
-    assert result["data"] == MOCK_CONFIG_USER_TEMP1
+    assert result["data"] == {
+        **MOCK_CONFIG_USER_TEMP1,
+        CONF_NIGHT_START: DEFAULT_NIGHT_START,
+        CONF_NIGHT_END: DEFAULT_NIGHT_END,
+        CONF_NIGHT_WEEKDAYS: [],
+    }
     if "errors" in result.keys():
         assert len(result["errors"]) == 0
 
 
+# Simulate an option flow with an invalid tariff calendar
+async def test_config_flow_option_tariff_calendar(
+    hass: HomeAssistant, bypass_validate_step_user
+):
+    """Test the tariff calendar of the option flow."""
+
+    config_entry: config_entries.ConfigEntry = MockConfigEntry(
+        domain=DOMAIN, data=MOCK_CONFIG_ALL, entry_id="test"
+    )
+    config_entry.add_to_hass(hass)
+
+    result = await hass.config_entries.options.async_init(
+        handler="test", context={"source": "init"}
+    )
+    assert result["type"] == FlowResultType.FORM
+    assert result["step_id"] == "init"
+
+    # The night must not be empty
+    result = await hass.config_entries.options.async_configure(
+        result["flow_id"],
+        user_input={
+            **MOCK_CONFIG_USER,
+            CONF_NIGHT_START: "22:00:00",
+            CONF_NIGHT_END: "22:00:00",
+        },
+    )
+    assert result["type"] == FlowResultType.FORM
+    assert result["step_id"] == "init"
+    assert result["errors"] == {"base": "night_period_empty"}
+
+    result = await hass.config_entries.options.async_configure(
+        result["flow_id"],
+        user_input={
+            **MOCK_CONFIG_USER,
+            CONF_NIGHT_START: "23:00:00",
+            CONF_NIGHT_END: "07:00:00",
+            CONF_NIGHT_WEEKDAYS: ["sat", "sun"],
+        },
+    )
+    assert result["type"] == FlowResultType.CREATE_ENTRY
+    assert result["data"][CONF_NIGHT_START] == "23:00:00"
+    assert result["data"][CONF_NIGHT_WEEKDAYS] == ["sat", "sun"]
+
+
 # Simulate an unsuccessful option flow
 async def test_unsuccessful_config_flow_option(hass: HomeAssistant):
     """Test a option flow."""
@@ -159,3 +225,68 @@ async def test_unsuccessful_config_flow_option(hass: HomeAssistant):
     assert result["type"] == FlowResultType.FORM
     assert result["step_id"] == "init"
     assert len(result["errors"]) > 0
+
+
+async def test_validate_step_solar_without_target_soc(hass: HomeAssistant):
+    """Test that the EV Target SOC entity can be left out or cleared."""
+
+    hass.states.async_set(MOCK_CONFIG_ALL[CONF_EV_SOC_SENSOR], "50")
+    for target_soc in [None, "", " "]:
+        user_input = {CONF_EV_SOC_SENSOR: MOCK_CONFIG_ALL[CONF_EV_SOC_SENSOR]}
+        if target_soc is not None:
+            user_input[CONF_EV_TARGET_SOC_SENSOR] = target_soc
+        assert FlowValidator.validate_step_solar(hass, user_input) is None
+        assert user_input[CONF_EV_TARGET_SOC_SENSOR] == ""
+
+    user_input = {
+        CONF_EV_SOC_SENSOR: MOCK_CONFIG_ALL[CONF_EV_SOC_SENSOR],
+        CONF_EV_TARGET_SOC_SENSOR: MOCK_CONFIG_ALL[CONF_EV_TARGET_SOC_SENSOR],
+    }
+    assert FlowValidator.validate_step_solar(hass, user_input) == (
+        "base",
+        "ev_target_soc_not_found",
+    )
+
+
+async def test_entity_discovery(
+    hass: HomeAssistant, ferroamp_operation_settings_entities
+):
+    """Test discovery of candidate entities."""
+
+    entities = ferroamp_operation_settings_entities
+
+    # A second EnergyHub
+    config_entry = MockConfigEntry(domain=PLATFORM_FERROAMP_OPERATION_SETTINGS)
+    config_entry.add_to_hass(hass)
+    device = dr.async_get(hass).async_get_or_create(
+        config_entry_id=config_entry.entry_id,
+        identifiers={(PLATFORM_FERROAMP_OPERATION_SETTINGS, "energyhub2")},
+    )
+    entry = er.async_get(hass).async_get_or_create(
+        "number",
+        PLATFORM_FERROAMP_OPERATION_SETTINGS,
+        "discharge_threshold2",
+        config_entry=config_entry,
+        device_id=device.id,
+        original_name="Discharge threshold",
+    )
+
+    candidates = EntityDiscovery.discover(hass)
+    assert candidates[CONF_SETTINGS_ENTITY] == [
+        entities["discharge_threshold"],
+        entry.entity_id,
+    ]
+    assert candidates[CONF_MQTT_ENTITY] == []
+    assert EntityDiscovery.first(candidates, CONF_SETTINGS_ENTITY) == (
+        entities["discharge_threshold"]
+    )
+    assert EntityDiscovery.first(candidates, CONF_EV_SOC_SENSOR) == ""
+
+    # The user form proposes the first candidate.
+    result = await hass.config_entries.flow.async_init(
+        DOMAIN, context={"source": config_entries.SOURCE_USER}
+    )
+    assert result["type"] == FlowResultType.FORM
+    for key in result["data_schema"].schema:
+        if key == CONF_SETTINGS_ENTITY:
+            assert key.default() == entities["discharge_threshold"]
@@ -1,17 +1,55 @@
 """Test ferro_ai_companion coordinator."""
 
-from pytest_homeassistant_custom_component.common import MockConfigEntry
+from datetime import timedelta
+from unittest.mock import patch
 
-from homeassistant.config_entries import ConfigEntryState
-from homeassistant.core import HomeAssistant
+import pytest
+
+from pytest_homeassistant_custom_component.common import (
+    MockConfigEntry,
+    async_fire_time_changed,
+    mock_restore_cache,
+)
 
-from custom_components.ferro_ai_companion import async_setup_entry
+from homeassistant.config_entries import ConfigEntryState
+from homeassistant.const import STATE_ON, STATE_UNAVAILABLE
+from homeassistant.core import HomeAssistant, State
+from homeassistant.helpers import device_registry as dr, entity_registry as er
+from homeassistant.util import dt as dt_util
+
+from custom_components.ferro_ai_companion import (
+    async_remove_entry,
+    async_setup_entry,
+    async_unload_entry,
+)
 from custom_components.ferro_ai_companion.coordinator import (
+    STORAGE_KEY,
+    STORAGE_VERSION,
     FerroAICompanionCoordinator,
+    StateChange,
+)
+from custom_components.ferro_ai_companion.const import (
+    CAPACITY_TARIFF_SAME_DAY_NIGHT,
+    CONF_EV_SOC_SENSOR,
+    CONF_MQTT_ENTITY,
+    CONF_SETTINGS_ENTITY,
+    DOMAIN,
+    ENTITY_KEY_AVOID_SELLING_SWITCH,
+    ENTITY_KEY_COMPANION_MODE_SELECT,
+    MODE_AUTO,
+    MODE_PEAK_CHARGE,
+    MODE_SELL,
+    OVERRIDE_OFFSET,
+    OVERRIDE_STATE_VERSION,
+    STARTUP_MAX_WAIT,
+    STORAGE_SAVE_DELAY,
 )
-from custom_components.ferro_ai_companion.const import DOMAIN
 
-from tests.const import MOCK_CONFIG_ALL
+from custom_components.ferro_ai_companion.helpers.operation_settings import (
+    OperationSettings,
+)
+
+from tests.const import MOCK_CONFIG_ALL, MOCK_CONFIG_USER_TEMP1
 
 
 # pylint: disable=unused-argument
@@ -38,13 +76,110 @@ async def test_coordinator(
     coordinator.unsubscribe_listeners()
 
 
-async def test_coordinator_update_targets1(
+async def test_coordinator_dispatch(
     hass: HomeAssistant, skip_service_calls, set_cet_timezone, bypass_validate_input
+):
+    """Test that state changes are dispatched to the registered handlers."""
+
+    config_entry = MockConfigEntry(domain=DOMAIN, data=MOCK_CONFIG_ALL, entry_id="test")
+    config_entry.mock_state(hass=hass, state=ConfigEntryState.LOADED)
+    config_entry.add_to_hass(hass)
+    assert await async_setup_entry(hass, config_entry)
+    await hass.async_block_till_done()
+    coordinator: FerroAICompanionCoordinator = hass.data[DOMAIN][config_entry.entry_id]
+
+    # Tracked input sensors
+    ev_soc_entity_id = MOCK_CONFIG_ALL[CONF_EV_SOC_SENSOR]
+    hass.states.async_set(ev_soc_entity_id, "55")
+    await hass.async_block_till_done()
+    assert coordinator.ev_soc == 55.0
+
+    # Setting up the input sensors again does not add handlers
+    await coordinator.async_setup_input_sensors()
+    assert len(coordinator._handlers[ev_soc_entity_id]) == 1
+
+    # Internal state changes
+    changes = []
+
+    async def handler(change: StateChange):
+        changes.append(change)
+
+    remove = coordinator.register_handler("trigger", handler)
+    await coordinator.generate_event("trigger", 1, 2)
+    await coordinator.generate_event("other", 1, 2)
+    assert changes == [StateChange("trigger", 1, 2)]
+
+    remove()
+    await coordinator.generate_event("trigger", 2, 3)
+    assert len(changes) == 1
+    assert "trigger" not in coordinator._handlers
+
+    # Unsubscribe to listeners
+    coordinator.unsubscribe_listeners()
+    assert ev_soc_entity_id not in coordinator._handlers
+
+
+async def test_coordinator_mqtt_entity_changed(
+    hass: HomeAssistant,
+    skip_service_calls,
+    set_cet_timezone,
+    bypass_validate_input,
+    create_ferroamp_sensors_entities,
+):
+    """Test that the system SOC is tracked on the new device or entity."""
+
+    entities = create_ferroamp_sensors_entities("energyhub")
+    entities2 = create_ferroamp_sensors_entities("energyhub2")
+    config = {**MOCK_CONFIG_ALL, CONF_MQTT_ENTITY: entities["solar_power"]}
+    config_entry = MockConfigEntry(domain=DOMAIN, data=config, entry_id="test")
+    config_entry.mock_state(hass=hass, state=ConfigEntryState.LOADED)
+    config_entry.add_to_hass(hass)
+    assert await async_setup_entry(hass, config_entry)
+    await hass.async_block_till_done()
+    coordinator: FerroAICompanionCoordinator = hass.data[DOMAIN][config_entry.entry_id]
+
+    assert entities["system_soc"] in coordinator._handlers
+    assert coordinator.soc_subscription.entity_id == entities["system_soc"]
+
+    hass.config_entries.async_update_entry(
+        config_entry, options={**config, CONF_MQTT_ENTITY: entities2["solar_power"]}
+    )
+    assert await coordinator.async_apply_options()
+
+    # The handlers and the subscription follow the new SOC entity
+    assert entities["system_soc"] not in coordinator._handlers
+    assert len(coordinator._handlers[entities2["system_soc"]]) == 1
+    assert coordinator.soc_subscription.entity_id == entities2["system_soc"]
+
+    hass.states.async_set(entities2["system_soc"], "50")
+    await hass.async_block_till_done()
+    assert coordinator.soc_subscription.received == 1
+
+    # And the renamed SOC entity
+    er.async_get(hass).async_update_entity(
+        entities2["system_soc"], new_entity_id="sensor.energyhub2_soc"
+    )
+    await hass.async_block_till_done()
+    assert entities2["system_soc"] not in coordinator._handlers
+    assert len(coordinator._handlers["sensor.energyhub2_soc"]) == 1
+    assert coordinator.soc_subscription.entity_id == "sensor.energyhub2_soc"
+
+    # Unsubscribe to listeners
+    coordinator.unsubscribe_listeners()
+
+
+async def test_coordinator_update_targets1(
+    hass: HomeAssistant,
+    skip_service_calls,
+    set_cet_timezone,
+    bypass_validate_input,
+    freezer,
 ):
     """Test Coordinator."""
 
     #    entity_registry: EntityRegistry = async_entity_registry_get(hass)
 
+    freezer.move_to("2025-10-06T12:00:00+02:00")
     config_entry = MockConfigEntry(domain=DOMAIN, data=MOCK_CONFIG_ALL, entry_id="test")
     config_entry.mock_state(hass=hass, state=ConfigEntryState.LOADED)
     config_entry.add_to_hass(hass)
@@ -57,51 +192,66 @@ async def test_coordinator_update_targets1(
     coordinator = hass.data[DOMAIN][config_entry.entry_id]
     assert coordinator is not None
 
+    day = dt_util.parse_datetime("2025-10-06T12:00:00+02:00").timestamp()
+    night = dt_util.parse_datetime("2025-10-06T23:00:00+02:00").timestamp()
+
     # Set initial targets
     coordinator.primary_peak_shaving_target_w = 1000
     coordinator.secondary_peak_shaving_target_w = 2000
 
     coordinator.operation_settings.original_discharge_threshold_w = 1000
-    coordinator.update_peak_shaving_targets()
-    assert coordinator.primary_peak_shaving_target_w == 1000
-    assert coordinator.secondary_peak_shaving_target_w == 2000
+    coordinator.update_peak_shaving_targets(timestamp=day)
+    assert coordinator.primary_peak_shaving_target_w == pytest.approx(1000)
+    assert coordinator.secondary_peak_shaving_target_w == pytest.approx(2000)
 
     coordinator.operation_settings.original_discharge_threshold_w = 2000
-    coordinator.update_peak_shaving_targets()
-    assert coordinator.primary_peak_shaving_target_w == 1000
-    assert coordinator.secondary_peak_shaving_target_w == 2000
+    coordinator.update_peak_shaving_targets(timestamp=night)
+    assert coordinator.primary_peak_shaving_target_w == pytest.approx(1000)
+    assert coordinator.secondary_peak_shaving_target_w == pytest.approx(2000)
 
+    # Each target is the mean of its samples
     coordinator.operation_settings.original_discharge_threshold_w = 900
-    coordinator.update_peak_shaving_targets()
-    assert coordinator.primary_peak_shaving_target_w == 900
-    assert coordinator.secondary_peak_shaving_target_w == 2000
+    coordinator.update_peak_shaving_targets(timestamp=day)
+    assert coordinator.primary_peak_shaving_target_w == pytest.approx(950)
+    assert coordinator.secondary_peak_shaving_target_w == pytest.approx(2000)
 
     coordinator.operation_settings.original_discharge_threshold_w = 1100
-    coordinator.update_peak_shaving_targets()
-    assert coordinator.primary_peak_shaving_target_w == 1100
-    assert coordinator.secondary_peak_shaving_target_w == 2000
+    coordinator.update_peak_shaving_targets(timestamp=day)
+    assert coordinator.primary_peak_shaving_target_w == pytest.approx(1000)
+    assert coordinator.secondary_peak_shaving_target_w == pytest.approx(2000)
 
     coordinator.operation_settings.original_discharge_threshold_w = 2100
-    coordinator.update_peak_shaving_targets()
-    assert coordinator.primary_peak_shaving_target_w == 1100
-    assert coordinator.secondary_peak_shaving_target_w == 2100
+    coordinator.update_peak_shaving_targets(timestamp=night)
+    assert coordinator.primary_peak_shaving_target_w == pytest.approx(1000)
+    assert coordinator.secondary_peak_shaving_target_w == pytest.approx(2050)
 
     coordinator.operation_settings.original_discharge_threshold_w = 1900
-    coordinator.update_peak_shaving_targets()
-    assert coordinator.primary_peak_shaving_target_w == 1100
-    assert coordinator.secondary_peak_shaving_target_w == 1900
+    coordinator.update_peak_shaving_targets(timestamp=night)
+    assert coordinator.primary_peak_shaving_target_w == pytest.approx(1000)
+    assert coordinator.secondary_peak_shaving_target_w == pytest.approx(2000)
+
+    # Samples are classified by tariff period, not by value
+    coordinator.operation_settings.original_discharge_threshold_w = 900
+    coordinator.update_peak_shaving_targets(timestamp=night)
+    assert coordinator.primary_peak_shaving_target_w == pytest.approx(1000)
+    assert coordinator.secondary_peak_shaving_target_w == pytest.approx(1725)
 
     # Unsubscribe to listeners
     coordinator.unsubscribe_listeners()
 
 
 async def test_coordinator_update_targets2(
-    hass: HomeAssistant, skip_service_calls, set_cet_timezone, bypass_validate_input
+    hass: HomeAssistant,
+    skip_service_calls,
+    set_cet_timezone,
+    bypass_validate_input,
+    freezer,
 ):
     """Test Coordinator."""
 
     #    entity_registry: EntityRegistry = async_entity_registry_get(hass)
 
+    freezer.move_to("2025-10-06T12:00:00+02:00")
     config_entry = MockConfigEntry(domain=DOMAIN, data=MOCK_CONFIG_ALL, entry_id="test")
     config_entry.mock_state(hass=hass, state=ConfigEntryState.LOADED)
     config_entry.add_to_hass(hass)
@@ -114,34 +264,38 @@ async def test_coordinator_update_targets2(
     coordinator = hass.data[DOMAIN][config_entry.entry_id]
     assert coordinator is not None
 
+    day = dt_util.parse_datetime("2025-10-06T12:00:00+02:00").timestamp()
+    night = dt_util.parse_datetime("2025-10-06T23:00:00+02:00").timestamp()
+
     # Set initial targets
     coordinator.primary_peak_shaving_target_w = 1086
     coordinator.secondary_peak_shaving_target_w = 2172
 
     coordinator.operation_settings.original_discharge_threshold_w = 1086
-    coordinator.update_peak_shaving_targets()
-    assert coordinator.primary_peak_shaving_target_w == 1086
-    assert coordinator.secondary_peak_shaving_target_w == 2172
+    coordinator.update_peak_shaving_targets(timestamp=day)
+    assert coordinator.primary_peak_shaving_target_w == pytest.approx(1086)
+    assert coordinator.secondary_peak_shaving_target_w == pytest.approx(2172)
 
     coordinator.operation_settings.original_discharge_threshold_w = 710
-    coordinator.update_peak_shaving_targets()
-    assert coordinator.primary_peak_shaving_target_w == 710
-    assert coordinator.secondary_peak_shaving_target_w == 2172
+    coordinator.update_peak_shaving_targets(timestamp=day)
+    assert coordinator.primary_peak_shaving_target_w == pytest.approx(898)
+    assert coordinator.secondary_peak_shaving_target_w == pytest.approx(2172)
 
     coordinator.operation_settings.original_discharge_threshold_w = 1087
-    coordinator.update_peak_shaving_targets()
-    assert coordinator.primary_peak_shaving_target_w == 1087
-    assert coordinator.secondary_peak_shaving_target_w == 2172
+    coordinator.update_peak_shaving_targets(timestamp=day)
+    assert coordinator.primary_peak_shaving_target_w == pytest.approx(961)
+    assert coordinator.secondary_peak_shaving_target_w == pytest.approx(2172)
 
+    # The initial targets have no weight
     coordinator.operation_settings.original_discharge_threshold_w = 2682
-    coordinator.update_peak_shaving_targets()
-    assert coordinator.primary_peak_shaving_target_w == 1087
-    assert coordinator.secondary_peak_shaving_target_w == 2682
+    coordinator.update_peak_shaving_targets(timestamp=night)
+    assert coordinator.primary_peak_shaving_target_w == pytest.approx(961)
+    assert coordinator.secondary_peak_shaving_target_w == pytest.approx(2682)
 
     coordinator.operation_settings.original_discharge_threshold_w = 1341
-    coordinator.update_peak_shaving_targets()
-    assert coordinator.primary_peak_shaving_target_w == 1341
-    assert coordinator.secondary_peak_shaving_target_w == 2682
+    coordinator.update_peak_shaving_targets(timestamp=day)
+    assert coordinator.primary_peak_shaving_target_w == pytest.approx(1056)
+    assert coordinator.secondary_peak_shaving_target_w == pytest.approx(2682)
 
     # Unsubscribe to listeners
     coordinator.unsubscribe_listeners()
@@ -166,19 +320,586 @@ async def test_coordinator_update_targets3(
     coordinator = hass.data[DOMAIN][config_entry.entry_id]
     assert coordinator is not None
 
+    day = dt_util.parse_datetime("2025-10-06T12:00:00+02:00").timestamp()
+    night = dt_util.parse_datetime("2025-10-06T23:00:00+02:00").timestamp()
+
     # Set initial targets
     coordinator.primary_peak_shaving_target_w = 710
     coordinator.secondary_peak_shaving_target_w = 1341
 
     coordinator.operation_settings.original_discharge_threshold_w = 2682
-    coordinator.update_peak_shaving_targets()
+    coordinator.update_peak_shaving_targets(timestamp=night)
     assert coordinator.primary_peak_shaving_target_w == 710
     assert coordinator.secondary_peak_shaving_target_w == 2682
 
     coordinator.operation_settings.original_discharge_threshold_w = 1341
-    coordinator.update_peak_shaving_targets()
+    coordinator.update_peak_shaving_targets(timestamp=day)
     assert coordinator.primary_peak_shaving_target_w == 1341
     assert coordinator.secondary_peak_shaving_target_w == 2682
 
     # Unsubscribe to listeners
     coordinator.unsubscribe_listeners()
+
+
+async def test_coordinator_update_targets_from_outside(
+    hass: HomeAssistant, skip_service_calls, set_cet_timezone, bypass_validate_input
+):
+    """Test that targets set from outside are learned from, not overwritten."""
+
+    config_entry = MockConfigEntry(domain=DOMAIN, data=MOCK_CONFIG_ALL, entry_id="test")
+    config_entry.mock_state(hass=hass, state=ConfigEntryState.LOADED)
+    config_entry.add_to_hass(hass)
+    assert await async_setup_entry(hass, config_entry)
+    await hass.async_block_till_done()
+    coordinator: FerroAICompanionCoordinator = hass.data[DOMAIN][config_entry.entry_id]
+
+    day = dt_util.parse_datetime("2025-10-06T12:00:00+02:00").timestamp()
+    night = dt_util.parse_datetime("2025-10-06T23:00:00+02:00").timestamp()
+
+    coordinator.update_peak_shaving_targets(1000, day)
+    coordinator.update_peak_shaving_targets(2000, night)
+
+    # A new target starts over from the value set
+    coordinator.primary_peak_shaving_target_w = 1500
+    assert coordinator.target_learner.primary.count == 0
+    coordinator.update_peak_shaving_targets(2000, night)
+    assert coordinator.primary_peak_shaving_target_w == pytest.approx(1500)
+    assert coordinator.secondary_peak_shaving_target_w == pytest.approx(2000)
+
+    # Targets cleared by the capacity tariff stay cleared
+    coordinator.capacity_tariff = CAPACITY_TARIFF_SAME_DAY_NIGHT
+    coordinator.apply_capacity_tariff()
+    coordinator.update_peak_shaving_targets(1300, night)
+    assert coordinator.primary_peak_shaving_target_w == pytest.approx(1300)
+    assert coordinator.secondary_peak_shaving_target_w == 0.0
+
+    # Unsubscribe to listeners
+    coordinator.unsubscribe_listeners()
+
+
+async def test_coordinator_update_targets_observed(
+    hass: HomeAssistant,
+    skip_service_calls,
+    set_cet_timezone,
+    freezer,
+    ferroamp_operation_settings_entities,
+):
+    """Test that each change of the discharge threshold is learned once."""
+
+    freezer.move_to("2025-10-06T12:00:00+02:00")
+    entities = ferroamp_operation_settings_entities
+    hass.states.async_set(entities["get_data"], "unknown")
+    hass.states.async_set(entities["update"], "unknown")
+    hass.states.async_set(entities["discharge_threshold"], "1000")
+    hass.states.async_set(entities["charge_threshold"], "0")
+    hass.states.async_set(entities["upper_reference"], "100")
+
+    config = {
+        **MOCK_CONFIG_USER_TEMP1,
+        CONF_SETTINGS_ENTITY: entities["discharge_threshold"],
+    }
+    config_entry = MockConfigEntry(domain=DOMAIN, data=config, entry_id="test")
+    config_entry.mock_state(hass=hass, state=ConfigEntryState.LOADED)
+    config_entry.add_to_hass(hass)
+
+    # EnergyHub answers at once
+    with patch.object(
+        OperationSettings, "fetch_all_data", OperationSettings.read_all_data
+    ):
+        assert await async_setup_entry(hass, config_entry)
+        await hass.async_block_till_done()
+        coordinator: FerroAICompanionCoordinator = hass.data[DOMAIN][
+            config_entry.entry_id
+        ]
+        primary = coordinator.target_learner.primary
+        await coordinator.update_quarterly()
+        assert primary.count == 1
+        assert coordinator.primary_peak_shaving_target_w == 1000
+
+        # Quarterly updates do not learn an unchanged threshold again
+        freezer.move_to("2025-10-06T12:15:00+02:00")
+        await coordinator.update_quarterly()
+        assert primary.count == 1
+
+        # A change is learned when observed, and not again by the next update
+        freezer.move_to("2025-10-06T12:20:00+02:00")
+        hass.states.async_set(entities["discharge_threshold"], "1200")
+        await hass.async_block_till_done()
+        assert primary.count == 2
+        freezer.move_to("2025-10-06T12:30:00+02:00")
+        await coordinator.update_quarterly()
+        assert primary.count == 2
+
+        # During an override, a change is learned from the next update, under
+        # the tariff period of the change. Here the last day threshold, read by
+        # the first update of the night.
+        coordinator.operation_settings.override_active = True
+        coordinator.operation_settings.discharge_threshold_w = 1200 + OVERRIDE_OFFSET
+        coordinator.operation_settings.charge_threshold_w = OVERRIDE_OFFSET
+        freezer.move_to("2025-10-06T21:59:00+02:00")
+        await hass.async_block_till_done()
+        hass.states.async_set(entities["discharge_threshold"], "1400")
+        await hass.async_block_till_done()
+        freezer.move_to("2025-10-06T22:05:00+02:00")
+        await coordinator.update_quarterly()
+        assert primary.count == 3
+        assert coordinator.target_learner.secondary.count == 0
+        assert coordinator.primary_peak_shaving_target_w > 1200
+        assert coordinator.secondary_peak_shaving_target_w == 0
+
+    # Unsubscribe to listeners
+    coordinator.unsubscribe_listeners()
+
+
+async def test_coordinator_device_updated(
+    hass: HomeAssistant, skip_service_calls, set_cet_timezone, bypass_validate_input
+):
+    """Test that renaming the device renames the integration."""
+
+    config_entry = MockConfigEntry(domain=DOMAIN, data=MOCK_CONFIG_ALL, entry_id="test")
+    config_entry.mock_state(hass=hass, state=ConfigEntryState.LOADED)
+    config_entry.add_to_hass(hass)
+    assert await async_setup_entry(hass, config_entry)
+    await hass.async_block_till_done()
+    coordinator: FerroAICompanionCoordinator = hass.data[DOMAIN][config_entry.entry_id]
+
+    device_registry = dr.async_get(hass)
+    device = device_registry.async_get_device(identifiers={(DOMAIN, "test")})
+    assert coordinator.get_device_id() == device.id
+
+    # Events for other devices, or other changes, are filtered out.
+    assert not coordinator.device_event_filter(
+        {"action": "update", "device_id": "other", "changes": {"name_by_user": None}}
+    )
+    assert not coordinator.device_event_filter(
+        {"action": "update", "device_id": device.id, "changes": {"model": None}}
+    )
+    assert coordinator.device_event_filter(
+        {"action": "update", "device_id": device.id, "changes": {"name_by_user": None}}
+    )
+
+    device_registry.async_update_device(device.id, name_by_user="Renamed")
+    await hass.async_block_till_done()
+    assert config_entry.title == "Renamed"
+
+    # Unsubscribe to listeners
+    coordinator.unsubscribe_listeners()
+
+
+async def test_coordinator_start_when_ready(
+    hass: HomeAssistant,
+    skip_service_calls,
+    set_cet_timezone,
+    ferroamp_operation_settings_entities,
+):
+    """Test that the first update is done when the dependencies are ready."""
+
+    entities = ferroamp_operation_settings_entities
+    for entity_id in entities.values():
+        hass.states.async_set(entity_id, STATE_UNAVAILABLE)
+
+    config = {
+        **MOCK_CONFIG_USER_TEMP1,
+        CONF_SETTINGS_ENTITY: entities["discharge_threshold"],
+    }
+    config_entry = MockConfigEntry(domain=DOMAIN, data=config, entry_id="test")
+    config_entry.mock_state(hass=hass, state=ConfigEntryState.LOADED)
+    config_entry.add_to_hass(hass)
+
+    with patch.object(FerroAICompanionCoordinator, "update_initial") as update_initial:
+        assert await async_setup_entry(hass, config_entry)
+        await hass.async_block_till_done()
+        coordinator: FerroAICompanionCoordinator = hass.data[DOMAIN][
+            config_entry.entry_id
+        ]
+        update_initial.assert_not_called()
+        assert not coordinator.initialized
+
+        hass.states.async_set(entities["get_data"], "unknown")
+        hass.states.async_set(entities["update"], "unknown")
+        hass.states.async_set(entities["discharge_threshold"], "1000")
+        hass.states.async_set(entities["charge_threshold"], "0")
+        await hass.async_block_till_done()
+        update_initial.assert_not_called()
+
+        hass.states.async_set(entities["upper_reference"], "100")
+        await hass.async_block_till_done()
+        update_initial.assert_called_once()
+        assert coordinator.initialized
+
+        # No more updates when the dependencies change.
+        hass.states.async_set(entities["upper_reference"], "90")
+        async_fire_time_changed(
+            hass, dt_util.utcnow() + timedelta(seconds=STARTUP_MAX_WAIT + 1)
+        )
+        await hass.async_block_till_done()
+        update_initial.assert_called_once()
+
+    # Unsubscribe to listeners
+    coordinator.unsubscribe_listeners()
+
+
+async def test_coordinator_start_timeout(
+    hass: HomeAssistant,
+    skip_service_calls,
+    set_cet_timezone,
+    ferroamp_operation_settings_entities,
+):
+    """Test that the first update is done even if the dependencies never get ready."""
+
+    entities = ferroamp_operation_settings_entities
+    for entity_id in entities.values():
+        hass.states.async_set(entity_id, STATE_UNAVAILABLE)
+
+    config = {
+        **MOCK_CONFIG_USER_TEMP1,
+        CONF_SETTINGS_ENTITY: entities["discharge_threshold"],
+    }
+    config_entry = MockConfigEntry(domain=DOMAIN, data=config, entry_id="test")
+    config_entry.mock_state(hass=hass, state=ConfigEntryState.LOADED)
+    config_entry.add_to_hass(hass)
+
+    # A failed first update still completes the initialization.
+    with patch.object(
+        FerroAICompanionCoordinator, "update_initial", side_effect=ValueError
+    ) as update_initial:
+        assert await async_setup_entry(hass, config_entry)
+        await hass.async_block_till_done()
+        coordinator: FerroAICompanionCoordinator = hass.data[DOMAIN][
+            config_entry.entry_id
+        ]
+        update_initial.assert_not_called()
+
+        async_fire_time_changed(
+            hass, dt_util.utcnow() + timedelta(seconds=STARTUP_MAX_WAIT + 1)
+        )
+        await hass.async_block_till_done()
+        update_initial.assert_called_once()
+        assert coordinator.initialized
+
+    # Unsubscribe to listeners
+    coordinator.unsubscribe_listeners()
+
+
+async def test_coordinator_storage(
+    hass: HomeAssistant,
+    hass_storage,
+    skip_service_calls,
+    set_cet_timezone,
+    freezer,
+    mock_operation_settings_fetch_all_data,
+):
+    """Test that the targets are stored per config entry with delayed saves."""
+
+    freezer.move_to("2025-10-06T12:00:00+02:00")
+    mock_operation_settings_fetch_all_data(discharge_threshold_w=2000)
+
+    # Data stored by earlier versions in a file shared by all config entries
+    hass_storage[STORAGE_KEY] = {
+        "version": STORAGE_VERSION,
+        "key": STORAGE_KEY,
+        "data": {
+            "test": {
+                "primary_peak_shaving_target_w": 1000.0,
+                "secondary_peak_shaving_target_w": 3000.0,
+            },
+            "other": {
+                "primary_peak_shaving_target_w": 4000.0,
+                "secondary_peak_shaving_target_w": 6000.0,
+            },
+        },
+    }
+
+    other_config_entry = MockConfigEntry(
+        domain=DOMAIN, data=MOCK_CONFIG_USER_TEMP1, entry_id="other"
+    )
+    other_config_entry.add_to_hass(hass)
+    config_entry = MockConfigEntry(
+        domain=DOMAIN, data=MOCK_CONFIG_USER_TEMP1, entry_id="test"
+    )
+    config_entry.mock_state(hass=hass, state=ConfigEntryState.LOADED)
+    config_entry.add_to_hass(hass)
+    assert await async_setup_entry(hass, config_entry)
+    await hass.async_block_till_done()
+    coordinator: FerroAICompanionCoordinator = hass.data[DOMAIN][config_entry.entry_id]
+
+    # The data is moved to the file of the config entry
+    storage_key = f"{STORAGE_KEY}.test"
+    assert hass_storage[storage_key]["data"] == {
+        "primary_peak_shaving_target_w": 1000.0,
+        "secondary_peak_shaving_target_w": 3000.0,
+    }
+    assert list(hass_storage[STORAGE_KEY]["data"]) == ["other"]
+
+    coordinator.primary_peak_shaving_target_w = 1800.0
+    coordinator.secondary_peak_shaving_target_w = 3000.0
+    await coordinator.update_quarterly()
+    assert coordinator.primary_peak_shaving_target_w == 2000.0
+
+    # The save is delayed
+    assert hass_storage[storage_key]["data"]["primary_peak_shaving_target_w"] == 1000.0
+    async_fire_time_changed(
+        hass, dt_util.utcnow() + timedelta(seconds=STORAGE_SAVE_DELAY + 1)
+    )
+    await hass.async_block_till_done()
+    assert hass_storage[storage_key]["data"]["primary_peak_shaving_target_w"] == 2000.0
+    assert (
+        hass_storage[storage_key]["data"]["secondary_peak_shaving_target_w"] == 3000.0
+    )
+    assert await coordinator.async_load_data() == hass_storage[storage_key]["data"]
+
+    # The delayed save completed the request, nothing left to flush
+    with patch.object(coordinator.data_store, "async_save") as async_save:
+        await coordinator.async_flush()
+        async_save.assert_not_called()
+
+    # Nothing changed, nothing to save
+    with patch.object(coordinator.data_store, "async_delay_save") as delay_save:
+        coordinator.update_target_sensors()
+        delay_save.assert_not_called()
+
+    # Pending saves are written when the config entry is unloaded
+    coordinator.primary_peak_shaving_target_w = 2100.0
+    coordinator.async_request_save()
+    assert await async_unload_entry(hass, config_entry)
+    assert hass_storage[storage_key]["data"]["primary_peak_shaving_target_w"] == 2100.0
+    with patch.object(coordinator.data_store, "async_save") as async_save:
+        await coordinator.async_flush()
+        async_save.assert_not_called()
+
+    # The shared file is removed when the last config entry has migrated
+    other_coordinator = FerroAICompanionCoordinator(hass, other_config_entry)
+    assert await other_coordinator.async_load_data() == {
+        "primary_peak_shaving_target_w": 4000.0,
+        "secondary_peak_shaving_target_w": 6000.0,
+    }
+    other_coordinator.unsubscribe_listeners()
+    assert STORAGE_KEY not in hass_storage
+    assert f"{STORAGE_KEY}.other" in hass_storage
+
+    # The stored data is removed with the config entry
+    await async_remove_entry(hass, config_entry)
+    assert storage_key not in hass_storage
+
+
+async def test_coordinator_restore_override(
+    hass: HomeAssistant,
+    hass_storage,
+    skip_service_calls,
+    set_cet_timezone,
+    ferroamp_operation_settings_entities,
+):
+    """Test that an active override is restored and reconciled with one fetch."""
+
+    entities = ferroamp_operation_settings_entities
+    hass.states.async_set(entities["get_data"], "unknown")
+    hass.states.async_set(entities["update"], "unknown")
+
+    def set_thresholds(discharge_threshold_w: float, charge_threshold_w: float):
+        hass.states.async_set(entities["discharge_threshold"], discharge_threshold_w)
+        hass.states.async_set(entities["charge_threshold"], charge_threshold_w)
+        hass.states.async_set(entities["upper_reference"], 100.0)
+
+    # Peak charge override of sell mode, written before the restart
+    set_thresholds(2001.0, 1.0)
+    hass_storage[f"{STORAGE_KEY}.test"] = {
+        "version": STORAGE_VERSION,
+        "key": f"{STORAGE_KEY}.test",
+        "data": {
+            "primary_peak_shaving_target_w": 2000.0,
+            "secondary_peak_shaving_target_w": 4000.0,
+            "override": {
+                "version": OVERRIDE_STATE_VERSION,
+                "timestamp": dt_util.now().timestamp() - 600,
+                "override_active": True,
+                "discharge_threshold_w": 2001.0,
+                "charge_threshold_w": 1.0,
+                "original_discharge_threshold_w": -100000.0,
+                "original_charge_threshold_w": -100000.0,
+            },
+        },
+    }
+
+    config = {
+        **MOCK_CONFIG_USER_TEMP1,
+        CONF_SETTINGS_ENTITY: entities["discharge_threshold"],
+    }
+    config_entry = MockConfigEntry(domain=DOMAIN, data=config, entry_id="test")
+    config_entry.mock_state(hass=hass, state=ConfigEntryState.LOADED)
+    config_entry.add_to_hass(hass)
+    assert await async_setup_entry(hass, config_entry)
+    await hass.async_block_till_done()
+    coordinator: FerroAICompanionCoordinator = hass.data[DOMAIN][config_entry.entry_id]
+    operation_settings = coordinator.operation_settings
+
+    assert coordinator.primary_peak_shaving_target_w == 2000.0
+    assert operation_settings.override_active
+    assert await operation_settings.get_mode() == MODE_PEAK_CHARGE
+    assert await operation_settings.get_original_mode() == MODE_SELL
+
+    # EnergyHub still has the written thresholds, nothing is written
+    with patch("homeassistant.core.ServiceRegistry.async_call") as async_call:
+        async_call.side_effect = lambda *args, **kwargs: set_thresholds(2001.0, 1.0)
+        await operation_settings.fetch_all_data()
+        await hass.async_block_till_done()
+        assert async_call.call_count == 1  # Get data
+    assert operation_settings.override_active
+    assert await operation_settings.get_original_mode() == MODE_SELL
+
+    # The thresholds were changed during the restart, they become the originals
+    with patch("homeassistant.core.ServiceRegistry.async_call") as async_call:
+        async_call.side_effect = lambda *args, **kwargs: set_thresholds(3000.0, 0.0)
+        await operation_settings.fetch_all_data()
+        await hass.async_block_till_done()
+    assert operation_settings.original_discharge_threshold_w == 3000.0
+    assert operation_settings.original_charge_threshold_w == 0.0
+    assert operation_settings.discharge_threshold_w == 2001.0
+    assert operation_settings.override_state()["override_active"]
+
+    # Unsubscribe to listeners
+    coordinator.unsubscribe_listeners()
+
+
+async def test_coordinator_restore_override_after_entities(
+    hass: HomeAssistant,
+    hass_storage,
+    mock_service_calls,
+    set_cet_timezone,
+    ferroamp_operation_settings_entities,
+):
+    """Test that the restored select and switch do not rewrite a restored override."""
+
+    entities = ferroamp_operation_settings_entities
+    hass.states.async_set(entities["get_data"], "unknown")
+    hass.states.async_set(entities["update"], "unknown")
+
+    def set_thresholds(*args, **kwargs):
+        hass.states.async_set(entities["discharge_threshold"], 2001.0)
+        hass.states.async_set(entities["charge_threshold"], 1.0)
+        hass.states.async_set(entities["upper_reference"], 100.0)
+
+    # Avoid Selling override of sell mode in auto mode, written before the restart
+    set_thresholds()
+    mock_service_calls.side_effect = set_thresholds
+    hass_storage[f"{STORAGE_KEY}.test"] = {
+        "version": STORAGE_VERSION,
+        "key": f"{STORAGE_KEY}.test",
+        "data": {
+            "primary_peak_shaving_target_w": 2000.0,
+            "secondary_peak_shaving_target_w": 4000.0,
+            "override": {
+                "version": OVERRIDE_STATE_VERSION,
+                "timestamp": dt_util.now().timestamp() - 600,
+                "override_active": True,
+                "discharge_threshold_w": 2001.0,
+                "charge_threshold_w": 1.0,
+                "original_discharge_threshold_w": -100000.0,
+                "original_charge_threshold_w": -100000.0,
+            },
+        },
+    }
+    mock_restore_cache(
+        hass,
+        [
+            State(f"select.{DOMAIN}_{ENTITY_KEY_COMPANION_MODE_SELECT}", MODE_AUTO),
+            State(f"switch.{DOMAIN}_{ENTITY_KEY_AVOID_SELLING_SWITCH}", STATE_ON),
+        ],
+    )
+
+    config = {
+        **MOCK_CONFIG_USER_TEMP1,
+        CONF_SETTINGS_ENTITY: entities["discharge_threshold"],
+    }
+    config_entry = MockConfigEntry(domain=DOMAIN, data=config, entry_id="test")
+    config_entry.mock_state(hass=hass, state=ConfigEntryState.LOADED)
+    config_entry.add_to_hass(hass)
+    assert await async_setup_entry(hass, config_entry)
+    await hass.async_block_till_done()
+    coordinator: FerroAICompanionCoordinator = hass.data[DOMAIN][config_entry.entry_id]
+    operation_settings = coordinator.operation_settings
+
+    assert coordinator.initialized
+    assert coordinator.select_companion_mode == MODE_AUTO
+    assert coordinator.switch_avoid_selling
+    assert operation_settings.override_active
+    assert await operation_settings.get_original_mode() == MODE_SELL
+
+    # EnergyHub still has the written thresholds, nothing is written
+    assert not [
+        call
+        for call in mock_service_calls.call_args_list
+        if call.kwargs["service"] == "set_value"
+    ]
+
+    # Unsubscribe to listeners
+    coordinator.unsubscribe_listeners()
+
+
+async def test_coordinator_bootstrap_targets(
+    hass: HomeAssistant,
+    skip_service_calls,
+    set_cet_timezone,
+    freezer,
+    ferroamp_operation_settings_entities,
+):
+    """Test that the targets are learned from history."""
+
+    freezer.move_to("2025-10-06T12:00:00+02:00")
+
+    entities = ferroamp_operation_settings_entities
+    config = {
+        **MOCK_CONFIG_USER_TEMP1,
+        CONF_SETTINGS_ENTITY: entities["discharge_threshold"],
+    }
+    config_entry = MockConfigEntry(domain=DOMAIN, data=config, entry_id="test")
+    config_entry.mock_state(hass=hass, state=ConfigEntryState.LOADED)
+    config_entry.add_to_hass(hass)
+    assert await async_setup_entry(hass, config_entry)
+    await hass.async_block_till_done()
+    coordinator: FerroAICompanionCoordinator = hass.data[DOMAIN][config_entry.entry_id]
+
+    def timestamp(date_time: str) -> float:
+        return dt_util.parse_datetime(date_time).timestamp()
+
+    # Overrides written before, known from the stored override state
+    coordinator.operation_settings.restore_override_state(
+        {
+            "version": OVERRIDE_STATE_VERSION,
+            "override_active": False,
+            "periods": [
+                [
+                    timestamp("2025-10-06T04:00:00+02:00"),
+                    timestamp("2025-10-06T06:30:00+02:00"),
+                ]
+            ],
+        }
+    )
+
+    samples = [
+        (timestamp("2025-10-06T02:00:00+02:00"), 2000.0),
+        # Buy mode set by Ferro AI
+        (timestamp("2025-10-06T03:00:00+02:00"), 2100.0),
+        # Written by overrides
+        (timestamp("2025-10-06T04:00:00+02:00"), 2101.0),
+        (timestamp("2025-10-06T05:00:00+02:00"), 100001.0),
+        (timestamp("2025-10-06T06:00:00+02:00"), 1801.0),
+        (timestamp("2025-10-06T08:00:00+02:00"), 1000.0),
+        (timestamp("2025-10-06T09:00:00+02:00"), 1100.0),
+    ]
+    with patch(
+        "custom_components.ferro_ai_companion.coordinator.async_get_history_values",
+        return_value=samples,
+    ) as async_get_history_values:
+        await coordinator.async_bootstrap_targets()
+        assert (
+            async_get_history_values.call_args.args[1]
+            == entities["discharge_threshold"]
+        )
+
+    assert 1000.0 < coordinator.primary_peak_shaving_target_w < 1100.0
+    assert 2000.0 < coordinator.secondary_peak_shaving_target_w < 2100.0
+    assert coordinator.target_learner.primary.count == 2
+    assert coordinator.target_learner.secondary.count == 2
+
+    # Unsubscribe to listeners
+    coordinator.unsubscribe_listeners()
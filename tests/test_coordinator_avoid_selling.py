@@ -25,10 +25,15 @@ from tests.const import MOCK_CONFIG_USER_TEMP1
 
 
 async def test_coordinator_avoid_selling(
-    hass: HomeAssistant, skip_service_calls, mock_operation_settings_fetch_all_data
+    hass: HomeAssistant,
+    skip_service_calls,
+    set_cet_timezone,
+    freezer,
+    mock_operation_settings_fetch_all_data,
 ):
     """Test Coordinator avoid selling."""
 
+    freezer.move_to("2025-10-04T12:10:00+02:00")
     mock_operation_settings_fetch_all_data(
         max_soc=90,
         discharge_threshold_w=1000,
@@ -63,10 +68,12 @@ async def test_coordinator_avoid_selling(
     mode = await coordinator.operation_settings.get_mode()
     assert mode == MODE_SELL
     await coordinator.switch_avoid_selling_update(False)
+    await hass.async_block_till_done()
     # Threshold should remain unchanged
     assert coordinator.operation_settings.discharge_threshold_w == -100000
     assert coordinator.operation_settings.charge_threshold_w == -100000
     await coordinator.switch_avoid_selling_update(True)
+    await hass.async_block_till_done()
     # Threshold should remain unchanged
     assert coordinator.operation_settings.discharge_threshold_w == -100000
     assert coordinator.operation_settings.charge_threshold_w == -100000
@@ -78,10 +85,12 @@ async def test_coordinator_avoid_selling(
     mode = await coordinator.operation_settings.get_mode()
     assert mode == MODE_PEAK_SELL
     await coordinator.switch_avoid_selling_update(False)
+    await hass.async_block_till_done()
     # Threshold should remain unchanged
     assert coordinator.operation_settings.discharge_threshold_w == 1000
     assert coordinator.operation_settings.charge_threshold_w == -100000
     await coordinator.switch_avoid_selling_update(True)
+    await hass.async_block_till_done()
     # Threshold should remain unchanged
     assert coordinator.operation_settings.discharge_threshold_w == 1000
     assert coordinator.operation_settings.charge_threshold_w == -100000
@@ -93,10 +102,12 @@ async def test_coordinator_avoid_selling(
     mode = await coordinator.operation_settings.get_mode()
     assert mode == MODE_PEAK_CHARGE
     await coordinator.switch_avoid_selling_update(False)
+    await hass.async_block_till_done()
     # Threshold should remain unchanged
     assert coordinator.operation_settings.discharge_threshold_w == 1000
     assert coordinator.operation_settings.charge_threshold_w == 0
     await coordinator.switch_avoid_selling_update(True)
+    await hass.async_block_till_done()
     # Threshold should remain unchanged
     assert coordinator.operation_settings.discharge_threshold_w == 1000
     assert coordinator.operation_settings.charge_threshold_w == 0
@@ -108,10 +119,12 @@ async def test_coordinator_avoid_selling(
     mode = await coordinator.operation_settings.get_mode()
     assert mode == MODE_SELF
     await coordinator.switch_avoid_selling_update(False)
+    await hass.async_block_till_done()
     # Threshold should remain unchanged
     assert coordinator.operation_settings.discharge_threshold_w == 0
     assert coordinator.operation_settings.charge_threshold_w == 0
     await coordinator.switch_avoid_selling_update(True)
+    await hass.async_block_till_done()
     # Threshold should remain unchanged
     assert coordinator.operation_settings.discharge_threshold_w == 0
     assert coordinator.operation_settings.charge_threshold_w == 0
@@ -131,12 +144,14 @@ async def test_coordinator_avoid_selling(
     assert mode == MODE_SELL
     # Threshold should be changed
     await coordinator.switch_avoid_selling_update(True)
+    await hass.async_block_till_done()
     assert coordinator.operation_settings.discharge_threshold_w == 1000 + OVERRIDE_OFFSET
     assert coordinator.operation_settings.charge_threshold_w == 0 + OVERRIDE_OFFSET
     mode = await coordinator.operation_settings.get_mode()
     assert mode == MODE_PEAK_CHARGE
     # Threshold should be restored
     await coordinator.switch_avoid_selling_update(False)
+    await hass.async_block_till_done()
     assert coordinator.operation_settings.discharge_threshold_w == -100000
     assert coordinator.operation_settings.charge_threshold_w == -100000
 
@@ -155,12 +170,14 @@ async def test_coordinator_avoid_selling(
     assert mode == MODE_PEAK_SELL
     # Threshold should be changed
     await coordinator.switch_avoid_selling_update(True)
+    await hass.async_block_till_done()
     assert coordinator.operation_settings.discharge_threshold_w == 1000 + OVERRIDE_OFFSET
     assert coordinator.operation_settings.charge_threshold_w == 0 + OVERRIDE_OFFSET
     mode = await coordinator.operation_settings.get_mode()
     assert mode == MODE_PEAK_CHARGE
     # Threshold should be restored
     await coordinator.switch_avoid_selling_update(False)
+    await hass.async_block_till_done()
     assert coordinator.operation_settings.discharge_threshold_w == 1000
     assert coordinator.operation_settings.charge_threshold_w == -100000
 
@@ -179,12 +196,14 @@ async def test_coordinator_avoid_selling(
     assert mode == MODE_SELF
     # Threshold should remain changed
     await coordinator.switch_avoid_selling_update(True)
+    await hass.async_block_till_done()
     assert coordinator.operation_settings.discharge_threshold_w == 0
     assert coordinator.operation_settings.charge_threshold_w == 0
     mode = await coordinator.operation_settings.get_mode()
     assert mode == MODE_SELF
     # Threshold should be restored
     await coordinator.switch_avoid_selling_update(False)
+    await hass.async_block_till_done()
     assert coordinator.operation_settings.discharge_threshold_w == 0
     assert coordinator.operation_settings.charge_threshold_w == 0
 
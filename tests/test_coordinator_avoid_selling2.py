@@ -95,12 +95,14 @@ async def test_coordinator_avoid_selling2(
     await coordinator.generate_event(
         ENTITY_KEY_COMPANION_MODE_SELECT, new_state=MODE_AUTO
     )
+    await hass.async_block_till_done()
     assert coordinator.select_companion_mode == MODE_AUTO
     mode = await coordinator.operation_settings.get_mode()
     assert mode == MODE_SELF
 
     # Avoid selling = True, threshold should remain changed
     await coordinator.switch_avoid_selling_update(True)
+    await hass.async_block_till_done()
     assert coordinator.operation_settings.discharge_threshold_w == 0
     assert coordinator.operation_settings.charge_threshold_w == 0
     mode = await coordinator.operation_settings.get_mode()
@@ -110,6 +112,7 @@ async def test_coordinator_avoid_selling2(
     await coordinator.generate_event(
         ENTITY_KEY_COMPANION_MODE_SELECT, new_state=MODE_BUY
     )
+    await hass.async_block_till_done()
     assert coordinator.select_companion_mode == MODE_BUY
     assert (
         coordinator.operation_settings.discharge_threshold_w
@@ -124,6 +127,7 @@ async def test_coordinator_avoid_selling2(
 
     # Avoid selling = False, threshold should remain changed
     await coordinator.switch_avoid_selling_update(False)
+    await hass.async_block_till_done()
     assert (
         coordinator.operation_settings.discharge_threshold_w
         == 1000 + BUY_POWER_OFFSET + OVERRIDE_OFFSET
@@ -137,6 +141,7 @@ async def test_coordinator_avoid_selling2(
 
     # Avoid selling = True, threshold should remain changed
     await coordinator.switch_avoid_selling_update(True)
+    await hass.async_block_till_done()
     assert (
         coordinator.operation_settings.discharge_threshold_w
         == 1000 + BUY_POWER_OFFSET + OVERRIDE_OFFSET
@@ -152,6 +157,7 @@ async def test_coordinator_avoid_selling2(
     await coordinator.generate_event(
         ENTITY_KEY_COMPANION_MODE_SELECT, new_state=MODE_SELL
     )
+    await hass.async_block_till_done()
     assert coordinator.select_companion_mode == MODE_SELL
     assert (
         coordinator.operation_settings.discharge_threshold_w
@@ -180,12 +186,14 @@ async def test_coordinator_avoid_selling2(
     await coordinator.generate_event(
         ENTITY_KEY_COMPANION_MODE_SELECT, new_state=MODE_AUTO
     )
+    await hass.async_block_till_done()
     assert coordinator.select_companion_mode == MODE_AUTO
     mode = await coordinator.operation_settings.get_mode()
     assert mode == MODE_PEAK_CHARGE
 
     # Avoid selling = False, threshold should be restored to sell
     await coordinator.switch_avoid_selling_update(False)
+    await hass.async_block_till_done()
     assert coordinator.operation_settings.discharge_threshold_w == -100000
     assert coordinator.operation_settings.charge_threshold_w == -100000
     mode = await coordinator.operation_settings.get_mode()
@@ -193,6 +201,7 @@ async def test_coordinator_avoid_selling2(
 
     # Avoid selling = True, threshold should change
     await coordinator.switch_avoid_selling_update(True)
+    await hass.async_block_till_done()
     assert (
         coordinator.operation_settings.discharge_threshold_w == 1000 + OVERRIDE_OFFSET
     )
@@ -12,6 +12,9 @@ from custom_components.ferro_ai_companion.const import (
     CAPACITY_TARIFF_DIFFERENT_DAY_NIGHT,
     CAPACITY_TARIFF_NONE,
     CAPACITY_TARIFF_SAME_DAY_NIGHT,
+    CONF_NIGHT_END,
+    CONF_NIGHT_START,
+    CONF_NIGHT_WEEKDAYS,
     DOMAIN,
     MODE_BUY,
     MODE_PEAK_CHARGE,
@@ -228,3 +231,70 @@ async def test_coordinator_is_nighttime(
 
     # Unsubscribe to listeners
     coordinator.unsubscribe_listeners()
+
+
+async def test_coordinator_is_nighttime_options(
+    hass: HomeAssistant,
+    skip_service_calls,
+    set_cet_timezone,
+    freezer,
+    mock_operation_settings_fetch_all_data,
+):
+    """Test that the Buy power follows the tariff calendar of the options."""
+    mock_operation_settings_fetch_all_data(
+        max_soc=90,
+        discharge_threshold_w=1000,
+        charge_threshold_w=1000,
+    )
+
+    # Friday evening
+    freezer.move_to("2025-09-26T22:30:00+02:00")
+
+    config_entry = MockConfigEntry(
+        domain=DOMAIN,
+        data=MOCK_CONFIG_ALL,
+        options={
+            CONF_NIGHT_START: "23:00:00",
+            CONF_NIGHT_END: "07:00:00",
+            CONF_NIGHT_WEEKDAYS: ["sat", "sun"],
+        },
+        entry_id="test",
+    )
+    config_entry.add_to_hass(hass)
+    coordinator = FerroAICompanionCoordinator(hass, config_entry)
+    await hass.async_block_till_done()
+    assert coordinator.operation_settings.tariff_calendar is coordinator.tariff_calendar
+
+    coordinator.primary_peak_shaving_target_w = 1000
+    coordinator.secondary_peak_shaving_target_w = 2000
+    operation_settings = coordinator.operation_settings
+    capacity_tariff = CAPACITY_TARIFF_DIFFERENT_DAY_NIGHT
+
+    # Still day with the options, night with the default calendar
+    await operation_settings.override(MODE_BUY, 1000, 2000, capacity_tariff)
+    assert operation_settings.discharge_threshold_w == (
+        1000 + OVERRIDE_OFFSET + BUY_POWER_OFFSET
+    )
+
+    freezer.move_to("2025-09-26T23:01:00+02:00")
+    await operation_settings.update_override(MODE_BUY, 1000, 2000, capacity_tariff)
+    assert operation_settings.discharge_threshold_w == (
+        2000 + OVERRIDE_OFFSET + BUY_POWER_OFFSET
+    )
+
+    # Saturday is night all day
+    freezer.move_to("2025-09-27T12:00:00+02:00")
+    await operation_settings.update_override(MODE_BUY, 1000, 2000, capacity_tariff)
+    assert operation_settings.discharge_threshold_w == (
+        2000 + OVERRIDE_OFFSET + BUY_POWER_OFFSET
+    )
+
+    # Monday
+    freezer.move_to("2025-09-29T12:00:00+02:00")
+    await operation_settings.update_override(MODE_BUY, 1000, 2000, capacity_tariff)
+    assert operation_settings.discharge_threshold_w == (
+        1000 + OVERRIDE_OFFSET + BUY_POWER_OFFSET
+    )
+
+    # Unsubscribe to listeners
+    coordinator.unsubscribe_listeners()
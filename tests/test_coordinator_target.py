@@ -117,6 +117,7 @@ async def test_coordinator_target(
     await coordinator.generate_event(
         ENTITY_KEY_COMPANION_MODE_SELECT, new_state=MODE_BUY
     )
+    await hass.async_block_till_done()
     assert coordinator.select_companion_mode == MODE_BUY
     mode = await coordinator.operation_settings.get_mode()
     assert mode == MODE_BUY
@@ -1,9 +1,13 @@
 """Test ferro_ai_companion coordinator."""
 
-from pytest_homeassistant_custom_component.common import MockConfigEntry
+from pytest_homeassistant_custom_component.common import (
+    MockConfigEntry,
+    async_fire_time_changed,
+)
 
 from homeassistant.config_entries import ConfigEntryState
 from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
 
 from custom_components.ferro_ai_companion import async_setup_entry
 from custom_components.ferro_ai_companion.coordinator import (
@@ -79,32 +83,83 @@ async def test_current_peak_shaving_target1(
     # Verify different day and night targets
     coordinator.capacity_tariff = CAPACITY_TARIFF_DIFFERENT_DAY_NIGHT
 
-    await coordinator.update_every_five_minutes()
+    coordinator.update_current_peak_shaving_target()
     assert coordinator.sensor_current_peak_shaving_target.state == 3005
 
     freezer.move_to("2025-10-07T22:20:00+02:00")
-    await coordinator.update_every_five_minutes()
+    coordinator.update_current_peak_shaving_target()
     assert coordinator.sensor_current_peak_shaving_target.state == 6011
 
     # Verify same day and night targets
     coordinator.capacity_tariff = CAPACITY_TARIFF_SAME_DAY_NIGHT
 
-    await coordinator.update_every_five_minutes()
+    coordinator.update_current_peak_shaving_target()
     assert coordinator.sensor_current_peak_shaving_target.state == 3005
 
     freezer.move_to("2025-10-07T22:20:00+02:00")
-    await coordinator.update_every_five_minutes()
+    coordinator.update_current_peak_shaving_target()
     assert coordinator.sensor_current_peak_shaving_target.state == 3005
 
     # No tariffs
     coordinator.capacity_tariff = CAPACITY_TARIFF_NONE
 
-    await coordinator.update_every_five_minutes()
+    coordinator.update_current_peak_shaving_target()
     assert coordinator.sensor_current_peak_shaving_target.state == 0.0
 
     freezer.move_to("2025-10-07T22:20:00+02:00")
-    await coordinator.update_every_five_minutes()
+    coordinator.update_current_peak_shaving_target()
     assert coordinator.sensor_current_peak_shaving_target.state == 0.0
 
     # Unsubscribe to listeners
     coordinator.unsubscribe_listeners()
+
+
+async def test_current_peak_shaving_target_at_transition(
+    hass: HomeAssistant,
+    skip_service_calls,
+    set_cet_timezone,
+    freezer,
+    mock_operation_settings_fetch_all_data,
+):
+    """Test that the current target switches exactly at the tariff transition."""
+
+    freezer.move_to("2025-10-07T21:50:00+02:00")
+    mock_operation_settings_fetch_all_data(
+        max_soc=90,
+        discharge_threshold_w=3005,
+        charge_threshold_w=0,
+    )
+
+    config_entry = MockConfigEntry(
+        domain=DOMAIN, data=MOCK_CONFIG_USER_TEMP1, entry_id="test"
+    )
+    config_entry.mock_state(hass=hass, state=ConfigEntryState.LOADED)
+    config_entry.add_to_hass(hass)
+    assert await async_setup_entry(hass, config_entry)
+    await hass.async_block_till_done()
+    coordinator: FerroAICompanionCoordinator = hass.data[DOMAIN][config_entry.entry_id]
+
+    coordinator.primary_peak_shaving_target_w = 3005
+    coordinator.secondary_peak_shaving_target_w = 6011
+    coordinator.update_target_sensors()
+    assert coordinator.sensor_current_peak_shaving_target.state == 3005
+
+    # Nothing happens before the transition
+    freezer.move_to("2025-10-07T21:59:59+02:00")
+    async_fire_time_changed(hass, dt_util.utcnow())
+    await hass.async_block_till_done()
+    assert coordinator.sensor_current_peak_shaving_target.state == 3005
+
+    freezer.move_to("2025-10-07T22:00:00+02:00")
+    async_fire_time_changed(hass, dt_util.utcnow())
+    await hass.async_block_till_done()
+    assert coordinator.sensor_current_peak_shaving_target.state == 6011
+
+    # The next transition is scheduled
+    freezer.move_to("2025-10-08T06:00:00+02:00")
+    async_fire_time_changed(hass, dt_util.utcnow())
+    await hass.async_block_till_done()
+    assert coordinator.sensor_current_peak_shaving_target.state == 3005
+
+    # Unsubscribe to listeners
+    coordinator.unsubscribe_listeners()
@@ -0,0 +1,114 @@
+"""Test ferro_ai_companion entity resolver."""
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import entity_registry as er
+
+from custom_components.ferro_ai_companion.const import CONF_SETTINGS_ENTITY
+from custom_components.ferro_ai_companion.helpers.config_flow import EntityDiscovery
+from custom_components.ferro_ai_companion.helpers.entity_resolver import (
+    async_get_entity_resolver,
+    async_unload_entity_resolver,
+)
+
+# pylint: disable=unused-argument
+
+
+async def test_entity_resolver(
+    hass: HomeAssistant,
+    ferroamp_operation_settings_entities,
+    create_operation_settings,
+):
+    """Test the entity resolver."""
+
+    entities = ferroamp_operation_settings_entities
+    resolver = async_get_entity_resolver(hass)
+    assert resolver is async_get_entity_resolver(hass)
+
+    device_id = resolver.async_get_device_id(entities["get_data"])
+    assert device_id is not None
+    device_entities = resolver.async_get_device_entities(device_id)
+    assert device_entities["Get data"] == entities["get_data"]
+    assert device_entities["Upper reference"] == entities["upper_reference"]
+    assert resolver.async_get_device_entities(None) == {}
+    assert resolver.async_get_device_id("sensor.not_found") is None
+
+    # The index is built once and reused.
+    candidates = EntityDiscovery.discover(hass)
+    assert candidates[CONF_SETTINGS_ENTITY] == [entities["discharge_threshold"]]
+    operation_settings = create_operation_settings()
+    assert (
+        operation_settings._number_max_soc  # pylint: disable=protected-access
+        == entities["upper_reference"]
+    )
+    assert resolver.builds == 1
+
+    # The index follows changes in the entity registry.
+    entity_registry = er.async_get(hass)
+    entity_registry.async_update_entity(
+        entities["get_data"], new_entity_id="button.renamed_get_data"
+    )
+    await hass.async_block_till_done()
+    device_entities = resolver.async_get_device_entities(device_id)
+    assert device_entities["Get data"] == "button.renamed_get_data"
+
+
+async def test_entity_resolver_incremental(
+    hass: HomeAssistant,
+    ferroamp_operation_settings_entities,
+    create_operation_settings,
+):
+    """Test that registry updates are patched into the index and resolved entities."""
+
+    entities = ferroamp_operation_settings_entities
+    resolver = async_get_entity_resolver(hass)
+    operation_settings = create_operation_settings()
+    unsub = operation_settings.async_setup_listeners()
+    assert resolver.builds == 1
+
+    # Rename
+    entity_registry = er.async_get(hass)
+    entity_registry.async_update_entity(
+        entities["charge_threshold"], new_entity_id="number.renamed_charge_threshold"
+    )
+    await hass.async_block_till_done()
+    assert (
+        operation_settings._number_charge_threshold  # pylint: disable=protected-access
+        == "number.renamed_charge_threshold"
+    )
+
+    # Remove and re-create
+    entry = entity_registry.async_get(entities["upper_reference"])
+    entity_registry.async_remove(entities["upper_reference"])
+    await hass.async_block_till_done()
+    assert (
+        operation_settings._number_max_soc is None  # pylint: disable=protected-access
+    )
+    new_entry = entity_registry.async_get_or_create(
+        "number",
+        entry.platform,
+        "upper_reference_new",
+        config_entry=hass.config_entries.async_get_entry(entry.config_entry_id),
+        device_id=entry.device_id,
+        original_name="Upper reference",
+    )
+    await hass.async_block_till_done()
+    assert (
+        operation_settings._number_max_soc  # pylint: disable=protected-access
+        == new_entry.entity_id
+    )
+
+    # No full rebuild was needed.
+    assert resolver.builds == 1
+
+    unsub()
+
+    # Unloaded resolvers are replaced, and no longer follow the registry.
+    async_unload_entity_resolver(hass)
+    assert async_get_entity_resolver(hass) is not resolver
+    calls = []
+    resolver.async_add_listener(lambda *args: calls.append(args))
+    entity_registry.async_update_entity(
+        entities["discharge_threshold"], new_entity_id="number.renamed_discharge"
+    )
+    await hass.async_block_till_done()
+    assert calls == []
@@ -0,0 +1,42 @@
+"""Test ferro_ai_companion history helpers."""
+
+import pytest
+from pytest_homeassistant_custom_component.components.recorder.common import (
+    async_wait_recording_done,
+)
+
+from homeassistant.core import HomeAssistant
+
+from custom_components.ferro_ai_companion.helpers.history import (
+    async_get_history_values,
+)
+
+# pylint: disable=unused-argument
+
+
+@pytest.fixture(autouse=True)
+async def mock_recorder_before_hass(async_setup_recorder_instance):
+    """Set up the recorder before hass, as the recorder tests of Home Assistant do."""
+
+
+async def test_get_history_values(recorder_mock, hass: HomeAssistant):
+    """Test that the numeric states are read from the recorder."""
+
+    entity_id = "number.discharge_threshold"
+    for state in ["1000", "unavailable", "2000", "unknown", "1100"]:
+        hass.states.async_set(entity_id, state)
+        await hass.async_block_till_done()
+    await async_wait_recording_done(hass)
+
+    values = await async_get_history_values(hass, entity_id, 1)
+    assert [value for _, value in values] == [1000.0, 2000.0, 1100.0]
+    timestamps = [timestamp for timestamp, _ in values]
+    assert timestamps == sorted(timestamps)
+
+
+async def test_get_history_values_no_recorder(hass: HomeAssistant):
+    """Test that nothing is returned without the recorder."""
+
+    hass.states.async_set("number.discharge_threshold", "1000")
+    assert not await async_get_history_values(hass, "number.discharge_threshold", 1)
+    assert not await async_get_history_values(hass, None, 1)
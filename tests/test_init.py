@@ -1,17 +1,29 @@
 """Test ferro_ai_companion setup process."""
 
+import asyncio
+from unittest.mock import patch
+
 from homeassistant.config_entries import ConfigEntryState
-from homeassistant.exceptions import ConfigEntryNotReady
-import pytest
 from pytest_homeassistant_custom_component.common import MockConfigEntry
 
 from custom_components.ferro_ai_companion import (
+    async_entry_updated,
     async_migrate_entry,
     async_reload_entry,
     async_setup_entry,
     async_unload_entry,
 )
-from custom_components.ferro_ai_companion.const import DOMAIN
+from custom_components.ferro_ai_companion.const import (
+    CAPACITY_TARIFF_SAME_DAY_NIGHT,
+    CONF_CAPACITY_TARIFF,
+    CONF_EV_SOC_SENSOR,
+    CONF_EV_TARGET_SOC_SENSOR,
+    CONF_NIGHT_WEEKDAYS,
+    CONF_SOLAR_EV_CHARGING_ENABLED,
+    CONF_SOLAR_FORECAST_TODAY_REMAINING,
+    DOMAIN,
+    DOMAIN_DATA,
+)
 from custom_components.ferro_ai_companion.coordinator import (
     FerroAICompanionCoordinator,
 )
@@ -21,7 +33,6 @@ from .const import (
     MOCK_CONFIG_ALL_V1,
 )
 
-
 # We can pass fixtures as defined in conftest.py to tell pytest to use the fixture
 # for a given test. We can also leverage fixtures and mocks that are available in
 # Home Assistant using the pytest_homeassistant_custom_component plugin.
@@ -63,10 +74,70 @@ async def test_setup_unload_and_reload_entry(hass, bypass_validate_input):
     assert await async_unload_entry(hass, config_entry)
     await hass.async_block_till_done()
     assert config_entry.entry_id not in hass.data[DOMAIN]
+    assert DOMAIN_DATA not in hass.data
+
+
+async def test_options_applied_in_place(hass, bypass_validate_input):
+    """Test that options are applied without a reload when possible."""
+    config_entry = MockConfigEntry(
+        domain=DOMAIN,
+        data=MOCK_CONFIG_ALL,
+        entry_id="test",
+        state=ConfigEntryState.LOADED,
+    )
+    config_entry.add_to_hass(hass)
+    assert await async_setup_entry(hass, config_entry)
+    await hass.async_block_till_done()
+    coordinator: FerroAICompanionCoordinator = hass.data[DOMAIN]["test"]
+    coordinator.primary_peak_shaving_target_w = 3000.0
+    coordinator.secondary_peak_shaving_target_w = 5000.0
+
+    # Changed capacity tariff is applied to the same coordinator
+    hass.config_entries.async_update_entry(
+        config_entry,
+        options=MOCK_CONFIG_ALL
+        | {CONF_CAPACITY_TARIFF: CAPACITY_TARIFF_SAME_DAY_NIGHT},
+    )
+    await hass.async_block_till_done()
+    assert hass.data[DOMAIN]["test"] is coordinator
+    assert coordinator.capacity_tariff == CAPACITY_TARIFF_SAME_DAY_NIGHT
+    assert coordinator.primary_peak_shaving_target_w == 3000.0
+    assert coordinator.secondary_peak_shaving_target_w == 0.0
+    assert coordinator.sensor_current_peak_shaving_target.native_value == 3000.0
+
+    # Changed tariff calendar is applied to the coordinator and EnergyHub
+    tariff_calendar = coordinator.tariff_calendar
+    hass.config_entries.async_update_entry(
+        config_entry,
+        options=MOCK_CONFIG_ALL
+        | {
+            CONF_CAPACITY_TARIFF: CAPACITY_TARIFF_SAME_DAY_NIGHT,
+            CONF_NIGHT_WEEKDAYS: ["sun"],
+        },
+    )
+    await hass.async_block_till_done()
+    assert hass.data[DOMAIN]["test"] is coordinator
+    assert coordinator.tariff_calendar is not tariff_calendar
+    assert coordinator.operation_settings.tariff_calendar is coordinator.tariff_calendar
+
+    # Nothing changed, nothing happens
+    await async_entry_updated(hass, config_entry)
+    assert hass.data[DOMAIN]["test"] is coordinator
+
+    # Solar EV charging changes the entities, so the entry is reloaded
+    hass.config_entries.async_update_entry(
+        config_entry,
+        options=MOCK_CONFIG_ALL | {CONF_SOLAR_EV_CHARGING_ENABLED: False},
+    )
+    await hass.async_block_till_done()
+    assert hass.data[DOMAIN]["test"] is not coordinator
+
+    # Unload the entry
+    assert await async_unload_entry(hass, config_entry)
 
 
-async def test_setup_entry_exception(hass):
-    """Test ConfigEntryNotReady when validate_input_sensors returns an error message."""
+async def test_setup_entry_wait_for_input_sensors(hass):
+    """Test that setup does not wait, the first update waits for the input sensors."""
     config_entry = MockConfigEntry(
         domain=DOMAIN,
         data=MOCK_CONFIG_ALL,
@@ -75,11 +146,25 @@ async def test_setup_entry_exception(hass):
     )
     config_entry.add_to_hass(hass)
 
-    # In this case we are testing the condition where async_setup_entry raises
-    # ConfigEntryNotReady using the `error_on_get_data` fixture which simulates
-    # an error.
-    with pytest.raises(ConfigEntryNotReady):
-        assert await async_setup_entry(hass, config_entry)
+    with patch.object(FerroAICompanionCoordinator, "update_initial") as update_initial:
+        async with asyncio.timeout(1):
+            assert await async_setup_entry(hass, config_entry)
+        await hass.async_block_till_done()
+        update_initial.assert_not_called()
+
+        hass.states.async_set(MOCK_CONFIG_ALL[CONF_EV_SOC_SENSOR], "50")
+        hass.states.async_set(MOCK_CONFIG_ALL[CONF_EV_TARGET_SOC_SENSOR], "80")
+        await hass.async_block_till_done()
+        update_initial.assert_not_called()
+
+        hass.states.async_set(
+            MOCK_CONFIG_ALL[CONF_SOLAR_FORECAST_TODAY_REMAINING], "10"
+        )
+        await hass.async_block_till_done()
+        update_initial.assert_called_once()
+
+    # Unload the entry
+    assert await async_unload_entry(hass, config_entry)
 
 
 async def test_setup_with_migration_v1(hass, bypass_validate_input):
@@ -0,0 +1,50 @@
+"""Test ferro_ai_companion scoped locks."""
+
+import asyncio
+
+from homeassistant.core import HomeAssistant
+
+from custom_components.ferro_ai_companion.helpers.locks import (
+    async_get_lock,
+    async_unload_locks,
+)
+
+# pylint: disable=unused-argument
+
+
+async def test_scoped_locks(hass: HomeAssistant):
+    """Test that locks are scoped per key and count contention."""
+
+    lock1 = async_get_lock(hass, "entry1")
+    lock2 = async_get_lock(hass, "entry2")
+    assert async_get_lock(hass, "entry1") is lock1
+    assert lock1 is not lock2
+
+    async def hold(lock, delay: float):
+        async with lock:
+            await asyncio.sleep(delay)
+
+    # Another key is not blocked
+    task = hass.async_create_task(hold(lock1, 0.05))
+    await asyncio.sleep(0)
+    assert lock1.locked()
+    async with lock2:
+        assert lock1.locked()
+    assert lock2.as_dict()["contended"] == 0
+
+    # The same key waits
+    await hold(lock1, 0)
+    await task
+    assert not lock1.locked()
+    assert lock1.as_dict()["acquired"] == 2
+    assert lock1.as_dict()["contended"] == 1
+    assert lock1.as_dict()["max_wait_s"] > 0.0
+
+    # Only locks that are not in use are removed
+    task = hass.async_create_task(hold(lock1, 0.05))
+    await asyncio.sleep(0)
+    async_unload_locks(hass)
+    assert async_get_lock(hass, "entry1") is lock1
+    assert async_get_lock(hass, "entry2") is not lock2
+    await task
+    assert not lock1.in_use()
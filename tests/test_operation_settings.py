@@ -0,0 +1,387 @@
+"""Test ferro_ai_companion operation settings."""
+
+import asyncio
+from datetime import timedelta
+from unittest.mock import patch
+
+from pytest_homeassistant_custom_component.common import async_fire_time_changed
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import device_registry as dr, entity_registry as er
+from homeassistant.util import dt as dt_util
+
+from custom_components.ferro_ai_companion.const import (
+    CAPACITY_TARIFF_NONE,
+    DOMAIN_DATA,
+    HISTORY_BOOTSTRAP_DAYS,
+    MODE_SELF,
+    OVERRIDE_ENFORCE_DELAY,
+    OVERRIDE_ENFORCE_MAX,
+    PLATFORM_FERROAMP_OPERATION_SETTINGS,
+)
+
+# pylint: disable=unused-argument
+
+
+def set_energyhub_states(
+    hass: HomeAssistant,
+    entities: dict,
+    discharge_threshold_w: float,
+    charge_threshold_w: float,
+    max_soc: float,
+):
+    """Set the states of the Ferroamp Operation Settings number entities."""
+    hass.states.async_set(entities["discharge_threshold"], str(discharge_threshold_w))
+    hass.states.async_set(entities["charge_threshold"], str(charge_threshold_w))
+    hass.states.async_set(entities["upper_reference"], str(max_soc))
+
+
+async def test_fetch_all_data_event_driven(
+    hass: HomeAssistant,
+    mock_service_calls,
+    ferroamp_operation_settings_entities,
+    create_operation_settings,
+):
+    """Test that fetch_all_data returns as soon as EnergyHub has answered."""
+
+    entities = ferroamp_operation_settings_entities
+    set_energyhub_states(hass, entities, 1000, 0, 90)
+
+    operation_settings = create_operation_settings()
+
+    async def _press_get_data(*args, **kwargs):
+        set_energyhub_states(hass, entities, 2000, -100000, 80)
+
+    mock_service_calls.side_effect = _press_get_data
+    # Would time out if fetch_all_data waited for the full timeout.
+    async with asyncio.timeout(5):
+        await operation_settings.fetch_all_data(timeout=60)
+
+    assert operation_settings.discharge_threshold_w == 2000
+    assert operation_settings.charge_threshold_w == -100000
+    assert operation_settings.max_soc == 80
+
+    # Unchanged values are also accepted as an answer.
+    async with asyncio.timeout(5):
+        await operation_settings.fetch_all_data(timeout=60)
+
+    assert operation_settings.discharge_threshold_w == 2000
+
+
+async def test_fetch_all_data_timeout(
+    hass: HomeAssistant,
+    skip_service_calls,
+    ferroamp_operation_settings_entities,
+    create_operation_settings,
+):
+    """Test that fetch_all_data falls back to the current states on timeout."""
+
+    entities = ferroamp_operation_settings_entities
+    set_energyhub_states(hass, entities, 1500, 0, 90)
+
+    operation_settings = create_operation_settings()
+
+    await operation_settings.fetch_all_data(timeout=0.01)
+
+    assert operation_settings.discharge_threshold_w == 1500
+    assert operation_settings.charge_threshold_w == 0
+    assert operation_settings.max_soc == 90
+
+
+async def test_fetch_all_data_single_flight(
+    hass: HomeAssistant,
+    mock_service_calls,
+    ferroamp_operation_settings_entities,
+    create_operation_settings,
+):
+    """Test that overlapping fetches share one button press."""
+
+    entities = ferroamp_operation_settings_entities
+    set_energyhub_states(hass, entities, 1000, 0, 90)
+
+    operation_settings = create_operation_settings()
+
+    async def _press_get_data(*args, **kwargs):
+        await asyncio.sleep(0)
+        set_energyhub_states(hass, entities, 3000, 0, 90)
+
+    mock_service_calls.side_effect = _press_get_data
+    await asyncio.gather(
+        operation_settings.fetch_all_data(timeout=1),
+        operation_settings.fetch_all_data(timeout=1),
+        operation_settings.fetch_all_data(timeout=1),
+    )
+    assert mock_service_calls.call_count == 1
+
+    # A fetch after the previous one has completed presses the button again.
+    await operation_settings.fetch_all_data(timeout=1)
+    assert mock_service_calls.call_count == 2
+
+    assert operation_settings.discharge_threshold_w == 3000
+
+
+async def test_get_snapshot(
+    hass: HomeAssistant,
+    freezer,
+    mock_service_calls,
+    ferroamp_operation_settings_entities,
+    create_operation_settings,
+):
+    """Test that get_snapshot only fetches when the snapshot is too old."""
+
+    entities = ferroamp_operation_settings_entities
+    hub = {"discharge_threshold_w": 1000, "charge_threshold_w": 0, "max_soc": 90}
+
+    operation_settings = create_operation_settings()
+
+    async def _press_get_data(*args, **kwargs):
+        set_energyhub_states(hass, entities, **hub)
+
+    freezer.move_to("2025-10-07T12:00:00+02:00")
+    mock_service_calls.side_effect = _press_get_data
+    snapshot = await operation_settings.get_snapshot(max_age=60)
+    assert mock_service_calls.call_count == 1
+    assert snapshot.discharge_threshold_w == 1000
+    assert snapshot.charge_threshold_w == 0
+    assert snapshot.max_soc == 90
+
+    # Fresh enough, no new fetch
+    freezer.move_to("2025-10-07T12:00:30+02:00")
+    hub["discharge_threshold_w"] = 2000
+    snapshot = await operation_settings.get_snapshot(max_age=60)
+    assert mock_service_calls.call_count == 1
+    assert snapshot.discharge_threshold_w == 1000
+
+    # Too old, new fetch
+    snapshot = await operation_settings.get_snapshot(max_age=10)
+    assert mock_service_calls.call_count == 2
+    assert snapshot.discharge_threshold_w == 2000
+
+
+async def test_update_thresholds_write_behind(
+    hass: HomeAssistant, mock_service_calls, create_operation_settings
+):
+    """Test that queued threshold writes are merged and unchanged writes skipped."""
+
+    operation_settings = create_operation_settings()
+    paced = []
+
+    async def _pace_update_thresholds(self):
+        paced.append(True)
+        await asyncio.sleep(0.01)
+
+    with patch(
+        "custom_components.ferro_ai_companion.helpers.operation_settings.OperationSettings.pace_update_thresholds",
+        new=_pace_update_thresholds,
+    ):
+        # A burst of updates results in one write of the last values.
+        operation_settings.discharge_threshold_w = 1001
+        operation_settings.charge_threshold_w = 1
+        first = operation_settings.update_thresholds()
+        operation_settings.discharge_threshold_w = 2001
+        operation_settings.charge_threshold_w = 2001
+        last = operation_settings.update_thresholds()
+        assert operation_settings.write_pending()
+
+        assert await last is True
+        assert await first is True
+        assert not operation_settings.write_pending()
+        assert mock_service_calls.call_count == 3
+        assert len(paced) == 1
+        assert (
+            mock_service_calls.call_args_list[0].kwargs["service_data"]["value"] == 2001
+        )
+        assert (
+            mock_service_calls.call_args_list[1].kwargs["service_data"]["value"] == 2001
+        )
+
+        # Writing the same values again is skipped, without waiting for a token.
+        assert await operation_settings.update_thresholds() is False
+        assert mock_service_calls.call_count == 3
+        assert len(paced) == 1
+
+
+async def test_override_enforced(
+    hass: HomeAssistant,
+    mock_service_calls,
+    ferroamp_operation_settings_entities,
+    create_operation_settings,
+):
+    """Test that an active override is re-asserted when Ferro AI changes thresholds."""
+
+    entities = ferroamp_operation_settings_entities
+    set_energyhub_states(hass, entities, -99999, -99999, 90)
+
+    operation_settings = create_operation_settings()
+    unsub = operation_settings.async_setup_listeners()
+
+    # Sell override active
+    operation_settings.override_active = True
+    operation_settings.discharge_threshold_w = -99999.0
+    operation_settings.charge_threshold_w = -99999.0
+    operation_settings.original_discharge_threshold_w = 1000
+    operation_settings.original_charge_threshold_w = 0
+
+    for count in range(OVERRIDE_ENFORCE_MAX + 1):
+        # Ferro AI writes new thresholds
+        set_energyhub_states(hass, entities, 2000 + count, 0, 90)
+        await hass.async_block_till_done()
+        async_fire_time_changed(
+            hass, dt_util.utcnow() + timedelta(seconds=OVERRIDE_ENFORCE_DELAY + 1)
+        )
+        await hass.async_block_till_done()
+
+        if count < OVERRIDE_ENFORCE_MAX:
+            assert operation_settings.original_discharge_threshold_w == 2000 + count
+            assert operation_settings.original_charge_threshold_w == 0
+            assert mock_service_calls.call_count == 3 * (count + 1)
+            assert (
+                mock_service_calls.call_args_list[-3].kwargs["service_data"]["value"]
+                == -99999.0
+            )
+            # EnergyHub answers with the re-asserted values
+            set_energyhub_states(hass, entities, -99999, -99999, 90)
+            await hass.async_block_till_done()
+            async_fire_time_changed(
+                hass,
+                dt_util.utcnow() + timedelta(seconds=OVERRIDE_ENFORCE_DELAY + 1),
+            )
+            await hass.async_block_till_done()
+            assert mock_service_calls.call_count == 3 * (count + 1)
+
+    # Loop protection stops re-asserting
+    assert mock_service_calls.call_count == 3 * OVERRIDE_ENFORCE_MAX
+
+    unsub()
+
+
+async def test_override_periods(
+    hass: HomeAssistant,
+    freezer,
+    mock_service_calls,
+    skip_pace_update_thresholds,
+    ferroamp_operation_settings_entities,
+    create_operation_settings,
+):
+    """Test that the periods of the overrides are kept and stored."""
+
+    entities = ferroamp_operation_settings_entities
+    operation_settings = create_operation_settings()
+
+    async def _press_get_data(*args, **kwargs):
+        set_energyhub_states(hass, entities, 1000, 0, 90)
+
+    mock_service_calls.side_effect = _press_get_data
+
+    def timestamp(date_time: str) -> float:
+        return dt_util.parse_datetime(date_time).timestamp()
+
+    freezer.move_to("2025-10-07T12:00:00+02:00")
+    await operation_settings.override(MODE_SELF, 1000, 2000, CAPACITY_TARIFF_NONE)
+    freezer.move_to("2025-10-07T13:00:00+02:00")
+    assert operation_settings.override_active_at(timestamp("2025-10-07T12:30:00+02:00"))
+    await operation_settings.stop_override()
+    await hass.async_block_till_done()
+
+    freezer.move_to("2025-10-07T14:00:00+02:00")
+    assert operation_settings.override_active_at(timestamp("2025-10-07T12:30:00+02:00"))
+    assert not operation_settings.override_active_at(
+        timestamp("2025-10-07T11:30:00+02:00")
+    )
+    assert not operation_settings.override_active_at(
+        timestamp("2025-10-07T13:30:00+02:00")
+    )
+
+    # The periods are restored, also without an active override
+    restored = create_operation_settings(entry_id="restored")
+    restored.restore_override_state(operation_settings.override_state())
+    assert not restored.override_active
+    assert restored.override_active_at(timestamp("2025-10-07T12:30:00+02:00"))
+
+    # Periods older than HISTORY_BOOTSTRAP_DAYS are dropped
+    freezer.move_to(dt_util.now() + timedelta(days=HISTORY_BOOTSTRAP_DAYS))
+    await operation_settings.override(MODE_SELF, 1000, 2000, CAPACITY_TARIFF_NONE)
+    await operation_settings.stop_override()
+    await hass.async_block_till_done()
+    assert not operation_settings.override_active_at(
+        timestamp("2025-10-07T12:30:00+02:00")
+    )
+
+
+async def test_set_entity_id(
+    hass: HomeAssistant,
+    mock_service_calls,
+    ferroamp_operation_settings_entities,
+    create_operation_settings,
+):
+    """Test that an override is stopped on the old device when the device changes."""
+
+    entities1 = ferroamp_operation_settings_entities
+    entity_registry = er.async_get(hass)
+    device_registry = dr.async_get(hass)
+    config_entry_id = entity_registry.async_get(entities1["get_data"]).config_entry_id
+    device2 = device_registry.async_get_or_create(
+        config_entry_id=config_entry_id,
+        identifiers={(PLATFORM_FERROAMP_OPERATION_SETTINGS, "energyhub2")},
+    )
+    entities2 = {}
+    for key, entity_id in entities1.items():
+        entry = entity_registry.async_get(entity_id)
+        entities2[key] = entity_registry.async_get_or_create(
+            entry.domain,
+            PLATFORM_FERROAMP_OPERATION_SETTINGS,
+            f"{key}_2",
+            config_entry=hass.config_entries.async_get_entry(config_entry_id),
+            device_id=device2.id,
+            original_name=entry.original_name,
+        ).entity_id
+    set_energyhub_states(hass, entities1, -99999, -99999, 90)
+    set_energyhub_states(hass, entities2, 3000, 0, 80)
+
+    async def _press_get_data(*args, **kwargs):
+        if kwargs["target"]["entity_id"] == entities1["get_data"]:
+            set_energyhub_states(hass, entities1, -99999, -99999, 90)
+        elif kwargs["target"]["entity_id"] == entities2["get_data"]:
+            set_energyhub_states(hass, entities2, 3000, 0, 80)
+
+    mock_service_calls.side_effect = _press_get_data
+    operation_settings = create_operation_settings()
+
+    # Sell override active on the first device
+    operation_settings.override_active = True
+    operation_settings.discharge_threshold_w = -99999.0
+    operation_settings.charge_threshold_w = -99999.0
+    operation_settings.original_discharge_threshold_w = 1000
+    operation_settings.original_charge_threshold_w = 0
+
+    # Resolving the same device again keeps the rate limiter and command worker
+    rate_limiter = operation_settings.rate_limiter
+    command_worker = operation_settings.command_worker
+    operation_settings._async_resolve_entities()  # pylint: disable=protected-access
+    assert operation_settings.rate_limiter is rate_limiter
+    assert operation_settings.command_worker is command_worker
+
+    await operation_settings.async_set_entity_id(entities2["discharge_threshold"])
+
+    # The rate limiter and command worker of the first device are released
+    assert operation_settings.rate_limiter is not rate_limiter
+    assert operation_settings.command_worker is not command_worker
+    assert rate_limiter not in hass.data[DOMAIN_DATA]["rate_limiters"].values()
+    assert command_worker not in hass.data[DOMAIN_DATA]["command_workers"].values()
+
+    # The original thresholds are restored on the first device
+    set_values = {
+        call.kwargs["target"]["entity_id"]: call.kwargs["service_data"]["value"]
+        for call in mock_service_calls.call_args_list
+        if call.kwargs["service"] == "set_value"
+    }
+    assert set_values == {
+        entities1["discharge_threshold"]: 1000,
+        entities1["charge_threshold"]: 0,
+    }
+
+    # The second device is used without override
+    assert not operation_settings.override_active
+    assert operation_settings.discharge_threshold_w == 3000
+    assert operation_settings.original_discharge_threshold_w == 3000
+    assert operation_settings.max_soc == 80
@@ -0,0 +1,60 @@
+"""Test ferro_ai_companion rate limiter."""
+
+import asyncio
+
+from homeassistant.core import HomeAssistant
+
+from custom_components.ferro_ai_companion.helpers.rate_limiter import (
+    TokenBucket,
+    async_get_rate_limiter,
+    async_release_rate_limiter,
+    async_unload_rate_limiters,
+)
+
+# pylint: disable=unused-argument
+
+
+async def test_token_bucket():
+    """Test the token bucket."""
+
+    bucket = TokenBucket(burst=2, refill_rate=20.0)
+
+    # The burst is available without waiting.
+    assert await bucket.async_acquire() < 0.04
+    assert await bucket.async_acquire() < 0.04
+    assert bucket.as_dict()["acquired"] == 2
+
+    # Then the callers are queued.
+    results = await asyncio.gather(bucket.async_acquire(), bucket.async_acquire())
+    assert max(results) >= 0.04
+    assert bucket.queue_depth == 0
+    assert bucket.as_dict()["acquired"] == 4
+    assert bucket.as_dict()["max_wait_s"] >= 0.04
+
+
+async def test_rate_limiter_shared_per_hub(
+    hass: HomeAssistant, create_operation_settings
+):
+    """Test that instances using the same EnergyHub share the rate limiter."""
+
+    operation_settings1 = create_operation_settings("test1")
+    operation_settings2 = create_operation_settings("test2", "charge_threshold")
+    assert operation_settings1.rate_limiter is operation_settings2.rate_limiter
+
+    assert (
+        async_get_rate_limiter(hass, "other", "test1")
+        is not operation_settings1.rate_limiter
+    )
+
+    # The rate limiter is removed when its last user has released it.
+    rate_limiter = async_get_rate_limiter(hass, "other", "test2")
+    async_release_rate_limiter(hass, "other", "test1")
+    assert async_get_rate_limiter(hass, "other", "test1") is rate_limiter
+    async_release_rate_limiter(hass, "other", "test1")
+    async_release_rate_limiter(hass, "other", "test2")
+    assert async_get_rate_limiter(hass, "other", "test1") is not rate_limiter
+
+    # Unloaded rate limiters are replaced.
+    rate_limiter = operation_settings1.rate_limiter
+    async_unload_rate_limiters(hass)
+    assert create_operation_settings("test3").rate_limiter is not rate_limiter
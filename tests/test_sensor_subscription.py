@@ -0,0 +1,83 @@
+"""Test ferro_ai_companion sensor subscription."""
+
+from datetime import timedelta
+
+from pytest_homeassistant_custom_component.common import async_fire_time_changed
+
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+
+from custom_components.ferro_ai_companion.helpers.sensor_subscription import (
+    SensorSubscription,
+)
+
+# pylint: disable=unused-argument
+
+
+async def test_sensor_subscription(hass: HomeAssistant, freezer):
+    """Test dead band, level crossings and the min interval."""
+
+    reported = []
+
+    async def action(old_value, new_value):
+        reported.append((old_value, new_value))
+
+    entity_id = "sensor.ferroamp_system_state_of_charge"
+    subscription = SensorSubscription(
+        hass, entity_id, action, 30.0, 1.0, levels=lambda: (50.0,)
+    )
+    unsub = subscription.async_start()
+
+    # The first value is always reported
+    hass.states.async_set(entity_id, "40.0")
+    await hass.async_block_till_done()
+    assert reported == [(None, 40.0)]
+
+    # Changes within the dead band are ignored
+    freezer.tick(timedelta(seconds=60))
+    hass.states.async_set(entity_id, "40.5")
+    hass.states.async_set(entity_id, "unavailable")
+    await hass.async_block_till_done()
+    assert reported == [(None, 40.0)]
+
+    # Changes outside the dead band are reported
+    hass.states.async_set(entity_id, "41.0")
+    await hass.async_block_till_done()
+    assert reported == [(None, 40.0), (40.0, 41.0)]
+
+    # Significant changes within the min interval are held back
+    freezer.tick(timedelta(seconds=10))
+    hass.states.async_set(entity_id, "43.0")
+    hass.states.async_set(entity_id, "45.0")
+    await hass.async_block_till_done()
+    assert len(reported) == 2
+
+    # And the latest value is reported when the interval has passed
+    freezer.tick(timedelta(seconds=20))
+    async_fire_time_changed(hass, dt_util.utcnow())
+    await hass.async_block_till_done()
+    assert reported[-1] == (41.0, 45.0)
+
+    freezer.tick(timedelta(seconds=60))
+    hass.states.async_set(entity_id, "49.8")
+    await hass.async_block_till_done()
+    assert reported[-1] == (45.0, 49.8)
+
+    # Crossing a level is reported even within the dead band
+    freezer.tick(timedelta(seconds=60))
+    hass.states.async_set(entity_id, "50.1")
+    await hass.async_block_till_done()
+    assert reported[-1] == (49.8, 50.1)
+
+    assert subscription.as_dict() == {
+        "entity_id": entity_id,
+        "value": 50.1,
+        "reported": 50.1,
+        "received": 8,
+        "reported_count": 5,
+    }
+
+    unsub()
+    hass.states.async_set(entity_id, "60.0")
+    await hass.async_block_till_done()
+    assert subscription.reported_count == 5
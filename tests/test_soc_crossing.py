@@ -0,0 +1,34 @@
+"""Test ferro_ai_companion SOC crossing detector."""
+
+from custom_components.ferro_ai_companion.const import SOC_BAND_HIGH, SOC_BAND_LOW
+from custom_components.ferro_ai_companion.helpers.solar_ev_charging import (
+    SocCrossingDetector,
+)
+
+# pylint: disable=unused-argument
+
+
+def test_soc_crossing():
+    """Test that only crossings of the start and stop SOC are reported."""
+
+    detector = SocCrossingDetector()
+
+    # Nothing is known within the hysteresis
+    assert detector.update(92.0, 95.0, 90.0) is None
+    assert detector.band is None
+
+    # Reaching the start SOC is reported once
+    assert detector.update(95.0, 95.0, 90.0) == SOC_BAND_HIGH
+    assert detector.update(97.0, 95.0, 90.0) is None
+    assert detector.update(94.0, 95.0, 90.0) is None
+    assert detector.update(96.0, 95.0, 90.0) is None
+    assert detector.band == SOC_BAND_HIGH
+
+    # Falling below the stop SOC is reported once
+    assert detector.update(89.9, 95.0, 90.0) == SOC_BAND_LOW
+    assert detector.update(85.0, 95.0, 90.0) is None
+    assert detector.update(92.0, 95.0, 90.0) is None
+    assert detector.band == SOC_BAND_LOW
+
+    # A lower start SOC is a crossing too
+    assert detector.update(92.0, 91.0, 86.0) == SOC_BAND_HIGH
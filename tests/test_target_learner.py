@@ -0,0 +1,76 @@
+"""Test ferro_ai_companion target learner."""
+
+from custom_components.ferro_ai_companion.const import (
+    TARGET_HALF_LIFE,
+    TARGET_MAX_WEIGHT,
+)
+from custom_components.ferro_ai_companion.helpers.target_learner import (
+    TargetLearner,
+)
+
+
+def test_target_learner_clusters():
+    """Test that each sample updates its target."""
+
+    learner = TargetLearner()
+
+    # No peak shaving
+    learner.add(0.0, 0.0, cluster=0)
+    assert learner.primary.count == 0
+
+    learner.add(1000.0, 0.0, cluster=0)
+    learner.add(2000.0, 0.0, cluster=1)
+    assert learner.primary.mean == 1000.0
+    assert learner.secondary.mean == 2000.0
+
+    # Each target is the mean of its samples
+    learner.add(1100.0, 0.0, cluster=0)
+    assert learner.primary.mean == 1050.0
+    assert learner.primary.count == 2
+    assert learner.secondary.count == 1
+
+
+def test_target_learner_weight_and_decay():
+    """Test that the weight is limited and decays with time."""
+
+    learner = TargetLearner()
+    for _ in range(20):
+        learner.add(1000.0, 0.0, cluster=0)
+    assert learner.primary.weight == TARGET_MAX_WEIGHT
+    assert learner.primary.confidence(0.0) == 1.0
+
+    # New values take over within TARGET_MAX_WEIGHT samples
+    learner.add(1800.0, 0.0, cluster=0)
+    assert learner.primary.mean == 1100.0
+
+    # After a half-life, the weight is halved
+    assert learner.primary.confidence(TARGET_HALF_LIFE) == 0.5
+    learner.add(1600.0, TARGET_HALF_LIFE, cluster=0)
+    assert learner.primary.mean == 1200.0
+    assert learner.primary.weight == TARGET_MAX_WEIGHT / 2 + 1
+
+
+def test_target_learner_seed_and_storage():
+    """Test seeding and restoring the learner."""
+
+    learner = TargetLearner()
+    learner.seed(0, 1000.0)
+    learner.seed(1, 2000.0)
+    assert learner.secondary.mean == 2000.0
+    assert learner.primary.confidence(0.0) == 0.0
+
+    # Seeded targets have no weight
+    learner.add(1200.0, 0.0, cluster=0)
+    assert learner.primary.mean == 1200.0
+
+    # Seeding the learned value keeps the weight, other values start over
+    learner.seed(0, 1200.0)
+    assert learner.primary.count == 1
+    learner.seed(0, 1100.0)
+    assert learner.primary.count == 0
+    assert learner.primary.mean == 1100.0
+
+    restored = TargetLearner.from_dict(learner.as_dict())
+    assert restored.as_dict() == learner.as_dict()
+
+    assert TargetLearner.from_dict({}).primary.count == 0
@@ -0,0 +1,108 @@
+"""Test ferro_ai_companion tariff calendar."""
+
+from datetime import date, time
+
+from homeassistant.util import dt as dt_util
+
+from custom_components.ferro_ai_companion.const import (
+    TARIFF_PERIOD_DAY,
+    TARIFF_PERIOD_NIGHT,
+)
+from custom_components.ferro_ai_companion.helpers.tariff_calendar import (
+    DEFAULT_TARIFF_CALENDAR,
+    TariffCalendar,
+    TariffRule,
+    night_tariff_calendar,
+)
+
+# pylint: disable=unused-argument
+
+
+def test_default_tariff_calendar(set_cet_timezone):
+    """Test the default night between 22:00 and 06:00."""
+
+    calendar = DEFAULT_TARIFF_CALENDAR
+
+    now = dt_util.parse_datetime("2025-09-26T21:59:00+02:00")
+    assert calendar.period(now) == TARIFF_PERIOD_DAY
+    assert calendar.next_transition(now) == dt_util.parse_datetime(
+        "2025-09-26T22:00:00+02:00"
+    )
+
+    now = dt_util.parse_datetime("2025-09-26T22:00:00+02:00")
+    assert calendar.period(now) == TARIFF_PERIOD_NIGHT
+    assert calendar.next_transition(now) == dt_util.parse_datetime(
+        "2025-09-27T06:00:00+02:00"
+    )
+
+    # Daylight saving time starts during the night
+    now = dt_util.parse_datetime("2025-03-30T01:00:00+01:00")
+    assert calendar.period(now) == TARIFF_PERIOD_NIGHT
+    assert calendar.next_transition(now) == dt_util.parse_datetime(
+        "2025-03-30T06:00:00+02:00"
+    )
+
+
+def test_tariff_calendar_weekdays_in_winter(set_cet_timezone):
+    """Test a high tariff on weekdays in winter, except on holidays."""
+
+    calendar = TariffCalendar(
+        [
+            TariffRule(
+                periods=((time(7, 0), 1), (time(20, 0), 0)),
+                weekdays=frozenset(range(5)),
+                months=frozenset([11, 12, 1, 2, 3]),
+                holidays=False,
+            )
+        ],
+        default_period=0,
+        holidays=[date(2025, 12, 25), date(2025, 12, 26)],
+    )
+
+    now = dt_util.parse_datetime("2025-12-24T08:00:00+01:00")
+    assert calendar.period(now) == 1
+    assert calendar.next_transition(now) == dt_util.parse_datetime(
+        "2025-12-24T20:00:00+01:00"
+    )
+
+    # Holidays and the weekend are skipped
+    now = dt_util.parse_datetime("2025-12-25T08:00:00+01:00")
+    assert calendar.period(now) == 0
+    assert calendar.next_transition(now) == dt_util.parse_datetime(
+        "2025-12-29T07:00:00+01:00"
+    )
+
+    # No high tariff during summer
+    now = dt_util.parse_datetime("2025-06-02T08:00:00+02:00")
+    assert calendar.period(now) == 0
+    assert calendar.next_transition(now) == dt_util.parse_datetime(
+        "2025-11-03T07:00:00+01:00"
+    )
+
+    # A calendar without any rule never changes
+    assert TariffCalendar([]).next_transition(now) is None
+
+
+def test_night_tariff_calendar(set_cet_timezone):
+    """Test a night within the day and a weekday with night all day."""
+
+    calendar = night_tariff_calendar(time(1, 0), time(5, 0), [6])
+
+    now = dt_util.parse_datetime("2025-09-26T00:30:00+02:00")
+    assert calendar.period(now) == TARIFF_PERIOD_DAY
+    assert calendar.next_transition(now) == dt_util.parse_datetime(
+        "2025-09-26T01:00:00+02:00"
+    )
+    now = dt_util.parse_datetime("2025-09-26T05:00:00+02:00")
+    assert calendar.period(now) == TARIFF_PERIOD_DAY
+
+    # Sunday
+    now = dt_util.parse_datetime("2025-09-27T12:00:00+02:00")
+    assert calendar.next_transition(now) == dt_util.parse_datetime(
+        "2025-09-28T00:00:00+02:00"
+    )
+    now = dt_util.parse_datetime("2025-09-28T12:00:00+02:00")
+    assert calendar.period(now) == TARIFF_PERIOD_NIGHT
+    assert calendar.next_transition(now) == dt_util.parse_datetime(
+        "2025-09-29T00:00:00+02:00"
+    )